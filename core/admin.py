@@ -1,7 +1,7 @@
 # core/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Emprestimo
+from .models import CustomUser, Emprestimo, SancaoRestritiva, FonteRestritiva, AlertaSancao, AlertaKyc, KycJob, KycExecucao, Investimento, OrdemAutoInvestimento, Parcela, Pagamento, ResumoCarteira
 
 class CustomUserAdmin(UserAdmin):
     # Adicionamos os campos customizados ao painel de edição do usuário
@@ -10,9 +10,10 @@ class CustomUserAdmin(UserAdmin):
             # AQUI ESTÁ A CORREÇÃO:
             'fields': ('cpf', 'data_nascimento', 'renda_mensal',
                        'foto_documento_frente', 'foto_documento_verso',
-                       'selfie', 'kyc_status', 'risco'),
+                       'selfie', 'kyc_status', 'risco', 'origem_cadastro'),
         }),
     )
+    readonly_fields = ('origem_cadastro',)
     # Adicionamos campos à lista de visualização de usuários
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'kyc_status', 'risco')
     # Permite editar o status do KYC diretamente na lista
@@ -22,4 +23,89 @@ class CustomUserAdmin(UserAdmin):
 
 # Registra os modelos no admin
 admin.site.register(CustomUser, CustomUserAdmin)
-admin.site.register(Emprestimo)
\ No newline at end of file
+admin.site.register(Emprestimo)
+
+
+class SancaoRestritivaAdmin(admin.ModelAdmin):
+    list_display = ('documento', 'nome', 'fonte', 'data_carga')
+    list_filter = ('fonte',)
+    search_fields = ('documento', 'nome')
+
+admin.site.register(SancaoRestritiva, SancaoRestritivaAdmin)
+
+
+class FonteRestritivaAdmin(admin.ModelAdmin):
+    list_display = ('fonte', 'versao', 'total_registros', 'novos_ultima_carga', 'removidos_ultima_carga',
+                    'versao_triada', 'data_verificacao', 'data_atualizacao')
+    readonly_fields = ('etag', 'ultima_modificacao', 'checksum', 'versao', 'total_registros', 'novos_ultima_carga',
+                       'removidos_ultima_carga', 'versao_triada')
+
+admin.site.register(FonteRestritiva, FonteRestritivaAdmin)
+
+
+class AlertaSancaoAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'fonte', 'documento', 'nome_sancionado', 'bloqueado', 'data_criacao')
+    list_filter = ('fonte', 'bloqueado')
+    search_fields = ('documento', 'usuario__username')
+
+admin.site.register(AlertaSancao, AlertaSancaoAdmin)
+
+
+class AlertaKycAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'usuario_relacionado', 'tipo', 'detalhes', 'revisado', 'data_criacao', 'data_atualizacao')
+    list_filter = ('tipo', 'revisado')
+    list_editable = ('revisado',)
+    search_fields = ('usuario__username', 'usuario_relacionado__username')
+    raw_id_fields = ('usuario', 'usuario_relacionado')
+
+admin.site.register(AlertaKyc, AlertaKycAdmin)
+
+
+class KycJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'usuario', 'status', 'tentativas', 'data_criacao', 'data_inicio', 'data_fim')
+    list_filter = ('status',)
+    readonly_fields = ('resultado',)
+
+admin.site.register(KycJob, KycJobAdmin)
+
+
+class KycExecucaoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'usuario', 'status', 'duracao_total_ms', 'ocr_frente_ms', 'ocr_verso_ms', 'face_encoding_ms',
+                    'face_comparacao_ms', 'sancoes_ms', 'data_criacao')
+    list_filter = ('status', 'concorrente', 'face_encoding_resultado', 'sancoes_resultado')
+    date_hierarchy = 'data_criacao'
+
+admin.site.register(KycExecucao, KycExecucaoAdmin)
+
+class InvestimentoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'emprestimo', 'investidor', 'valor', 'origem', 'data_criacao')
+    list_filter = ('origem',)
+
+admin.site.register(Investimento, InvestimentoAdmin)
+
+
+class OrdemAutoInvestimentoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'investidor', 'valor_maximo_por_emprestimo', 'saldo_disponivel', 'riscos_aceitos', 'taxa_minima', 'ativa')
+    list_filter = ('ativa',)
+
+admin.site.register(OrdemAutoInvestimento, OrdemAutoInvestimentoAdmin)
+
+
+class ParcelaAdmin(admin.ModelAdmin):
+    list_display = ('emprestimo', 'numero', 'data_vencimento', 'valor', 'valor_amortizacao', 'valor_juros', 'saldo_devedor', 'valor_pago', 'status')
+    list_filter = ('status',)
+
+admin.site.register(Parcela, ParcelaAdmin)
+
+
+class PagamentoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'emprestimo', 'parcela', 'valor', 'data_pagamento', 'arquivo_origem', 'data_registro')
+    search_fields = ('chave_idempotencia',)
+
+admin.site.register(Pagamento, PagamentoAdmin)
+
+
+class ResumoCarteiraAdmin(admin.ModelAdmin):
+    list_display = ('investidor', 'quantidade_investimentos', 'capital_investido', 'retorno_esperado', 'data_atualizacao')
+
+admin.site.register(ResumoCarteira, ResumoCarteiraAdmin)
@@ -0,0 +1,192 @@
+# core/amortizacao.py
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import Emprestimo, Parcela
+
+# Os ids vão em um IN (...): lotes abaixo do limite de parâmetros do SQLite
+TAMANHO_LOTE_PARCELAS = 500
+
+
+def _em_centavos(valores):
+    return np.array([int((Decimal(str(v)) * 100).quantize(Decimal('1'), ROUND_HALF_UP)) for v in valores],
+                    dtype=np.int64)
+
+
+def _arredondar_centavos(valores):
+    # Meio centavo para cima, como ROUND_HALF_UP
+    return np.floor(np.asarray(valores, dtype=np.float64) + 0.5).astype(np.int64)
+
+
+def centavos_para_decimal(centavos):
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+def taxas_price(proporcoes_juros, prazos, iteracoes=60):
+    """
+    Taxa por parcela da Tabela Price que cobra, em juros, a proporção informada do valor financiado
+    em todo o prazo: n·PMT = P·(1 + t), com PMT = P·i / (1 - (1+i)^-n). Bisseção vetorizada em
+    (0, (1+t)/n), já que PMT/P cresce com i e é maior que i.
+    """
+    t = np.asarray(proporcoes_juros, dtype=np.float64)
+    n = np.asarray(prazos, dtype=np.float64)
+    alvo = (1 + t) / n
+    baixo, alto = np.zeros_like(t), alvo.copy()
+    for _ in range(iteracoes):
+        meio = (baixo + alto) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fator = np.where(meio > 0, meio / -np.expm1(-n * np.log1p(meio)), 1 / n)
+        acima = fator > alvo
+        alto = np.where(acima, meio, alto)
+        baixo = np.where(acima, baixo, meio)
+    return np.where(t > 0, (baixo + alto) / 2, 0.0)
+
+
+def calcular_cronogramas(valores, taxas, prazos, sistemas, totais=None):
+    """
+    Calcula os cronogramas de vários empréstimos de uma vez, sem laços em Python.
+    Cada linha das matrizes é um empréstimo e cada coluna uma parcela (zeros após o prazo).
+
+    taxa_juros é o percentual cobrado sobre o valor em todo o prazo (R$ 1000 a 15% em 3 meses
+    = R$ 1150): o total de juros é fixo e o sistema só decide como ele se distribui. Com `totais`
+    (valor_total_pagamento gravado), os juros são exatamente total - valor, então as parcelas de
+    empréstimos já existentes somam o que foi contratado.
+    Price: parcelas iguais (diferença de no máximo 1 centavo); SAC: amortização constante.
+    Nos dois, os juros de cada parcela são proporcionais ao saldo devedor antes dela, na taxa
+    por parcela equivalente ao total contratado.
+    Os valores são int64 em centavos: os acumulados são arredondados (e não cada parcela), então
+    amortizações e juros são >= 0 e somam exatamente o valor financiado e o total de juros.
+    Retorna dict com 'amortizacao', 'juros', 'parcela', 'saldo' e 'ativa' (máscara das parcelas).
+    """
+    principal = _em_centavos(valores)
+    if totais is None:
+        juros_total = (principal * _em_centavos(taxas) + 5000) // 10000
+    else:
+        juros_total = _em_centavos(totais) - principal
+    prazos = np.asarray(prazos, dtype=np.int64)
+    n_max = int(prazos.max()) if len(prazos) else 0
+
+    sac = (np.asarray(sistemas) == 'SAC')[:, None]
+    n = prazos[:, None]
+    k = np.arange(1, n_max + 1)[None, :]
+    ativa = k <= n
+    depois_do_prazo = k >= n
+
+    # Peso de cada parcela nos juros = saldo devedor antes dela (em fração do valor financiado)
+    i = taxas_price(juros_total / np.maximum(principal, 1), prazos)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        fator = np.power(1 + i, n)
+        saldo_price = np.where(i > 0, (fator - np.power(1 + i, k - 1)) / (fator - 1), (n - k + 1) / n)
+        amortizado_price = np.where(i > 0, (np.power(1 + i, k) - 1) / (fator - 1), k / n)
+    peso = np.where(ativa, np.where(sac, (n - k + 1) / n, saldo_price), 0.0)
+    acumulado = np.cumsum(peso, axis=1)
+    fracao = acumulado / np.maximum(acumulado[:, -1:], np.finfo(np.float64).tiny)
+    juros_acumulado = np.where(depois_do_prazo, juros_total[:, None],
+                               _arredondar_centavos(fracao * juros_total[:, None]))
+    juros = np.where(ativa, np.diff(juros_acumulado, axis=1, prepend=0), 0)
+
+    # Price: parcelas acumuladas de total/n arredondadas -> iguais a menos de 1 centavo
+    total = (principal + juros_total)[:, None]
+    pago_acumulado = np.where(depois_do_prazo, total, _arredondar_centavos(total * k / n))
+    amortizacao_price = np.diff(pago_acumulado, axis=1, prepend=0) - juros
+    # Valores de poucos centavos em muitas parcelas podem dar amortização de -1 centavo: nessas linhas
+    # a amortização vem do acumulado teórico arredondado (a parcela varia um centavo a mais)
+    negativa = (amortizacao_price < 0).any(axis=1, keepdims=True)
+    if negativa.any():
+        amortizado = np.where(depois_do_prazo, principal[:, None],
+                              _arredondar_centavos(np.minimum(amortizado_price, 1) * principal[:, None]))
+        amortizacao_price = np.where(negativa, np.diff(amortizado, axis=1, prepend=0), amortizacao_price)
+    amortizacao_sac = (principal // prazos)[:, None] + np.where(k == n, (principal % prazos)[:, None], 0)
+
+    amortizacao = np.where(ativa, np.where(sac, amortizacao_sac, amortizacao_price), 0)
+    saldo = principal[:, None] - np.cumsum(amortizacao, axis=1)
+
+    return {
+        'amortizacao': amortizacao,
+        'juros': juros,
+        'parcela': amortizacao + juros,
+        'saldo': np.where(ativa, saldo, 0),
+        'ativa': ativa,
+    }
+
+
+def calcular_vencimentos(datas_base, n_max):
+    """
+    Vencimentos mensais a partir de cada data base (matriz empréstimos x parcelas), mantendo o dia
+    do mês e usando o último dia nos meses mais curtos (31/01 -> 28/02 -> 31/03).
+    """
+    base = np.asarray(datas_base, dtype='datetime64[D]')
+    mes_base = base.astype('datetime64[M]')
+    dia = (base - mes_base.astype('datetime64[D]')).astype(np.int64)
+    meses = mes_base[:, None] + np.arange(1, n_max + 1)[None, :]
+    inicio = meses.astype('datetime64[D]')
+    dias_no_mes = ((meses + 1).astype('datetime64[D]') - inicio).astype(np.int64)
+    return inicio + np.minimum(dia[:, None], dias_no_mes - 1)
+
+
+def resumo_cronograma(valor, taxa, prazo, sistema='PRICE'):
+    """Valor total a pagar (valor + taxa% do valor) e valor da primeira parcela de um único empréstimo."""
+    cronograma = calcular_cronogramas([valor], [taxa], [prazo], [sistema])
+    return (centavos_para_decimal(cronograma['parcela'].sum()),
+            centavos_para_decimal(cronograma['parcela'][0, 0]))
+
+
+def montar_parcelas(emprestimos, data_base=None):
+    """
+    Objetos Parcela (não gravados) para uma lista de dicts com id, valor_solicitado, taxa_juros,
+    meses_parcelamento, sistema_amortizacao e valor_total_pagamento (as parcelas somam esse total). Todo o cálculo é uma única passada vetorizada;
+    o único laço percorre as parcelas já calculadas para instanciar os objetos.
+    """
+    if not emprestimos:
+        return []
+    data_base = data_base or timezone.localdate()
+
+    cronograma = calcular_cronogramas(
+        [e['valor_solicitado'] for e in emprestimos],
+        [e['taxa_juros'] for e in emprestimos],
+        [e['meses_parcelamento'] for e in emprestimos],
+        [e['sistema_amortizacao'] for e in emprestimos],
+        totais=[e['valor_total_pagamento'] for e in emprestimos],
+    )
+    vencimentos = calcular_vencimentos([data_base] * len(emprestimos), cronograma['parcela'].shape[1])
+
+    linhas, colunas = np.nonzero(cronograma['ativa'])
+    return [
+        Parcela(
+            emprestimo_id=emprestimos[linha]['id'],
+            numero=coluna + 1,
+            data_vencimento=vencimento,
+            valor_amortizacao=centavos_para_decimal(amortizacao),
+            valor_juros=centavos_para_decimal(juros),
+            valor=centavos_para_decimal(parcela),
+            saldo_devedor=centavos_para_decimal(saldo),
+        )
+        for linha, coluna, vencimento, amortizacao, juros, parcela, saldo in zip(
+            linhas.tolist(), colunas.tolist(),
+            vencimentos[linhas, colunas].astype(object).tolist(),
+            cronograma['amortizacao'][linhas, colunas].tolist(),
+            cronograma['juros'][linhas, colunas].tolist(),
+            cronograma['parcela'][linhas, colunas].tolist(),
+            cronograma['saldo'][linhas, colunas].tolist(),
+        )
+    ]
+
+
+def gerar_parcelas(emprestimo_ids, data_base=None):
+    """
+    Gera e grava (bulk_create) o cronograma dos empréstimos financiados informados.
+    Empréstimos que já têm parcelas são ignorados. Retorna quantas parcelas foram criadas.
+    """
+    emprestimo_ids = list(emprestimo_ids)
+    criadas = 0
+    for inicio in range(0, len(emprestimo_ids), TAMANHO_LOTE_PARCELAS):
+        emprestimos = list(Emprestimo.objects
+                           .filter(pk__in=emprestimo_ids[inicio:inicio + TAMANHO_LOTE_PARCELAS])
+                           .filter(~Exists(Parcela.objects.filter(emprestimo=OuterRef('pk'))))
+                           .values('id', 'valor_solicitado', 'taxa_juros', 'meses_parcelamento',
+                                   'sistema_amortizacao', 'valor_total_pagamento'))
+        parcelas = montar_parcelas(emprestimos, data_base)
+        Parcela.objects.bulk_create(parcelas, batch_size=1000)
+        criadas += len(parcelas)
+    return criadas
@@ -0,0 +1,25 @@
+# core/arquivos.py
+import csv
+import json
+
+
+def ler_linhas_arquivo(caminho, formato=None):
+    """
+    Lê um arquivo de importação (CSV com cabeçalho, separado por ',' ou ';', ou JSONL) linha a linha,
+    sem carregá-lo inteiro na memória. Gera (numero_da_linha, dict); linhas JSON inválidas vêm como None.
+    """
+    formato = formato or ('jsonl' if caminho.endswith(('.jsonl', '.json')) else 'csv')
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        if formato == 'jsonl':
+            for numero, linha in enumerate(arquivo, start=1):
+                if linha.strip():
+                    try:
+                        yield numero, json.loads(linha)
+                    except json.JSONDecodeError:
+                        yield numero, None
+        else:
+            amostra = arquivo.readline()
+            delimitador = ';' if amostra.count(';') > amostra.count(',') else ','
+            arquivo.seek(0)
+            for numero, linha in enumerate(csv.DictReader(arquivo, delimiter=delimitador), start=2):
+                yield numero, linha
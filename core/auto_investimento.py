@@ -0,0 +1,194 @@
+# core/auto_investimento.py
+import heapq
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum
+from .amortizacao import gerar_parcelas
+from .carteira import registrar_investimentos, transferir_status
+from .financiamento import transacao_de_escrita
+from .marketplace import invalidar_cache_marketplace
+from .models import CustomUser, Emprestimo, Investimento, OrdemAutoInvestimento
+
+
+def _filas_por_risco(ordens):
+    """
+    Uma fila de prioridade por faixa de risco com as ordens que aceitam aquela faixa.
+    Chave: (rodada, data_criacao, id) -> a ordem mais antiga que ainda não recebeu
+    alocação nesta execução vem primeiro; depois de alocar ela vai para o fim da fila.
+    """
+    filas = {codigo: [] for codigo, _ in CustomUser.RISCO_CHOICES}
+    for ordem in ordens.values():
+        for risco in ordem['riscos']:
+            if risco in filas:
+                filas[risco].append((0, ordem['data_criacao'], ordem['id']))
+    for fila in filas.values():
+        heapq.heapify(fila)
+    return filas
+
+
+def calcular_alocacoes(emprestimos, ordens, ja_investido=None):
+    """
+    Casa empréstimos abertos com ordens de auto-investimento numa única passada, em memória.
+    emprestimos: lista de dicts (id, tomador_id, risco, taxa_juros, valor_solicitado, valor_captado),
+    já na ordem de atendimento. ordens: dict id -> dict (id, investidor_id, riscos, taxa_minima,
+    valor_maximo, saldo, data_criacao). ja_investido: dict (ordem_id, emprestimo_id) -> valor já
+    investido pela ordem em execuções anteriores, descontado do valor_maximo por empréstimo.
+    Atualiza valor_captado/saldo nos próprios dicts e retorna a lista de alocações
+    (emprestimo_id, ordem_id, valor).
+    """
+    ja_investido = ja_investido or {}
+    filas = _filas_por_risco(ordens)
+    alocacoes = []
+    rodada = 0
+
+    for emprestimo in emprestimos:
+        fila = filas.get(emprestimo['risco'])
+        if not fila:
+            continue
+
+        restante = emprestimo['valor_solicitado'] - emprestimo['valor_captado']
+        devolver = []  # Entradas retiradas da fila que voltam para ela após este empréstimo
+        while restante > 0 and fila:
+            entrada = heapq.heappop(fila)
+            ordem = ordens[entrada[2]]
+            if ordem['saldo'] <= 0:
+                continue  # Saldo esgotado (por outra faixa de risco): sai da fila de vez
+            limite = ordem['valor_maximo'] - ja_investido.get((ordem['id'], emprestimo['id']), 0)
+            if (limite <= 0 or ordem['taxa_minima'] > emprestimo['taxa_juros']
+                    or ordem['investidor_id'] == emprestimo['tomador_id']):
+                devolver.append(entrada)
+                continue
+
+            valor = min(restante, limite, ordem['saldo'])
+            alocacoes.append((emprestimo['id'], ordem['id'], valor))
+            ordem['saldo'] -= valor
+            restante -= valor
+            rodada += 1
+            if ordem['saldo'] > 0:
+                devolver.append((rodada, entrada[1], entrada[2]))
+
+        for entrada in devolver:
+            heapq.heappush(fila, entrada)
+        emprestimo['valor_captado'] = emprestimo['valor_solicitado'] - restante
+
+    return alocacoes
+
+
+class _Conflito(Exception):
+    """Empréstimo ou ordem alterado por outra transação entre a leitura e a gravação."""
+
+
+def _aplicar_alocacoes_do_emprestimo(emprestimo_id, partes):
+    """
+    Grava as alocações de um empréstimo com UPDATEs condicionais, como em financiamento.financiar:
+    incrementa valor_captado só se ainda couber (WHERE status='AGUARDANDO' AND valor_captado + total
+    <= valor_solicitado) e debita cada ordem só se o saldo ainda cobrir o valor. Tudo num savepoint:
+    se alguma linha não for afetada, nada deste empréstimo é gravado. Retorna True se o empréstimo
+    ficou completamente financiado.
+    """
+    total = sum(valor for _, valor in partes)
+    with transaction.atomic():
+        captados = (Emprestimo.objects
+                    .filter(pk=emprestimo_id, status='AGUARDANDO', valor_captado__lte=F('valor_solicitado') - total)
+                    .update(valor_captado=F('valor_captado') + total))
+        if not captados:
+            raise _Conflito
+        for ordem_id, valor in partes:
+            debitadas = (OrdemAutoInvestimento.objects
+                         .filter(pk=ordem_id, ativa=True, saldo_disponivel__gte=valor)
+                         .update(saldo_disponivel=F('saldo_disponivel') - valor))
+            if not debitadas:
+                raise _Conflito
+        return bool(Emprestimo.objects
+                    .filter(pk=emprestimo_id, status='AGUARDANDO', valor_captado=F('valor_solicitado'))
+                    .update(status='FINANCIADO'))
+
+
+@transacao_de_escrita()
+def executar_auto_investimento():
+    """
+    Executa uma rodada do motor: carrega os empréstimos abertos e as ordens ativas com uma
+    consulta cada e calcula as alocações em memória. A gravação não escreve os valores calculados
+    aqui: cada empréstimo recebe um incremento condicional (F('valor_captado') + total) e cada ordem
+    um débito condicional, conferindo as linhas afetadas. Assim um financiamento manual ou outra
+    rodada concorrente nunca é sobrescrito, mesmo onde SELECT ... FOR UPDATE SKIP LOCKED não trava
+    nada (SQLite); as alocações de um empréstimo alterado no meio do caminho ficam para a próxima rodada.
+    O valor_maximo_por_emprestimo vale para a ordem no empréstimo, somando as execuções anteriores.
+    Retorna um dict com o resumo da rodada.
+    """
+    emprestimos = list(Emprestimo.objects
+                       .select_for_update(skip_locked=True, of=('self',))
+                       .filter(status='AGUARDANDO', valor_captado__lt=F('valor_solicitado'))
+                       .order_by('data_criacao', 'id')
+                       .values('id', 'tomador_id', 'taxa_juros', 'valor_solicitado', 'valor_captado',
+                               'valor_total_pagamento', risco=F('tomador__risco')))
+
+    ordens = {}
+    for ordem in (OrdemAutoInvestimento.objects
+                  .select_for_update(skip_locked=True, of=('self',))
+                  .filter(ativa=True, saldo_disponivel__gt=0, investidor__kyc_status='APROVADO')
+                  .values('id', 'investidor_id', 'riscos_aceitos', 'taxa_minima',
+                          'valor_maximo_por_emprestimo', 'saldo_disponivel', 'data_criacao')):
+        ordens[ordem['id']] = {
+            'id': ordem['id'],
+            'investidor_id': ordem['investidor_id'],
+            'riscos': [r for r in ordem['riscos_aceitos'].split(',') if r],
+            'taxa_minima': ordem['taxa_minima'],
+            'valor_maximo': ordem['valor_maximo_por_emprestimo'],
+            'saldo': ordem['saldo_disponivel'],
+            'data_criacao': ordem['data_criacao'],
+        }
+
+    # O que cada ordem já investiu em cada empréstimo aberto, numa consulta
+    ja_investido = {
+        (linha['ordem_id'], linha['emprestimo_id']): linha['total']
+        for linha in (Investimento.objects
+                      .filter(ordem_id__in=list(ordens), emprestimo__status='AGUARDANDO')
+                      .values('ordem_id', 'emprestimo_id').annotate(total=Sum('valor')).order_by())
+    } if ordens and emprestimos else {}
+
+    resumo = {'emprestimos_abertos': len(emprestimos), 'ordens_ativas': len(ordens), 'investimentos': 0,
+              'valor_alocado': Decimal('0.00'), 'emprestimos_financiados': 0, 'alocacoes_descartadas': 0}
+    alocacoes = calcular_alocacoes(emprestimos, ordens, ja_investido)
+    if not alocacoes:
+        return resumo
+
+    por_emprestimo = {}
+    for emprestimo_id, ordem_id, valor in alocacoes:
+        por_emprestimo.setdefault(emprestimo_id, []).append((ordem_id, valor))
+
+    aplicadas = []
+    financiados = []
+    for emprestimo_id, partes in por_emprestimo.items():
+        try:
+            if _aplicar_alocacoes_do_emprestimo(emprestimo_id, partes):
+                financiados.append(emprestimo_id)
+        except _Conflito:
+            resumo['alocacoes_descartadas'] += len(partes)
+            continue
+        aplicadas.extend((emprestimo_id, ordem_id, valor) for ordem_id, valor in partes)
+
+    por_id = {emprestimo['id']: emprestimo for emprestimo in emprestimos}
+    Investimento.objects.bulk_create([
+        Investimento(emprestimo_id=emprestimo_id, investidor_id=ordens[ordem_id]['investidor_id'],
+                     valor=valor, origem='AUTOMATICO', ordem_id=ordem_id, risco_tomador=por_id[emprestimo_id]['risco'])
+        for emprestimo_id, ordem_id, valor in aplicadas
+    ], batch_size=1000)
+
+    registrar_investimentos([
+        (ordens[ordem_id]['investidor_id'], valor, por_id[emprestimo_id]['risco'], 'AGUARDANDO',
+         por_id[emprestimo_id]['valor_solicitado'], por_id[emprestimo_id]['valor_total_pagamento'])
+        for emprestimo_id, ordem_id, valor in aplicadas
+    ])
+
+    # Cronogramas de todos os empréstimos completados nesta rodada em uma passada vetorizada
+    gerar_parcelas(financiados)
+    transferir_status(financiados, 'AGUARDANDO', 'FINANCIADO')
+
+    transaction.on_commit(invalidar_cache_marketplace)
+    resumo.update({
+        'investimentos': len(aplicadas),
+        'valor_alocado': sum((valor for _, _, valor in aplicadas), Decimal('0.00')),
+        'emprestimos_financiados': len(financiados),
+    })
+    return resumo
@@ -0,0 +1,117 @@
+# core/carteira.py
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import Investimento, ResumoCarteira
+
+CAMPOS_RISCO = {
+    'BAIXO': 'capital_risco_baixo',
+    'MEDIO': 'capital_risco_medio',
+    'ALTO': 'capital_risco_alto',
+    'NAO_CALCULADO': 'capital_risco_nao_calculado',
+}
+CAMPOS_STATUS = {
+    'AGUARDANDO': 'capital_aguardando',
+    'FINANCIADO': 'capital_financiado',
+    'FINALIZADO': 'capital_finalizado',
+}
+CAMPOS_VALOR = (['capital_investido', 'retorno_esperado'] + list(CAMPOS_RISCO.values())
+                + list(CAMPOS_STATUS.values()))
+
+
+def retorno_esperado(valor, valor_solicitado, valor_total_pagamento):
+    """Parte do total a receber do empréstimo proporcional ao valor investido."""
+    return (valor * valor_total_pagamento / valor_solicitado).quantize(Decimal('0.01'))
+
+
+def _acumular(deltas, investidor_id, valor, risco, status, retorno):
+    delta = deltas[investidor_id]
+    delta['quantidade_investimentos'] += 1
+    delta['capital_investido'] += valor
+    delta['retorno_esperado'] += retorno
+    delta[CAMPOS_RISCO.get(risco, 'capital_risco_nao_calculado')] += valor
+    delta[CAMPOS_STATUS[status]] += valor
+
+
+def _novos_deltas():
+    # int como valor inicial: a contagem continua inteira e os valores viram Decimal na primeira soma
+    return defaultdict(lambda: defaultdict(int))
+
+
+def aplicar_deltas(deltas):
+    """
+    Soma os deltas {investidor_id: {campo: valor}} aos resumos com UPDATE ... SET campo = campo + x
+    (uma instrução por investidor, sem ler a linha antes). Resumos inexistentes são criados zerados.
+    """
+    if not deltas:
+        return
+    ResumoCarteira.objects.bulk_create([ResumoCarteira(investidor_id=i) for i in deltas], ignore_conflicts=True)
+    agora = timezone.now()
+    for investidor_id, delta in deltas.items():
+        campos = {campo: F(campo) + valor for campo, valor in delta.items() if valor}
+        if campos:
+            ResumoCarteira.objects.filter(pk=investidor_id).update(data_atualizacao=agora, **campos)
+
+
+def registrar_investimentos(investimentos):
+    """
+    Contabiliza novos investimentos. Cada item: (investidor_id, valor, risco_do_tomador, status_do_emprestimo,
+    valor_solicitado, valor_total_pagamento); o risco é o gravado em Investimento.risco_tomador.
+    """
+    deltas = _novos_deltas()
+    for investidor_id, valor, risco, status, valor_solicitado, valor_total in investimentos:
+        _acumular(deltas, investidor_id, valor, risco, status,
+                  retorno_esperado(valor, valor_solicitado, valor_total))
+    aplicar_deltas(deltas)
+
+
+def transferir_status(emprestimo_ids, status_anterior, status_novo):
+    """
+    Move o capital dos investidores desses empréstimos de uma coluna de status para outra.
+    Uma consulta agregada por investidor e um UPDATE por investidor afetado.
+    """
+    if not emprestimo_ids:
+        return
+    origem, destino = CAMPOS_STATUS[status_anterior], CAMPOS_STATUS[status_novo]
+    deltas = _novos_deltas()
+    for investidor_id, total in (Investimento.objects.filter(emprestimo_id__in=emprestimo_ids)
+                                 .values('investidor_id').annotate(total=Sum('valor'))
+                                 .values_list('investidor_id', 'total')):
+        deltas[investidor_id][origem] -= total
+        deltas[investidor_id][destino] += total
+    aplicar_deltas(deltas)
+
+
+@transaction.atomic
+def reconstruir_resumos(tamanho_lote=5000):
+    """
+    Reconstrói todos os resumos a partir dos Investimentos, percorrendo-os em streaming
+    (memória proporcional ao número de investidores) com o mesmo arredondamento e a mesma faixa de
+    risco (a do investimento, não a atual do tomador) do caminho incremental. Retorna (investidores com resumo, resumos que estavam divergentes).
+    """
+    deltas = _novos_deltas()
+    for inv in (Investimento.objects
+                .values('investidor_id', 'valor', 'risco_tomador', 'emprestimo__status',
+                        'emprestimo__valor_solicitado', 'emprestimo__valor_total_pagamento')
+                .iterator(chunk_size=tamanho_lote)):
+        _acumular(deltas, inv['investidor_id'], inv['valor'], inv['risco_tomador'],
+                  inv['emprestimo__status'],
+                  retorno_esperado(inv['valor'], inv['emprestimo__valor_solicitado'],
+                                   inv['emprestimo__valor_total_pagamento']))
+
+    campos = ['quantidade_investimentos'] + CAMPOS_VALOR
+    anteriores = {linha[0]: linha[1:] for linha in ResumoCarteira.objects.values_list('investidor_id', *campos)}
+    divergentes = sum(
+        1 for investidor_id in set(anteriores) | set(deltas)
+        if anteriores.get(investidor_id, (0,) * len(campos)) != tuple(deltas[investidor_id][c] for c in campos)
+    )
+
+    agora = timezone.now()
+    ResumoCarteira.objects.all().delete()
+    ResumoCarteira.objects.bulk_create([
+        ResumoCarteira(investidor_id=investidor_id, data_atualizacao=agora, **delta)
+        for investidor_id, delta in deltas.items()
+    ], batch_size=tamanho_lote)
+    return len(deltas), divergentes
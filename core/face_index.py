@@ -0,0 +1,132 @@
+# core/face_index.py
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from .models import CustomUser
+
+DIMENSAO_ENCODING = 128
+
+
+class IndiceFacial:
+    """
+    Índice em memória dos encodings faciais (selfies) dos usuários aprovados.
+    Guarda uma matriz N x 128 (float32) e as normas ao quadrado de cada linha, de forma que a
+    distância de um rosto para toda a base sai de um único produto matriz-vetor:
+    ||a - b||² = ||a||² + ||b||² - 2·a·b
+    """
+
+    def __init__(self, ids=None, matriz=None):
+        self.ids = np.asarray(ids if ids is not None else [], dtype=np.int64)
+        if matriz is None:
+            matriz = np.empty((0, DIMENSAO_ENCODING), dtype=np.float32)
+        # Cópia própria e gravável: a matriz do banco vem de np.frombuffer (somente leitura) e adicionar() a altera
+        self.matriz = np.array(matriz, dtype=np.float32).reshape(-1, DIMENSAO_ENCODING)
+        self.normas = np.einsum('ij,ij->i', self.matriz, self.matriz)
+        self.construido_em = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def construir_do_banco(cls, tamanho_lote=2000):
+        """Monta o índice a partir dos encodings salvos dos usuários com KYC aprovado."""
+        linhas = (CustomUser.objects
+                  .filter(kyc_status='APROVADO', encoding_selfie__isnull=False)
+                  .values_list('id', 'encoding_selfie')
+                  .iterator(chunk_size=tamanho_lote))
+
+        ids, blocos = [], []
+        for usuario_id, encoding in linhas:
+            encoding = bytes(encoding)
+            if len(encoding) == DIMENSAO_ENCODING * 4:
+                ids.append(usuario_id)
+                blocos.append(encoding)
+
+        matriz = np.frombuffer(b''.join(blocos), dtype=np.float32).reshape(-1, DIMENSAO_ENCODING)
+        return cls(ids, matriz)
+
+    def adicionar(self, usuario_id, encoding):
+        """Inclui (ou substitui) o encoding de um usuário no índice."""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(1, DIMENSAO_ENCODING)
+        posicoes = np.flatnonzero(self.ids == usuario_id)
+        if len(posicoes):
+            self.matriz[posicoes[0]] = encoding[0]
+            self.normas[posicoes[0]] = float(encoding[0] @ encoding[0])
+            return
+
+        self.ids = np.append(self.ids, np.int64(usuario_id))
+        self.matriz = np.vstack([self.matriz, encoding])
+        self.normas = np.append(self.normas, np.float32(encoding[0] @ encoding[0]))
+
+    def consultar(self, encoding, limiar=0.5, excluir_id=None, max_resultados=10):
+        """
+        Retorna uma lista [(usuario_id, distancia), ...] com os rostos da base a uma distância
+        euclidiana menor ou igual a `limiar`, do mais próximo para o mais distante.
+        """
+        if not len(self.ids):
+            return []
+
+        consulta = np.asarray(encoding, dtype=np.float32).reshape(DIMENSAO_ENCODING)
+        distancias2 = self.normas + float(consulta @ consulta) - 2.0 * (self.matriz @ consulta)
+        distancias = np.sqrt(np.maximum(distancias2, 0.0))
+
+        candidatos = distancias <= limiar
+        if excluir_id is not None:
+            candidatos &= self.ids != excluir_id
+
+        posicoes = np.flatnonzero(candidatos)
+        posicoes = posicoes[np.argsort(distancias[posicoes])][:max_resultados]
+        return [(int(self.ids[p]), float(distancias[p])) for p in posicoes]
+
+    def pares_semelhantes(self, limiar=0.5, tamanho_bloco=1024):
+        """
+        Gera todos os pares (id_a, id_b, distancia) da base com distância <= limiar.
+        A matriz de distâncias é calculada em blocos de linhas para limitar a memória a
+        tamanho_bloco x N.
+        """
+        total = len(self.ids)
+        for inicio in range(0, total, tamanho_bloco):
+            fim = min(inicio + tamanho_bloco, total)
+            bloco = self.matriz[inicio:fim]
+            distancias2 = self.normas[inicio:fim, None] + self.normas[None, :] - 2.0 * (bloco @ self.matriz.T)
+
+            linhas, colunas = np.nonzero(distancias2 <= limiar * limiar)
+            linhas = linhas + inicio
+            # Cada par aparece uma única vez (a < b) e um rosto não é comparado consigo mesmo
+            manter = colunas > linhas
+            for a, b in zip(linhas[manter], colunas[manter]):
+                distancia = float(np.sqrt(max(distancias2[a - inicio, b], 0.0)))
+                yield int(self.ids[a]), int(self.ids[b]), distancia
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def obter_indice_facial():
+    """
+    Retorna o índice do processo atual, reconstruindo-o a partir do banco quando ainda não
+    existe ou quando passou de settings.KYC_INDICE_FACIAL_TTL segundos (aprovações feitas
+    por outros workers).
+    """
+    global _indice
+    ttl = getattr(settings, 'KYC_INDICE_FACIAL_TTL', 300)
+    with _lock_indice:
+        if _indice is None or time.monotonic() - _indice.construido_em > ttl:
+            _indice = IndiceFacial.construir_do_banco()
+        return _indice
+
+
+def buscar_duplicidade_facial(usuario_id, encoding, limiar=None):
+    """Retorna [(usuario_id, distancia), ...] dos usuários aprovados com rosto praticamente igual ao informado."""
+    if limiar is None:
+        limiar = getattr(settings, 'KYC_LIMIAR_DUPLICIDADE_FACIAL', 0.5)
+    return obter_indice_facial().consultar(encoding, limiar, excluir_id=usuario_id)
+
+
+def registrar_rosto_aprovado(usuario_id, encoding):
+    """Inclui no índice do processo o rosto de um usuário recém-aprovado."""
+    with _lock_indice:
+        if _indice is not None:
+            _indice.adicionar(usuario_id, encoding)
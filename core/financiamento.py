@@ -0,0 +1,140 @@
+# core/financiamento.py
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import F
+from .amortizacao import gerar_parcelas
+from .carteira import registrar_investimentos, transferir_status
+from .marketplace import invalidar_cache_marketplace
+from .models import CustomUser, Emprestimo, Investimento
+
+# Quantas vezes o financiamento integral relê o valor restante quando outro
+# investidor captou uma parte entre a leitura e o UPDATE
+TENTATIVAS_FINANCIAMENTO_INTEGRAL = 3
+
+
+class ErroFinanciamento(Exception):
+    def __init__(self, mensagem, status_http=400):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.status_http = status_http
+
+
+@contextmanager
+def transacao_de_escrita(using=None):
+    """
+    transaction.atomic() para os caminhos que leem e depois escrevem sob concorrência (financiamentos).
+    No SQLite, a transação já começa com o lock de escrita (BEGIN IMMEDIATE): concorrentes esperam o
+    timeout da conexão em vez de falhar com "database is locked" ao promover o lock de leitura.
+    Só as transações abertas aqui mudam de modo; as demais continuam DEFERRED. Nos outros bancos, e
+    dentro de uma transação já aberta, equivale a transaction.atomic().
+    """
+    conexao = transaction.get_connection(using)
+    if conexao.vendor != 'sqlite' or conexao.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # O modo é lido da configuração a cada nova conexão; por isso a conexão é aberta antes de alterá-lo
+    conexao.ensure_connection()
+    modo_anterior = conexao.transaction_mode
+    conexao.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # O BEGIN já foi emitido: as próximas transações desta conexão voltam ao modo configurado
+            conexao.transaction_mode = modo_anterior
+            yield
+    finally:
+        conexao.transaction_mode = modo_anterior
+
+
+def _converter_valor(valor):
+    if valor is None:
+        return None
+    try:
+        valor = Decimal(str(valor)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ErroFinanciamento('Valor de investimento inválido.')
+    if valor <= 0:
+        raise ErroFinanciamento('O valor do investimento deve ser maior que zero.')
+    return valor
+
+
+def _motivo_recusa(emprestimo_id, investidor_id):
+    # Nenhuma linha afetada: a leitura para explicar o motivo só acontece no caminho de erro
+    emprestimo = (Emprestimo.objects.filter(pk=emprestimo_id)
+                  .values('status', 'tomador_id', 'valor_solicitado', 'valor_captado').first())
+    if emprestimo is None:
+        return ErroFinanciamento('Empréstimo ou Investidor não encontrado.', 404)
+    if emprestimo['status'] != 'AGUARDANDO':
+        return ErroFinanciamento('Este empréstimo não está mais disponível para investimento.')
+    if emprestimo['tomador_id'] == investidor_id:
+        return ErroFinanciamento('Você não pode financiar seu próprio empréstimo.')
+    restante = emprestimo['valor_solicitado'] - emprestimo['valor_captado']
+    return ErroFinanciamento(f'O valor excede o restante a captar (R$ {restante:.2f}).')
+
+
+def financiar(emprestimo_id, investidor_id, valor=None):
+    """
+    Financia um empréstimo, inteiro (valor=None) ou em parte, sem locks: um único UPDATE condicional
+    (WHERE id = ? AND status = 'AGUARDANDO' AND valor_captado + valor <= valor_solicitado
+    AND tomador <> investidor) incrementa valor_captado. Requisições concorrentes nunca captam
+    além do valor solicitado; quem chega depois recebe ErroFinanciamento.
+    Deve ser chamado dentro de uma transação, de preferência transacao_de_escrita() (o Investimento é
+    gravado junto do UPDATE).
+    Retorna (investimento, status_do_emprestimo).
+    """
+    valor = _converter_valor(valor)
+
+    try:
+        kyc_status = CustomUser.objects.values_list('kyc_status', flat=True).get(pk=investidor_id)
+    except CustomUser.DoesNotExist:
+        raise ErroFinanciamento('Empréstimo ou Investidor não encontrado.', 404)
+
+    if kyc_status != 'APROVADO':
+        raise ErroFinanciamento('Ação não permitida. O KYC do investidor não está aprovado.', 403)
+
+    tentativas = TENTATIVAS_FINANCIAMENTO_INTEGRAL
+    while True:
+        valor_investido = valor
+        if valor is None:
+            # Financiamento integral: investe o que falta captar no momento
+            linha = (Emprestimo.objects.filter(pk=emprestimo_id, status='AGUARDANDO')
+                     .values_list('valor_solicitado', 'valor_captado').first())
+            if linha is None:
+                raise _motivo_recusa(emprestimo_id, investidor_id)
+            valor_investido = linha[0] - linha[1]
+
+        captados = (Emprestimo.objects
+                    .filter(pk=emprestimo_id, status='AGUARDANDO',
+                            valor_captado__lte=F('valor_solicitado') - valor_investido)
+                    .exclude(tomador_id=investidor_id)
+                    .update(valor_captado=F('valor_captado') + valor_investido))
+        if captados:
+            break
+        tentativas -= 1
+        if valor is not None or tentativas <= 0:
+            raise _motivo_recusa(emprestimo_id, investidor_id)
+
+    emprestimo = (Emprestimo.objects.filter(pk=emprestimo_id)
+                  .values('tomador__risco', 'valor_solicitado', 'valor_total_pagamento').get())
+    investimento = Investimento.objects.create(
+        emprestimo_id=emprestimo_id, investidor_id=investidor_id, valor=valor_investido, origem='MANUAL',
+        risco_tomador=emprestimo['tomador__risco'])
+    registrar_investimentos([(investidor_id, valor_investido, emprestimo['tomador__risco'], 'AGUARDANDO',
+                              emprestimo['valor_solicitado'], emprestimo['valor_total_pagamento'])])
+
+    # Quem completa a captação fecha o empréstimo. O investidor "principal" só é gravado
+    # quando um único investimento cobriu o valor inteiro.
+    fechamento = {'status': 'FINANCIADO'}
+    if valor is None and valor_investido == linha[0]:
+        fechamento['investidor_id'] = investidor_id
+    financiado = (Emprestimo.objects
+                  .filter(pk=emprestimo_id, status='AGUARDANDO', valor_captado=F('valor_solicitado'))
+                  .update(**fechamento))
+    if financiado:
+        gerar_parcelas([emprestimo_id])
+        transferir_status([emprestimo_id], 'AGUARDANDO', 'FINANCIADO')
+
+    transaction.on_commit(invalidar_cache_marketplace)
+    return investimento, 'FINANCIADO' if financiado else 'AGUARDANDO'
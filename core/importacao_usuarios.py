@@ -0,0 +1,171 @@
+# core/importacao_usuarios.py
+from collections import Counter
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .arquivos import ler_linhas_arquivo
+from .models import AlertaSancao, CustomUser, SancaoRestritiva
+from .senhas import PoolHashSenhas
+from .validators import cpfs_para_inteiros, normalizar_documento, validar_cpfs_em_lote
+
+TAMANHO_LOTE_PADRAO = 2000
+
+
+def _interpretar_linha(linha):
+    """Converte uma linha do arquivo. Retorna dict normalizado ou lança ValueError com o motivo."""
+    if not isinstance(linha, dict):
+        raise ValueError('linha malformada')
+
+    username = str(linha.get('username') or '').strip()
+    if not username:
+        raise ValueError('username ausente')
+    if len(username) > 150:
+        raise ValueError('username longo demais')
+
+    try:
+        data_nascimento = (date.fromisoformat(str(linha['data_nascimento']).strip())
+                           if linha.get('data_nascimento') else None)
+        renda_mensal = Decimal(str(linha.get('renda_mensal') or '0').replace(',', '.')).quantize(Decimal('0.01'))
+    except (ValueError, InvalidOperation):
+        raise ValueError('data_nascimento ou renda_mensal inválida')
+
+    return {
+        'username': username,
+        'email': str(linha.get('email') or '').strip(),
+        'cpf': normalizar_documento(linha.get('cpf')),
+        'senha': linha.get('password') or None,
+        'first_name': str(linha.get('first_name') or '').strip()[:150],
+        'last_name': str(linha.get('last_name') or '').strip()[:150],
+        'data_nascimento': data_nascimento,
+        'renda_mensal': renda_mensal,
+    }
+
+
+def _separar_duplicados(candidatos, rejeitar):
+    """
+    Remove candidatos cujo CPF/username repete no lote ou já existe no banco (uma consulta para cada).
+    O CPF é comparado pela chave inteira, independente de como foi formatado em cada cadastro.
+    """
+    cpfs_existentes = set(CustomUser.objects.filter(cpf_numero__in=[c['cpf_numero'] for _, c in candidatos])
+                          .values_list('cpf_numero', flat=True))
+    usernames_existentes = set(CustomUser.objects.filter(username__in=[c['username'] for _, c in candidatos])
+                               .values_list('username', flat=True))
+    aceitos = []
+    for numero, candidato in candidatos:
+        if candidato['cpf_numero'] in cpfs_existentes:
+            rejeitar(numero, candidato, 'CPF duplicado')
+        elif candidato['username'] in usernames_existentes:
+            rejeitar(numero, candidato, 'username duplicado')
+        else:
+            cpfs_existentes.add(candidato['cpf_numero'])
+            usernames_existentes.add(candidato['username'])
+            aceitos.append((numero, candidato))
+    return aceitos
+
+
+def _inserir_lote(aceitos, hashes, origem, bloquear):
+    """
+    Grava o lote com o KYC pendente. Os CPFs do lote são cruzados com as listas restritivas em uma
+    consulta: quem aparece ganha um AlertaSancao e, com bloquear, já entra com o KYC reprovado.
+    Retorna quantos usuários do lote estavam em alguma lista.
+    """
+    sancoes = {}
+    for sancao in (SancaoRestritiva.objects.filter(cpf_numero__in=[c['cpf_numero'] for _, c in aceitos])
+                   .values('cpf_numero', 'fonte', 'documento', 'nome', 'primeira_carga')):
+        sancoes.setdefault(sancao['cpf_numero'], []).append(sancao)
+
+    # bulk_create não passa pelo save(): cpf_numero vai explícito
+    usuarios = [
+        CustomUser(username=c['username'], email=c['email'], cpf=c['cpf'], cpf_numero=c['cpf_numero'],
+                   password=senha_hash, first_name=c['first_name'], last_name=c['last_name'],
+                   data_nascimento=c['data_nascimento'], renda_mensal=c['renda_mensal'], origem_cadastro=origem,
+                   kyc_status='REPROVADO' if bloquear and c['cpf_numero'] in sancoes else 'PENDENTE')
+        for (_, c), senha_hash in zip(aceitos, hashes)
+    ]
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(usuarios, batch_size=1000)
+        if sancoes:
+            ids = dict(CustomUser.objects.filter(cpf_numero__in=sancoes).values_list('cpf_numero', 'pk'))
+            AlertaSancao.objects.bulk_create([
+                AlertaSancao(usuario_id=ids[cpf_numero], fonte=sancao['fonte'], documento=sancao['documento'],
+                             nome_sancionado=sancao['nome'], versao_carga=sancao['primeira_carga'], bloqueado=bloquear)
+                for cpf_numero, lista in sancoes.items() for sancao in lista
+            ], batch_size=1000)
+    return len(sancoes)
+
+
+def importar_usuarios(linhas, tamanho_lote=TAMANHO_LOTE_PADRAO, processos=None, origem='', ao_rejeitar=None,
+                      bloquear=None):
+    """
+    Cadastra usuários em massa a partir de um fluxo de linhas (numero_da_linha, dict), em lotes:
+    validação dos CPFs do lote, checagem de duplicidade com uma consulta por lote, hashes de
+    senha em um pool de processos e bulk_create. Linhas rejeitadas são contadas e repassadas a
+    ao_rejeitar(numero, linha, motivo) sem interromper a importação.
+    Os usuários entram com o KYC pendente (o KYC automático continua obrigatório), cruzados com as
+    listas restritivas e com `origem` gravada em origem_cadastro.
+    Retorna um Counter com os totais.
+    """
+    if bloquear is None:
+        bloquear = getattr(settings, 'TRIAGEM_SANCOES_BLOQUEAR', True)
+
+    totais = Counter()
+
+    def rejeitar(numero, linha, motivo):
+        totais['rejeitados'] += 1
+        totais[f'rejeitados: {motivo}'] += 1
+        if ao_rejeitar:
+            ao_rejeitar(numero, linha, motivo)
+
+    linhas = iter(linhas)
+    with PoolHashSenhas(processos) as pool:
+        while True:
+            lote = list(islice(linhas, tamanho_lote))
+            if not lote:
+                break
+            totais['linhas'] += len(lote)
+
+            interpretados = []
+            for numero, linha in lote:
+                try:
+                    interpretados.append((numero, _interpretar_linha(linha)))
+                except ValueError as e:
+                    rejeitar(numero, linha, str(e))
+
+            # CPFs do lote inteiro validados e convertidos para inteiro de uma vez
+            cpfs = [c['cpf'] for _, c in interpretados]
+            candidatos = []
+            for (numero, candidato), valido, cpf_numero in zip(interpretados, validar_cpfs_em_lote(cpfs),
+                                                                cpfs_para_inteiros(cpfs).tolist()):
+                if not valido:
+                    rejeitar(numero, candidato, 'CPF inválido')
+                    continue
+                candidato['cpf_numero'] = cpf_numero
+                candidatos.append((numero, candidato))
+
+            aceitos = _separar_duplicados(candidatos, rejeitar)
+            if not aceitos:
+                continue
+
+            # A parte cara (PBKDF2) roda em paralelo; só os aceitos são processados
+            hashes = pool.gerar_hashes([c['senha'] for _, c in aceitos])
+            try:
+                totais['sancionados'] += _inserir_lote(aceitos, hashes, origem, bloquear)
+            except IntegrityError:
+                # Outro cadastro entrou entre a checagem e o INSERT: refaz a checagem e tenta de novo
+                por_numero = {numero: h for (numero, _), h in zip(aceitos, hashes)}
+                aceitos = _separar_duplicados(aceitos, rejeitar)
+                totais['sancionados'] += _inserir_lote(aceitos, [por_numero[numero] for numero, _ in aceitos],
+                                                       origem, bloquear)
+            totais['criados'] += len(aceitos)
+
+    return totais
+
+
+def ler_arquivo_usuarios(caminho, formato=None):
+    """
+    Lê um arquivo de usuários (CSV ou JSONL) em streaming. Colunas: username, cpf e, opcionais,
+    password, email, first_name, last_name, data_nascimento (AAAA-MM-DD), renda_mensal.
+    """
+    return ler_linhas_arquivo(caminho, formato)
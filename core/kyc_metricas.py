@@ -0,0 +1,95 @@
+# core/kyc_metricas.py
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+from .models import KycExecucao
+
+ETAPAS = KycExecucao.ETAPAS
+PERCENTIS = (50, 95, 99)
+
+
+class CronometroKyc:
+    """
+    Coleta o tempo (ms) e o resultado de cada etapa de uma execução do KYC. As etapas rodam em
+    threads diferentes, mas cada uma só escreve as próprias chaves.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tempos = {}
+        self.resultados = {}
+
+    def somar(self, etapa, segundos):
+        self.tempos[etapa] = self.tempos.get(etapa, 0.0) + segundos * 1000
+
+    def registrar(self, etapa, resultado):
+        self.resultados[etapa] = resultado
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.somar(etapa, time.perf_counter() - inicio)
+
+
+def registrar_execucao(cronometro, usuario_id, status, concorrente, tamanhos=None, motivo_falha=''):
+    """
+    Grava a execução com o que o cronômetro coletou até aqui. Falhas ao gravar só são registradas
+    no log: a métrica nunca derruba o KYC.
+    """
+    tempos, resultados = dict(cronometro.tempos), dict(cronometro.resultados)
+    campos = {}
+    for etapa in ETAPAS:
+        campos[f'{etapa}_ms'] = round(tempos[etapa]) if etapa in tempos else None
+        campos[f'{etapa}_resultado'] = resultados.get(etapa, '')
+    try:
+        return KycExecucao.objects.create(
+            usuario_id=usuario_id, status=status, motivo_falha=str(motivo_falha)[:255], concorrente=concorrente,
+            duracao_total_ms=round((time.perf_counter() - cronometro.inicio) * 1000),
+            **{f'bytes_{campo}': tamanho for campo, tamanho in (tamanhos or {}).items()}, **campos)
+    except Exception as e:
+        print(f"Erro ao registrar a execução do KYC: {e}")
+        return None
+
+
+def _percentis(valores):
+    valores = valores[~np.isnan(valores)]
+    if not len(valores):
+        return {'amostras': 0}
+    resumo = {f'p{p}': round(float(v), 1) for p, v in zip(PERCENTIS, np.percentile(valores, PERCENTIS))}
+    return {'amostras': int(len(valores)), 'media': round(float(valores.mean()), 1), **resumo}
+
+
+def resumo_execucoes(inicio, fim=None):
+    """
+    Percentis (p50/p95/p99, em ms) do tempo de cada etapa e do total das execuções do KYC na janela,
+    com a contagem dos resultados de cada etapa e a etapa com maior p95.
+    """
+    execucoes = KycExecucao.objects.filter(data_criacao__gte=inicio)
+    if fim is not None:
+        execucoes = execucoes.filter(data_criacao__lt=fim)
+
+    colunas_ms = [f'{etapa}_ms' for etapa in ETAPAS] + ['duracao_total_ms']
+    colunas_resultado = [f'{etapa}_resultado' for etapa in ETAPAS]
+    linhas = list(execucoes.values_list(*colunas_ms, *colunas_resultado, 'status'))
+
+    # None (etapa não concluída) vira NaN e fica fora dos percentis daquela etapa
+    tempos = np.array([linha[:len(colunas_ms)] for linha in linhas], dtype=float).reshape(-1, len(colunas_ms))
+    etapas = {}
+    for i, etapa in enumerate(ETAPAS):
+        etapas[etapa] = _percentis(tempos[:, i])
+        etapas[etapa]['resultados'] = dict(Counter(linha[len(colunas_ms) + i] or 'NAO_CONCLUIDA' for linha in linhas))
+
+    medidas = {etapa: resumo['p95'] for etapa, resumo in etapas.items() if resumo['amostras']}
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat() if fim else None,
+        'execucoes': len(linhas),
+        'status': dict(Counter(linha[-1] for linha in linhas)),
+        'total': _percentis(tempos[:, -1]),
+        'etapas': etapas,
+        'etapa_mais_lenta_p95': max(medidas, key=medidas.get) if medidas else None,
+    }
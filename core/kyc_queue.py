@@ -0,0 +1,145 @@
+# core/kyc_queue.py
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from .models import KycJob
+
+logger = logging.getLogger(__name__)
+
+
+def _max_tentativas():
+    return getattr(settings, 'KYC_MAX_TENTATIVAS', 3)
+
+
+def enfileirar_kyc(usuario):
+    """
+    Cria um job de KYC para o usuário e retorna imediatamente.
+    Se já existir um job pendente para ele, reaproveita o mesmo. A unicidade é garantida pela
+    constraint kycjob_um_pendente_por_usuario: em duas requisições simultâneas, a que perde a corrida
+    recebe o IntegrityError dentro do get_or_create e passa a ler o job criado pela outra.
+    """
+    job, _ = KycJob.objects.get_or_create(usuario=usuario, status='PENDENTE')
+    return job
+
+
+def _devolver_para_fila(jobs, motivo):
+    """
+    Devolve para PENDENTE os jobs em PROCESSANDO do queryset. Se o usuário já tem outro job pendente
+    (enfileirado depois), o job antigo é encerrado como FALHA: o pendente cobre a mesma verificação.
+    Retorna quantos voltaram para a fila.
+    """
+    jobs = jobs.filter(status='PROCESSANDO')
+    pendente_do_usuario = KycJob.objects.filter(usuario_id=OuterRef('usuario_id'), status='PENDENTE')
+    try:
+        with transaction.atomic():
+            devolvidos = jobs.exclude(Exists(pendente_do_usuario)).update(status='PENDENTE', data_inicio=None)
+    except IntegrityError:
+        # Um job pendente foi criado entre a checagem e o UPDATE: a próxima recuperação resolve.
+        return 0
+    jobs.update(status='FALHA', data_fim=timezone.now(), resultado={
+        'status': 'FALHA', 'motivo': f'{motivo} Substituído por um job mais recente do mesmo usuário.'})
+    return devolvidos
+
+
+def _encerrar_esgotados(jobs, motivo):
+    """Encerra como ESGOTADO os jobs em PROCESSANDO do queryset que já usaram todas as tentativas."""
+    return jobs.filter(status='PROCESSANDO', tentativas__gte=_max_tentativas()).update(
+        status='ESGOTADO', data_fim=timezone.now(),
+        resultado={'status': 'FALHA', 'motivo': f'{motivo} Tentativas esgotadas.'})
+
+
+def reservar_proximo_job(tamanho_janela=10):
+    """
+    Reserva o job pendente mais antigo para o worker atual.
+    A reserva é um UPDATE condicional (status='PENDENTE'): se outro processo chegou antes,
+    nenhuma linha é afetada e o próximo candidato é tentado. Funciona em qualquer banco, sem locks.
+    """
+    candidatos = (KycJob.objects.filter(status='PENDENTE')
+                  .order_by('data_criacao', 'id')
+                  .values_list('id', flat=True)[:tamanho_janela])
+
+    for job_id in candidatos:
+        reservado = KycJob.objects.filter(pk=job_id, status='PENDENTE').update(
+            status='PROCESSANDO',
+            data_inicio=timezone.now(),
+            tentativas=F('tentativas') + 1,
+        )
+        if reservado:
+            return KycJob.objects.get(pk=job_id)
+    return None
+
+
+def carregar_dependencias_kyc():
+    """
+    Carrega antecipadamente as bibliotecas do KYC (face_recognition/dlib, OpenCV, OCR) em um processo
+    worker dedicado, para que o primeiro job não pague esse custo. O processo web nunca chama isto.
+    Retorna os segundos gastos ou None se alguma dependência estiver indisponível.
+    """
+    inicio = time.perf_counter()
+    try:
+        from .kyc_service import obter_motor_ocr
+        obter_motor_ocr()
+    except Exception as e:
+        print(f"AVISO: dependências do KYC indisponíveis neste worker: {e}")
+        return None
+    return time.perf_counter() - inicio
+
+
+def executar_job(job):
+    """
+    Executa o pipeline de KYC de um job já reservado e grava o resultado.
+    Um erro inesperado devolve o job para a fila enquanto houver tentativas (KYC_MAX_TENTATIVAS);
+    depois disso ele é encerrado como ESGOTADO.
+    """
+    try:
+        # Import tardio: as bibliotecas de visão computacional só são carregadas nos workers.
+        from .kyc_service import processar_kyc_automatico
+
+        resultado = processar_kyc_automatico(job.usuario_id)
+    except Exception as e:
+        logger.exception("Erro ao executar o KYC #%s (tentativa %s).", job.pk, job.tentativas)
+        motivo = f'Erro na tentativa {job.tentativas}: {e}.'
+        mesmo_job = KycJob.objects.filter(pk=job.pk)
+        if not _encerrar_esgotados(mesmo_job, motivo):
+            _devolver_para_fila(mesmo_job, motivo)
+        job.refresh_from_db()
+        return job
+
+    job.resultado = resultado
+    job.status = 'FALHA' if resultado.get('status') == 'FALHA' else 'CONCLUIDO'
+    job.data_fim = timezone.now()
+    job.save(update_fields=['resultado', 'status', 'data_fim'])
+    return job
+
+
+def recuperar_jobs_travados(timeout_minutos=15):
+    """
+    Devolve para a fila os jobs que ficaram em PROCESSANDO (ex.: worker derrubado no meio do job).
+    Os que já usaram todas as tentativas são encerrados como ESGOTADO, para que um documento que
+    derruba o worker não volte à fila para sempre. Retorna (devolvidos, esgotados).
+    """
+    limite = timezone.now() - timedelta(minutes=timeout_minutos)
+    travados = KycJob.objects.filter(status='PROCESSANDO', data_inicio__lt=limite)
+    motivo = f'Job travado por mais de {timeout_minutos} minuto(s).'
+    esgotados = _encerrar_esgotados(travados, motivo)
+    return _devolver_para_fila(travados, motivo), esgotados
+
+
+def executar_worker(intervalo=2.0, max_jobs=None):
+    """Laço principal de um processo worker: reserva e executa jobs até ser interrompido."""
+    processados = 0
+    while max_jobs is None or processados < max_jobs:
+        close_old_connections()
+        job = reservar_proximo_job()
+        if job is None:
+            time.sleep(intervalo)
+            continue
+
+        print(f"Worker: processando KYC #{job.pk} (usuário {job.usuario_id})")
+        executar_job(job)
+        processados += 1
+    return processados
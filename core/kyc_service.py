@@ -1,148 +1,615 @@
 import face_recognition
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
 from django.core.files.storage import default_storage
-from .models import CustomUser
-import pandas as pd
-import requests
-import io
+from django.db import connection, transaction
+from .models import AlertaKyc, CustomUser
+from .sancoes import documento_tem_restricao
+from .validators import normalizar_documento
+from .ocr_engine import obter_motor_ocr
+from .face_index import buscar_duplicidade_facial, registrar_rosto_aprovado
+from .phash_index import buscar_imagens_reaproveitadas
+from .kyc_metricas import CronometroKyc, registrar_execucao
+from PIL import Image, ImageOps
+import numpy as np
+import hashlib
+import logging
+import threading
+import time
+import uuid
 import cv2
+import os
 import re
-import pytesseract
 
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+PADRAO_CPF = r'\d{3}\.\d{3}\.\d{3}-\d{2}|\d{11}|\d{9}/\d{2}'
+WHITELIST_CPF = '0123456789./-'
+
+logger = logging.getLogger(__name__)
+
+# Verificações que, ao falhar, mandam o caso para revisão manual (EM_ANALISE) em vez de reprovar:
+# a semelhança entre rostos é uma heurística de distância, não uma prova de fraude
+VERIFICACOES_REVISAO = ('sem_duplicidade_facial',)
+
+
+def _cancelada(cancelamento):
+    """True quando o pipeline já decidiu o resultado e pediu às etapas em andamento que parem."""
+    return cancelamento is not None and cancelamento.is_set()
+
+
+def _salvar_debug_ocr(prefixo, nome, imagem):
+    """Salva imagens intermediárias do OCR somente se settings.KYC_OCR_DIRETORIO_DEBUG estiver definido."""
+    diretorio = getattr(settings, 'KYC_OCR_DIRETORIO_DEBUG', None)
+    if not diretorio:
+        return
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f'{prefixo}_{nome}.png')
+    cv2.imwrite(caminho, imagem)
+    print(f"DEBUG: imagem de OCR salva em '{caminho}'")
+
+
+def carregar_imagem_documento(caminho_imagem):
+    """
+    Decodifica a foto do documento em escala de cinza, aplica a rotação do EXIF e reduz
+    o lado maior para a resolução alvo (settings.KYC_OCR_DPI_ALVO sobre
+    settings.KYC_OCR_LARGURA_DOCUMENTO_MM). Tudo em memória.
+    """
+    dpi = getattr(settings, 'KYC_OCR_DPI_ALVO', 300)
+    largura_mm = getattr(settings, 'KYC_OCR_LARGURA_DOCUMENTO_MM', 130)
+    lado_alvo = int(dpi * largura_mm / 25.4)
+
+    with Image.open(caminho_imagem) as imagem:
+        escala = min(1.0, lado_alvo / max(imagem.size))
+        # Em JPEG, draft() já decodifica reduzido (1/2, 1/4, 1/8), bem mais barato que a imagem inteira
+        imagem.draft('L', (int(imagem.width * escala) + 1, int(imagem.height * escala) + 1))
+        cinza = np.asarray(ImageOps.exif_transpose(imagem).convert('L'))
+
+    altura, largura = cinza.shape
+    if max(altura, largura) > lado_alvo:
+        escala = lado_alvo / max(altura, largura)
+        cinza = cv2.resize(cinza, (int(largura * escala), int(altura * escala)), interpolation=cv2.INTER_AREA)
+    return cinza
+
+
+def _angulo_contorno(contorno):
+    (_, _), (largura, altura), angulo = cv2.minAreaRect(contorno)
+    if largura < altura:
+        angulo -= 90
+    if angulo < -45:
+        angulo += 90
+    elif angulo > 45:
+        angulo -= 90
+    return angulo
+
+
+def _contornos_de_texto(cinza):
+    """Agrupa os caracteres em blocos de linha de texto por morfologia e retorna os contornos."""
+    altura, largura = cinza.shape
+    kernel_caractere = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, largura // 100), max(3, altura // 200)))
+    realce = cv2.morphologyEx(cinza, cv2.MORPH_BLACKHAT, kernel_caractere)
+
+    gradiente = np.absolute(cv2.Sobel(realce, cv2.CV_32F, 1, 0, ksize=-1))
+    gradiente = cv2.normalize(gradiente, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+    kernel_linha = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, largura // 50), 3))
+    gradiente = cv2.morphologyEx(gradiente, cv2.MORPH_CLOSE, kernel_linha)
+    _, mascara = cv2.threshold(gradiente, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    mascara = cv2.erode(mascara, None, iterations=1)
+    mascara = cv2.dilate(mascara, None, iterations=2)
+
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return contornos
+
+
+def corrigir_orientacao(cinza):
+    """
+    Endireita a imagem: opcionalmente usa a detecção de orientação do Tesseract
+    (settings.KYC_OCR_DETECTAR_ORIENTACAO) para giros de 90/180/270 graus e, em seguida,
+    corrige a inclinação fina pela mediana do ângulo das linhas de texto.
+    """
+    if getattr(settings, 'KYC_OCR_DETECTAR_ORIENTACAO', False):
+        try:
+            rotacao = int(obter_motor_ocr().detectar_orientacao(cinza))
+            giros = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+            if rotacao in giros:
+                cinza = cv2.rotate(cinza, giros[rotacao])
+        except Exception:
+            logger.exception("Erro na detecção de orientação.")
+
+    angulos = [_angulo_contorno(c) for c in _contornos_de_texto(cinza)
+               if cv2.contourArea(c) > 0.0005 * cinza.size]
+    if not angulos:
+        return cinza
+
+    angulo = float(np.median(angulos))
+    if abs(angulo) < 0.5 or abs(angulo) > 15:
+        return cinza
+
+    altura, largura = cinza.shape
+    matriz = cv2.getRotationMatrix2D((largura / 2, altura / 2), angulo, 1.0)
+    return cv2.warpAffine(cinza, matriz, (largura, altura), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def localizar_regioes_cpf(cinza, max_regioes=12):
+    """
+    Retorna as caixas (x, y, w, h) das linhas de texto com formato compatível com um número
+    de CPF (linha curta e alongada, ~14 caracteres), priorizando as mais parecidas.
+    """
+    altura, largura = cinza.shape
+    caixas = []
+    for contorno in _contornos_de_texto(cinza):
+        x, y, w, h = cv2.boundingRect(contorno)
+        proporcao = w / float(h)
+        if 0.012 * altura <= h <= 0.12 * altura and 3 <= proporcao <= 25 and w <= 0.9 * largura:
+            caixas.append((abs(np.log(proporcao / 8.0)), (x, y, w, h)))
+
+    caixas.sort(key=lambda item: item[0])
+    return sorted((caixa for _, caixa in caixas[:max_regioes]), key=lambda caixa: caixa[1])
+
+
+def montar_imagem_regioes(cinza, caixas, margem=4, espaco=12):
+    """Binariza cada região separadamente (Otsu local) e empilha todas em uma única imagem."""
+    altura, largura = cinza.shape
+    recortes = []
+    for x, y, w, h in caixas:
+        recorte = cinza[max(0, y - margem):min(altura, y + h + margem), max(0, x - margem):min(largura, x + w + margem)]
+        _, recorte = cv2.threshold(recorte, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        recortes.append(recorte)
+
+    if not recortes:
+        return None
+
+    largura_montagem = max(r.shape[1] for r in recortes) + 2 * espaco
+    linhas = [np.full((espaco, largura_montagem), 255, dtype=np.uint8)]
+    for recorte in recortes:
+        linha = np.full((recorte.shape[0], largura_montagem), 255, dtype=np.uint8)
+        linha[:, espaco:espaco + recorte.shape[1]] = recorte
+        linhas.extend([linha, np.full((espaco, largura_montagem), 255, dtype=np.uint8)])
+    return np.vstack(linhas)
+
 
 def preprocessar_imagem_para_ocr(caminho_imagem):
+    """
+    Pipeline em memória: redução para a resolução alvo, correção de orientação, binarização
+    adaptativa (Otsu) e recorte das regiões candidatas ao campo do CPF.
+    Retorna (imagem_binarizada_completa, montagem_das_regioes_cpf ou None).
+    """
+    prefixo_debug = uuid.uuid4().hex
     try:
-        img = cv2.imread(caminho_imagem)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+        cinza = corrigir_orientacao(carregar_imagem_documento(caminho_imagem))
+        _, binaria = cv2.threshold(cinza, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        regioes = montar_imagem_regioes(cinza, localizar_regioes_cpf(cinza))
 
-        cv2.imwrite('debug_ocr_image.png', thresh)
-        print("DEBUG: Imagem pré-processada salva como 'debug_ocr_image.png'")
+        _salvar_debug_ocr(prefixo_debug, 'completa', binaria)
+        if regioes is not None:
+            _salvar_debug_ocr(prefixo_debug, 'regioes_cpf', regioes)
 
-        return thresh
+        return binaria, regioes
     except Exception as e:
         print(f"Erro no pré-processamento: {e}")
-        return cv2.imread(caminho_imagem)
+        return cv2.imread(caminho_imagem), None
 
-def extrair_cpf_de_imagem(caminho_imagem):
-    try:
-        imagem_processada = preprocessar_imagem_para_ocr(caminho_imagem)
-        if imagem_processada is None:
-            imagem_processada = caminho_imagem
 
-        texto_extraido = pytesseract.image_to_string(imagem_processada, lang='por')
+def _buscar_cpf_no_texto(texto):
+    matches = re.findall(PADRAO_CPF, texto)
+    if matches:
+        cpf_encontrado = normalizar_documento(matches[0])
+        if len(cpf_encontrado) == 11:
+            return cpf_encontrado
+    return None
 
-        padrao_cpf = r'\d{3}\.\d{3}\.\d{3}-\d{2}|\d{11}|\d{9}/\d{2}'
-        matches = re.findall(padrao_cpf, texto_extraido)
 
-        if matches:
-            cpf_encontrado = re.sub(r'[^\d]', '', matches[0])
-            if len(cpf_encontrado) == 11:
-                return cpf_encontrado
+def extrair_cpfs_de_imagens(caminhos_imagens, cpf_esperado=None, duracoes=None, cancelamento=None):
+    """
+    Faz o OCR de várias imagens (ex.: frente e verso) como um único lote no motor de OCR.
+    1ª passada: só as regiões candidatas ao CPF de cada imagem.
+    2ª passada: imagem inteira das que não tiveram CPF encontrado — pulada se `cpf_esperado`
+    já tiver sido achado em alguma imagem.
+    Retorna uma lista com o CPF encontrado (ou None) para cada imagem, na mesma ordem.
+    Com `duracoes` (lista), acrescenta a ela os segundos gastos em cada imagem (pré-processamento e OCR).
+    Com `cancelamento` (threading.Event), para entre uma imagem ou passada e a seguinte quando o evento é sinalizado.
+    """
+    cpfs = [None] * len(caminhos_imagens)
+    tempos = [0.0] * len(caminhos_imagens)
+    try:
+        motor = obter_motor_ocr()
+        preprocessadas = []
+        for i, caminho in enumerate(caminhos_imagens):
+            if _cancelada(cancelamento):
+                return cpfs
+            inicio = time.perf_counter()
+            preprocessadas.append(preprocessar_imagem_para_ocr(caminho))
+            tempos[i] += time.perf_counter() - inicio
+
+        if _cancelada(cancelamento):
+            return cpfs
+        com_regioes = [i for i, (_, regioes) in enumerate(preprocessadas) if regioes is not None]
+        duracoes_lote = []
+        textos = motor.reconhecer_lote([preprocessadas[i][1] for i in com_regioes], psm=6, whitelist=WHITELIST_CPF,
+                                       duracoes=duracoes_lote)
+        for i, texto, duracao in zip(com_regioes, textos, duracoes_lote):
+            cpfs[i] = _buscar_cpf_no_texto(texto)
+            tempos[i] += duracao
+
+        if (cpf_esperado and cpf_esperado in cpfs) or _cancelada(cancelamento):
+            return cpfs
+
+        sem_cpf = [i for i, cpf in enumerate(cpfs) if cpf is None]
+        imagens = [preprocessadas[i][0] if preprocessadas[i][0] is not None else caminhos_imagens[i] for i in sem_cpf]
+        duracoes_lote = []
+        for i, texto, duracao in zip(sem_cpf, motor.reconhecer_lote(imagens, duracoes=duracoes_lote), duracoes_lote):
+            cpfs[i] = _buscar_cpf_no_texto(texto)
+            tempos[i] += duracao
     except Exception as e:
         print(f"Erro no OCR: {e}")
-    return None
-
-def verificar_faces(caminho_doc, caminho_selfie):
-    try:
-        img_doc = face_recognition.load_image_file(caminho_doc)
-        img_selfie = face_recognition.load_image_file(caminho_selfie)
-
-        encodings_doc = face_recognition.face_encodings(img_doc)
-        encodings_selfie = face_recognition.face_encodings(img_selfie)
+    finally:
+        if duracoes is not None:
+            duracoes.extend(tempos)
+    return cpfs
 
-        if len(encodings_doc) == 1 and len(encodings_selfie) == 1:
-            encoding_doc = encodings_doc[0]
-            encoding_selfie = encodings_selfie[0]
 
-            resultado = face_recognition.compare_faces([encoding_doc], encoding_selfie)
-            return resultado[0]
+def extrair_cpf_de_imagem(caminho_imagem):
+    return extrair_cpfs_de_imagens([caminho_imagem])[0]
+
+def calcular_hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo de um arquivo, lendo em blocos."""
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def _encodings_multiresolucao(imagem, lado_deteccao, upsample, cancelamento=None):
+    """
+    Detecta os rostos (HOG) em uma cópia reduzida da imagem, cujo custo cresce com o número
+    de pixels, e calcula o encoding de cada rosto no recorte em resolução original.
+    Com `cancelamento` sinalizado entre a detecção e o encoding, retorna sem encodings.
+    """
+    altura, largura = imagem.shape[:2]
+    escala = min(1.0, lado_deteccao / max(altura, largura))
+    reduzida = imagem
+    if escala < 1.0:
+        reduzida = cv2.resize(imagem, (int(largura * escala), int(altura * escala)), interpolation=cv2.INTER_AREA)
+
+    localizacoes = face_recognition.face_locations(reduzida, number_of_times_to_upsample=upsample)
+    if _cancelada(cancelamento):
+        return []
+
+    encodings = []
+    for topo, direita, base, esquerda in localizacoes:
+        # Caixa de volta na resolução original
+        topo, direita, base, esquerda = (int(round(v / escala)) for v in (topo, direita, base, esquerda))
+        margem = (base - topo) // 4
+        y0, x0 = max(0, topo - margem), max(0, esquerda - margem)
+        recorte = np.ascontiguousarray(imagem[y0:min(altura, base + margem), x0:min(largura, direita + margem)])
+
+        caixa_no_recorte = (topo - y0, direita - x0, base - y0, esquerda - x0)
+        encodings.extend(face_recognition.face_encodings(recorte, known_face_locations=[caixa_no_recorte]))
+    return encodings
+
+
+def _calcular_encoding_facial(caminho_imagem, modo=None, cancelamento=None, lado_deteccao=None, upsample=None):
+    """
+    Calcula o encoding do único rosto da imagem. O modo vem de settings.KYC_FACE_MODO_DETECCAO:
+    'multiresolucao' (detecção na imagem reduzida) ou 'completo' (detecção na imagem inteira).
+    `lado_deteccao` e `upsample` sobrepõem settings.KYC_FACE_LADO_DETECCAO e settings.KYC_FACE_UPSAMPLE.
+    """
+    if modo is None:
+        modo = getattr(settings, 'KYC_FACE_MODO_DETECCAO', 'multiresolucao')
+    if lado_deteccao is None:
+        lado_deteccao = getattr(settings, 'KYC_FACE_LADO_DETECCAO', 800)
+    if upsample is None:
+        upsample = getattr(settings, 'KYC_FACE_UPSAMPLE', 1)
+
+    imagem = face_recognition.load_image_file(caminho_imagem)
+    if modo == 'completo':
+        encodings = face_recognition.face_encodings(imagem)
+    else:
+        encodings = _encodings_multiresolucao(imagem, lado_deteccao, upsample, cancelamento=cancelamento)
+
+    if len(encodings) != 1:
+        return None
+    return encodings[0]
+
+
+def obter_encoding_facial(caminho_imagem, usuario=None, campo=None, cancelamento=None):
+    """
+    Retorna o encoding facial (128-d) da imagem, ou None se não houver exatamente um rosto.
+    Com `usuario` e `campo` ('documento_frente' ou 'selfie'), reaproveita o encoding salvo no
+    usuário quando o SHA-256 da imagem não mudou, e salva o novo encoding caso contrário.
+    """
+    if usuario is None or campo is None:
+        return _calcular_encoding_facial(caminho_imagem, cancelamento=cancelamento)
+
+    hash_atual = calcular_hash_arquivo(caminho_imagem)
+    encoding_salvo = getattr(usuario, f'encoding_{campo}')
+    if encoding_salvo and getattr(usuario, f'hash_{campo}') == hash_atual:
+        return np.frombuffer(bytes(encoding_salvo), dtype=np.float32)
+
+    encoding = _calcular_encoding_facial(caminho_imagem, cancelamento=cancelamento)
+    if encoding is not None:
+        encoding_bytes = np.asarray(encoding, dtype=np.float32).tobytes()
+        setattr(usuario, f'hash_{campo}', hash_atual)
+        setattr(usuario, f'encoding_{campo}', encoding_bytes)
+        # update() em vez de save(): grava só o cache, sem sobrescrever o restante da linha
+        CustomUser.objects.filter(pk=usuario.pk).update(**{
+            f'hash_{campo}': hash_atual,
+            f'encoding_{campo}': encoding_bytes,
+        })
+    return encoding
+
+
+def verificar_faces(caminho_doc, caminho_selfie, usuario=None, cronometro=None, cancelamento=None):
+    cronometro = cronometro or CronometroKyc()
+    etapa = 'face_encoding'
+    try:
+        with cronometro.medir('face_encoding'):
+            encoding_doc = obter_encoding_facial(caminho_doc, usuario, 'documento_frente', cancelamento)
+            encoding_selfie = None
+            if not _cancelada(cancelamento):
+                encoding_selfie = obter_encoding_facial(caminho_selfie, usuario, 'selfie', cancelamento)
+
+        if _cancelada(cancelamento):
+            cronometro.registrar('face_encoding', 'CANCELADA')
+            return False
+        if encoding_doc is not None and encoding_selfie is not None:
+            cronometro.registrar('face_encoding', 'OK')
+            etapa = 'face_comparacao'
+            with cronometro.medir('face_comparacao'):
+                resultado = face_recognition.compare_faces([encoding_doc], encoding_selfie)
+            cronometro.registrar('face_comparacao', 'OK' if resultado[0] else 'DIVERGENTE')
+            return bool(resultado[0])
+        cronometro.registrar('face_encoding', 'SEM_ROSTO')
     except Exception as e:
+        cronometro.registrar(etapa, 'ERRO')
         print(f"Erro na verificação facial: {e}")
     return False
 
-def consultar_base_publica_restritiva(cpf_usuario):
-    """Verifica se um CPF está na lista de sanções do CEIS."""
-    try:
-        url_ceis = 'https://www.portaltransparencia.gov.br/pessoa-fisica/busca/lista?output=csv'
-
-        print("Baixando dados do Portal da Transparência...")
-        response = requests.get(url_ceis, stream=True)
-        response.raise_for_status()
-
-        df = pd.read_csv(io.StringIO(response.content.decode('utf-8')), sep=';', encoding='utf-8')
-
-        coluna_cpf_cnpj = 'CPF OU CNPJ DO SANCIONADO'
-        if coluna_cpf_cnpj not in df.columns:
-            print(f"AVISO: A coluna '{coluna_cpf_cnpj}' não foi encontrada no CSV.")
-            return False
 
-        cpf_formatado = f"{cpf_usuario[:3]}.{cpf_usuario[3:6]}.{cpf_usuario[6:9]}-{cpf_usuario[9:]}"
-
-        if df[coluna_cpf_cnpj].str.contains(cpf_formatado).any():
-            print(f"ALERTA: CPF {cpf_usuario} encontrado na lista restritiva do CEIS.")
+def verificar_faces_e_duplicidade(caminho_doc, caminho_selfie, usuario, cronometro=None, cancelamento=None):
+    """
+    Etapa facial do KYC: compara documento x selfie e, se bater, procura o mesmo rosto
+    entre os usuários já aprovados com outro CPF. Retorna (face_ok, [(usuario_id, distancia), ...]).
+    A busca de duplicidade entra no tempo da etapa face_comparacao.
+    """
+    cronometro = cronometro or CronometroKyc()
+    face_ok = verificar_faces(caminho_doc, caminho_selfie, usuario, cronometro, cancelamento)
+    duplicados = []
+    if face_ok and usuario.encoding_selfie and not _cancelada(cancelamento):
+        try:
+            with cronometro.medir('face_comparacao'):
+                encoding = np.frombuffer(bytes(usuario.encoding_selfie), dtype=np.float32)
+                duplicados = buscar_duplicidade_facial(usuario.pk, encoding)
+            if duplicados:
+                cronometro.registrar('face_comparacao', 'DUPLICIDADE')
+                logger.warning("KYC: rosto do usuário %s semelhante ao(s) usuário(s) %s.",
+                               usuario.pk, [outro_id for outro_id, _ in duplicados])
+        except Exception as e:
+            print(f"Erro na busca de duplicidade facial: {e}")
+    return face_ok, duplicados
+
+def consultar_base_publica_restritiva(cpf_usuario, cronometro=None):
+    """
+    Verifica se um CPF está em alguma lista de sanções carregada (CEIS, CNEP).
+    A consulta é feita na base local (carregada via `manage.py carregar_sancoes`), sem acessar a rede.
+    """
+    cronometro = cronometro or CronometroKyc()
+    try:
+        with cronometro.medir('sancoes'):
+            restrito = documento_tem_restricao(cpf_usuario)
+        cronometro.registrar('sancoes', 'RESTRICAO' if restrito else 'OK')
+        if restrito:
+            print(f"ALERTA: CPF {cpf_usuario} encontrado na base restritiva.")
             return True
-            
     except Exception as e:
+        cronometro.registrar('sancoes', 'ERRO')
         print(f"Erro ao consultar base pública: {e}")
 
     return False
 
 
-def processar_kyc_automatico(user_id):
-    """Executa o pipeline completo de verificação de KYC para um usuário."""
+def _etapa_ocr(caminhos_imagens, cpf_esperado, cronometro, cancelamento=None):
+    """OCR de frente e verso, com o tempo e o resultado de cada lado no cronômetro."""
+    duracoes = []
+    cpfs = extrair_cpfs_de_imagens(caminhos_imagens, cpf_esperado, duracoes=duracoes, cancelamento=cancelamento)
+    for etapa, cpf, duracao in zip(('ocr_frente', 'ocr_verso'), cpfs, duracoes):
+        cronometro.somar(etapa, duracao)
+        if cpf is None and _cancelada(cancelamento):
+            cronometro.registrar(etapa, 'CANCELADA')
+        else:
+            cronometro.registrar(etapa, 'OK' if cpf == cpf_esperado else 'DIVERGENTE' if cpf else 'NAO_ENCONTRADO')
+    return cpfs
+
+
+def registrar_alertas_kyc(usuario_id, tipo, relacionados):
+    """
+    Grava os alertas de revisão manual do usuário: `relacionados` é {usuario_id_relacionado: detalhes}.
+    Um alerta que já existia é atualizado e volta a ficar pendente de revisão.
+    """
+    AlertaKyc.objects.bulk_create([
+        AlertaKyc(usuario_id=usuario_id, usuario_relacionado_id=outro_id, tipo=tipo, detalhes=detalhes)
+        for outro_id, detalhes in relacionados.items()
+    ], update_conflicts=True, unique_fields=['usuario', 'usuario_relacionado', 'tipo'],
+        update_fields=['detalhes', 'revisado', 'data_atualizacao'])
+
+
+def verificar_imagens_reaproveitadas(usuario_id):
+    """
+    Imagens do usuário (documento ou selfie, mesmo recortadas ou recomprimidas) já enviadas por outras
+    contas: {outro_usuario_id: detalhes}. Não reprova nem muda o status; vira AlertaKyc para revisão.
+    """
+    try:
+        semelhantes = buscar_imagens_reaproveitadas(usuario_id)
+    except Exception:
+        logger.exception("KYC: erro na busca de imagens reaproveitadas do usuário %s.", usuario_id)
+        return {}
+    if semelhantes:
+        logger.warning("KYC: imagens do usuário %s semelhantes às do(s) usuário(s) %s.",
+                       usuario_id, sorted(semelhantes))
+    return {outro_id: {'imagens': imagens} for outro_id, imagens in semelhantes.items()}
+
+
+def _executar_em_thread(funcao, *args):
+    # Cada thread abre sua própria conexão com o banco; fechamos ao final da etapa.
+    try:
+        return funcao(*args)
+    finally:
+        connection.close()
+
+
+def _avaliar_verificacoes(resultados, cpf_usuario_limpo):
+    """
+    Avalia as verificações a partir dos resultados (possivelmente parciais) das etapas.
+    Cada verificação é True/False quando já está decidida, ou None enquanto depende de etapas pendentes.
+    """
+    if 'ocr' in resultados:
+        ocr_ok = cpf_usuario_limpo in resultados['ocr']
+    else:
+        ocr_ok = None
+
+    face_match_ok, sem_duplicidade = None, None
+    if 'face' in resultados:
+        face_match_ok, duplicados = resultados['face']
+        if face_match_ok:
+            sem_duplicidade = not duplicados
+
+    base_publica_ok = None if 'sancoes' not in resultados else not resultados['sancoes']
+
+    return {
+        'ocr_match': ocr_ok,
+        'face_match': face_match_ok,
+        'sem_duplicidade_facial': sem_duplicidade,
+        'sem_restricoes_publicas': base_publica_ok,
+    }
+
+
+def _executar_etapas_sequencial(etapas):
+    resultados = {}
+
+    logger.debug("Executando as etapas do KYC em sequência (OCR, rosto e base restritiva).")
+    for nome in ('ocr', 'face', 'sancoes'):
+        resultados[nome] = etapas[nome][0](*etapas[nome][1])
+    return resultados
+
+
+def _executar_etapas_concorrente(etapas, cpf_usuario_limpo, cancelamento):
+    """
+    Executa todas as etapas ao mesmo tempo em um pool de threads (OCR, dlib e o banco liberam o GIL).
+    Assim que o resultado fica decidido (alguma verificação obrigatória falhou, ou todas passaram),
+    sinaliza `cancelamento` e retorna sem esperar pelas etapas restantes. Elas param sozinhas no
+    próximo ponto de verificação (entre as imagens e passadas do OCR, antes de cada rosto e da
+    comparação); uma chamada ao Tesseract ou ao dlib já em andamento não é interrompida.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(etapas), thread_name_prefix='kyc')
+    futuros = {executor.submit(_executar_em_thread, funcao, *args): nome
+               for nome, (funcao, args) in etapas.items()}
+    resultados = {}
+    try:
+        pendentes = set(futuros)
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                resultados[futuros[futuro]] = futuro.result()
+
+            verificacoes = _avaliar_verificacoes(resultados, cpf_usuario_limpo)
+            obrigatorias = [ok for nome, ok in verificacoes.items() if nome not in VERIFICACOES_REVISAO]
+            if False in obrigatorias or None not in verificacoes.values():
+                if pendentes:
+                    logger.info("KYC: resultado decidido; sinalizando a parada das etapas em andamento: %s",
+                                ', '.join(sorted(futuros[f] for f in pendentes)))
+                break
+    finally:
+        # Não espera as etapas em andamento: o resultado delas não muda mais a decisão.
+        # Todas já começaram (uma thread por etapa), então quem as encerra é o evento.
+        cancelamento.set()
+        executor.shutdown(wait=False)
+    return resultados
+
+
+def processar_kyc_automatico(user_id, concorrente=None):
+    """
+    Executa o pipeline completo de verificação de KYC para um usuário.
+    Com `concorrente=True` (padrão definido por settings.KYC_EXECUCAO_CONCORRENTE), as etapas
+    independentes rodam em paralelo e o pipeline termina na primeira reprovação.
+    Um rosto igual ao de outra conta não reprova: o caso fica EM_ANALISE com um AlertaKyc para a equipe.
+    """
+    if concorrente is None:
+        concorrente = getattr(settings, 'KYC_EXECUCAO_CONCORRENTE', True)
+
+    # Cada chamada grava um KycExecucao com os tempos e resultados de cada etapa
+    cronometro = CronometroKyc()
+    cancelamento = threading.Event()
+    tamanhos = {}
+    usuario_id = None
     try:
         usuario = CustomUser.objects.get(pk=user_id)
+        usuario_id = usuario.pk
         if not all([usuario.foto_documento_frente, usuario.foto_documento_verso, usuario.selfie]):
+            registrar_execucao(cronometro, usuario_id, 'FALHA', concorrente, motivo_falha='Documentos não enviados.')
             return {'status': 'FALHA', 'motivo': 'Documentos não enviados.'}
 
         caminho_doc_frente = usuario.foto_documento_frente.path
         caminho_doc_verso = usuario.foto_documento_verso.path
         caminho_selfie = usuario.selfie.path
+        for campo, caminho in (('documento_frente', caminho_doc_frente), ('documento_verso', caminho_doc_verso),
+                               ('selfie', caminho_selfie)):
+            tamanhos[campo] = os.path.getsize(caminho) if os.path.exists(caminho) else None
 
         print(f"Iniciando KYC para o usuário: {usuario.username}")
 
-        cpf_documento = None
+        cpf_usuario_limpo = normalizar_documento(usuario.cpf)
 
-        print("Executando OCR na frente do documento...")
-        cpf_documento = extrair_cpf_de_imagem(caminho_doc_frente)
+        etapas = {
+            'ocr': (_etapa_ocr, ([caminho_doc_frente, caminho_doc_verso], cpf_usuario_limpo, cronometro, cancelamento)),
+            'face': (verificar_faces_e_duplicidade,
+                     (caminho_doc_frente, caminho_selfie, usuario, cronometro, cancelamento)),
+            'sancoes': (consultar_base_publica_restritiva, (usuario.cpf, cronometro)),
+        }
 
-        if not cpf_documento:
-            print("CPF não encontrado na frente. Executando OCR no verso do documento...")
-            cpf_documento = extrair_cpf_de_imagem(caminho_doc_verso)
-
-        cpf_usuario_limpo = re.sub(r'[^\d]', '', usuario.cpf)
+        if concorrente:
+            resultados = _executar_etapas_concorrente(etapas, cpf_usuario_limpo, cancelamento)
+        else:
+            resultados = _executar_etapas_sequencial(etapas)
 
+        cpf_documento = next((cpf for cpf in resultados.get('ocr', []) if cpf), None)
         print(f"DEBUG: Comparando OCR ('{cpf_documento}') com DB ('{cpf_usuario_limpo}')")
 
-        ocr_ok = (cpf_documento is not None and cpf_documento == cpf_usuario_limpo)
-        print(f"Verificação OCR: {'OK' if ocr_ok else 'FALHA'}")
+        detalhes = _avaliar_verificacoes(resultados, cpf_usuario_limpo)
+        print(f"Verificação OCR: {'OK' if detalhes['ocr_match'] else 'FALHA'}")
+        print(f"Verificação Facial: {'OK' if detalhes['face_match'] else 'FALHA'}")
+        print(f"Duplicidade Facial: {'OK' if detalhes['sem_duplicidade_facial'] else 'FALHA'}")
+        print(f"Consulta Base Pública: {'OK' if detalhes['sem_restricoes_publicas'] else 'FALHA'}")
 
-        face_match_ok = verificar_faces(caminho_doc_frente, caminho_selfie)
-        print(f"Verificação Facial: {'OK' if face_match_ok else 'FALHA'}")
-
-        tem_restricao = consultar_base_publica_restritiva(usuario.cpf)
-        base_publica_ok = not tem_restricao
-        print(f"Consulta Base Pública: {'OK' if base_publica_ok else 'FALHA'}")
-
-        if ocr_ok and face_match_ok and base_publica_ok:
-            usuario.kyc_status = 'APROVADO'
-            print("Resultado KYC: APROVADO")
-        else:
+        if not all(ok for nome, ok in detalhes.items() if nome not in VERIFICACOES_REVISAO):
             usuario.kyc_status = 'REPROVADO'
-            print("Resultado KYC: REPROVADO")
-
-        usuario.save()
-
-        return {'status': usuario.kyc_status, 'detalhes': {
-            'ocr_match': ocr_ok,
-            'face_match': face_match_ok,
-            'sem_restricoes_publicas': base_publica_ok
-        }}
+        elif not all(detalhes.values()):
+            usuario.kyc_status = 'EM_ANALISE'
+        else:
+            usuario.kyc_status = 'APROVADO'
+        print(f"Resultado KYC: {usuario.kyc_status}")
+
+        duplicados = resultados['face'][1] if 'face' in resultados else []
+        imagens_reaproveitadas = verificar_imagens_reaproveitadas(usuario.pk)
+        # Status, alertas e índice facial juntos: se a inclusão no índice falhar, a aprovação não fica gravada
+        with transaction.atomic():
+            usuario.save(update_fields=['kyc_status'])
+            if duplicados:
+                registrar_alertas_kyc(usuario.pk, 'ROSTO_DUPLICADO',
+                                      {outro_id: {'distancia': round(distancia, 4)} for outro_id, distancia in duplicados})
+            if imagens_reaproveitadas:
+                registrar_alertas_kyc(usuario.pk, 'IMAGEM_REAPROVEITADA', imagens_reaproveitadas)
+            if usuario.kyc_status == 'APROVADO':
+                registrar_rosto_aprovado(usuario.pk, np.frombuffer(bytes(usuario.encoding_selfie), dtype=np.float32))
+
+        registrar_execucao(cronometro, usuario_id, usuario.kyc_status, concorrente, tamanhos)
+        # As contas com rosto ou imagens semelhantes não vão na resposta: o solicitante consulta o resultado pelo job
+        return {'status': usuario.kyc_status, 'detalhes': detalhes}
 
     except CustomUser.DoesNotExist:
+        registrar_execucao(cronometro, None, 'FALHA', concorrente, motivo_falha='Usuário não encontrado.')
         return {'status': 'FALHA', 'motivo': 'Usuário não encontrado.'}
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return {'status': 'FALHA', 'motivo': str(e)}
\ No newline at end of file
+        registrar_execucao(cronometro, usuario_id, 'FALHA', concorrente, tamanhos, motivo_falha=str(e))
+        return {'status': 'FALHA', 'motivo': str(e)}
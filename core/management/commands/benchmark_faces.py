@@ -0,0 +1,87 @@
+import os
+import statistics
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+EXTENSOES = ('.jpg', '.jpeg', '.png')
+
+
+def _listar_pares(pasta):
+    """Encontra os pares <nome>_doc.<ext> / <nome>_selfie.<ext> da pasta."""
+    arquivos = {}
+    for nome_arquivo in sorted(os.listdir(pasta)):
+        base, extensao = os.path.splitext(nome_arquivo)
+        if extensao.lower() not in EXTENSOES or '_' not in base:
+            continue
+        par, tipo = base.rsplit('_', 1)
+        if tipo in ('doc', 'selfie'):
+            arquivos.setdefault(par, {})[tipo] = os.path.join(pasta, nome_arquivo)
+    return [(par, caminhos['doc'], caminhos['selfie'])
+            for par, caminhos in arquivos.items() if len(caminhos) == 2]
+
+
+class Command(BaseCommand):
+    help = ('Compara a latência e o resultado da detecção facial multirresolução com a detecção '
+            'na imagem completa sobre uma pasta de pares <nome>_doc / <nome>_selfie.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('pasta', help='Pasta com os pares de imagens.')
+        parser.add_argument('--lado', type=int, default=getattr(settings, 'KYC_FACE_LADO_DETECCAO', 800),
+                            help='Lado maior (px) da cópia usada na detecção multirresolução.')
+        parser.add_argument('--upsample', type=int, default=getattr(settings, 'KYC_FACE_UPSAMPLE', 1))
+
+    def handle(self, *args, **options):
+        import face_recognition
+        from core import kyc_service
+
+        if not os.path.isdir(options['pasta']):
+            raise CommandError(f"Pasta não encontrada: {options['pasta']}")
+
+        pares = _listar_pares(options['pasta'])
+        if not pares:
+            raise CommandError('Nenhum par <nome>_doc / <nome>_selfie encontrado.')
+
+        # _calcular_encoding_facial é chamado direto (sem o cache por usuário), com os parâmetros
+        # da linha de comando em vez dos de settings
+        parametros = {'lado_deteccao': options['lado'], 'upsample': options['upsample']}
+
+        tempos = {'completo': [], 'multiresolucao': []}
+        concordancias = 0
+
+        self.stdout.write(f"{'par':<24} {'completo (s)':>13} {'multi (s)':>10} {'match':>13} {'dist. enc.':>10}")
+        for par, caminho_doc, caminho_selfie in pares:
+            resultados = {}
+            for modo in tempos:
+                inicio = time.perf_counter()
+                encoding_doc = kyc_service._calcular_encoding_facial(caminho_doc, modo, **parametros)
+                encoding_selfie = kyc_service._calcular_encoding_facial(caminho_selfie, modo, **parametros)
+                match = None
+                if encoding_doc is not None and encoding_selfie is not None:
+                    match = bool(face_recognition.compare_faces([encoding_doc], encoding_selfie)[0])
+                tempos[modo].append(time.perf_counter() - inicio)
+                resultados[modo] = (match, encoding_selfie)
+
+            match_completo, enc_completo = resultados['completo']
+            match_multi, enc_multi = resultados['multiresolucao']
+            concordancias += match_completo == match_multi
+
+            distancia = '-'
+            if enc_completo is not None and enc_multi is not None:
+                distancia = f'{np.linalg.norm(np.asarray(enc_completo) - np.asarray(enc_multi)):.4f}'
+
+            self.stdout.write(f"{par:<24} {tempos['completo'][-1]:>13.3f} {tempos['multiresolucao'][-1]:>10.3f} "
+                              f"{str(match_completo) + '/' + str(match_multi):>13} {distancia:>10}")
+
+        media_completo = statistics.mean(tempos['completo'])
+        media_multi = statistics.mean(tempos['multiresolucao'])
+        self.stdout.write('')
+        self.stdout.write(f'Pares: {len(pares)}')
+        self.stdout.write(f'Tempo médio por par - completo: {media_completo:.3f}s | multirresolução: {media_multi:.3f}s '
+                          f'(mediana {statistics.median(tempos["completo"]):.3f}s / '
+                          f'{statistics.median(tempos["multiresolucao"]):.3f}s)')
+        if media_multi > 0:
+            self.stdout.write(f'Ganho: {media_completo / media_multi:.1f}x')
+        self.stdout.write(self.style.SUCCESS(
+            f'Concordância do resultado: {concordancias}/{len(pares)} ({100.0 * concordancias / len(pares):.1f}%)'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import SancaoRestritiva
+from core.sancoes import TAMANHO_LOTE_PADRAO, atualizar_lista_restritiva
+
+
+class Command(BaseCommand):
+    help = ('Baixa (ou lê de um arquivo local) uma lista restritiva e carrega na base local de sanções, '
+            'em streaming e só quando a lista mudou desde a última carga.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--origem', help='Caminho de um CSV local ou URL alternativa. Padrão: Portal da Transparência.')
+        parser.add_argument('--fonte', default='CEIS', choices=[c for c, _ in SancaoRestritiva.FONTE_CHOICES])
+        parser.add_argument('--forcar', action='store_true', help='Recarrega mesmo que a lista não tenha mudado.')
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO)
+
+    def handle(self, *args, **options):
+        fonte = options['fonte']
+        try:
+            carregada, estado = atualizar_lista_restritiva(fonte, options['origem'], options['forcar'],
+                                                          options['tamanho_lote'])
+        except Exception as e:
+            raise CommandError(f'Erro ao carregar a base do {fonte}: {e}')
+
+        if carregada:
+            self.stdout.write(self.style.SUCCESS(
+                f'{estado.total_registros} documentos carregados na base restritiva ({fonte}, versão {estado.versao}): '
+                f'{estado.novos_ultima_carga} novos, {estado.removidos_ultima_carga} removidos.'))
+        else:
+            self.stdout.write(f'Lista do {fonte} inalterada desde a última carga ({estado.total_registros} documentos); '
+                              'nada foi recarregado.')
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from core.auto_investimento import executar_auto_investimento
+
+
+class Command(BaseCommand):
+    help = 'Aloca os empréstimos abertos entre as ordens de auto-investimento ativas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=0,
+                            help='Segundos entre rodadas. Com 0 (padrão) executa uma única rodada.')
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.perf_counter()
+            resumo = executar_auto_investimento()
+            duracao = time.perf_counter() - inicio
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{resumo['investimentos']} investimentos (R$ {resumo['valor_alocado']:.2f}) entre "
+                f"{resumo['emprestimos_abertos']} empréstimos abertos e {resumo['ordens_ativas']} ordens ativas; "
+                f"{resumo['emprestimos_financiados']} empréstimos completamente financiados em {duracao:.2f}s."))
+            if resumo['alocacoes_descartadas']:
+                self.stdout.write(f"{resumo['alocacoes_descartadas']} alocações descartadas: empréstimo ou ordem "
+                                  f"alterado por outra transação (ficam para a próxima rodada).")
+
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,56 @@
+import csv
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.importacao_usuarios import TAMANHO_LOTE_PADRAO, importar_usuarios, ler_arquivo_usuarios
+
+
+class Command(BaseCommand):
+    help = 'Cadastra usuários em massa a partir de um arquivo CSV ou JSONL (migração de bases de parceiros).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo de usuários.')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                            help='Formato do arquivo. Padrão: pela extensão.')
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO)
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                            help='Processos para gerar os hashes de senha. Padrão: número de CPUs.')
+        parser.add_argument('--rejeitados', help='CSV onde gravar as linhas rejeitadas (linha, username, cpf, motivo).')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        if not os.path.exists(caminho):
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+
+        relatorio = open(options['rejeitados'], 'w', encoding='utf-8', newline='') if options['rejeitados'] else None
+        escritor = None
+        if relatorio:
+            escritor = csv.writer(relatorio)
+            escritor.writerow(['linha', 'username', 'cpf', 'motivo'])
+
+        def ao_rejeitar(numero, linha, motivo):
+            # Nunca grava a senha no relatório
+            if escritor:
+                linha = linha if isinstance(linha, dict) else {}
+                escritor.writerow([numero, linha.get('username', ''), linha.get('cpf', ''), motivo])
+
+        inicio = time.perf_counter()
+        try:
+            totais = importar_usuarios(ler_arquivo_usuarios(caminho, options['formato']),
+                                       tamanho_lote=options['tamanho_lote'], processos=options['processos'],
+                                       origem=f'importacao:{os.path.basename(caminho)}'[:255],
+                                       ao_rejeitar=ao_rejeitar)
+        finally:
+            if relatorio:
+                relatorio.close()
+        duracao = time.perf_counter() - inicio
+
+        for chave, quantidade in sorted(totais.items()):
+            if chave.startswith('rejeitados: '):
+                self.stdout.write(f'  {chave}: {quantidade}')
+        if totais['sancionados']:
+            self.stdout.write(self.style.WARNING(
+                f"  {totais['sancionados']} usuário(s) importado(s) constam em listas restritivas (ver AlertaSancao)."))
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['linhas']} linhas lidas, {totais['criados']} usuários criados e "
+            f"{totais['rejeitados']} rejeitados em {duracao:.2f}s ({totais['criados'] / duracao:.0f} usuários/s)."))
@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _processo_worker(intervalo):
+    # Necessário quando o processo filho é criado via "spawn" (ex.: Windows).
+    import django
+    django.setup()
+
+    from core.kyc_queue import carregar_dependencias_kyc, executar_worker
+    duracao = carregar_dependencias_kyc()
+    if duracao is not None:
+        print(f"Worker de KYC pronto (dependências carregadas em {duracao:.2f}s).")
+    try:
+        executar_worker(intervalo=intervalo)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Inicia N processos worker que consomem a fila de KYC (KycJob).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=2, help='Número de processos worker.')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--timeout-travado', type=int, default=15,
+                            help='Minutos após os quais um job em PROCESSANDO volta para a fila.')
+        parser.add_argument('--intervalo-supervisao', type=float, default=60.0,
+                            help='Segundos entre as rodadas do supervisor (recuperação de jobs travados '
+                                 'e reinício de workers encerrados).')
+
+    def _recuperar_jobs(self, timeout_minutos):
+        from core.kyc_queue import recuperar_jobs_travados
+
+        devolvidos, esgotados = recuperar_jobs_travados(timeout_minutos)
+        if devolvidos:
+            self.stdout.write(f'{devolvidos} job(s) travado(s) devolvido(s) para a fila.')
+        if esgotados:
+            self.stdout.write(self.style.WARNING(f'{esgotados} job(s) travado(s) sem tentativas restantes (ESGOTADO).'))
+        # Conexões abertas não podem ser compartilhadas com os processos filhos.
+        connections.close_all()
+
+    def _iniciar_worker(self, intervalo):
+        processo = multiprocessing.Process(target=_processo_worker, args=(intervalo,))
+        processo.start()
+        return processo
+
+    def handle(self, *args, **options):
+        self._recuperar_jobs(options['timeout_travado'])
+
+        processos = [self._iniciar_worker(options['intervalo']) for _ in range(max(1, options['processos']))]
+        self.stdout.write(self.style.SUCCESS(f'{len(processos)} worker(s) de KYC iniciado(s).'))
+
+        try:
+            # Supervisor: um worker derrubado (ex.: OOM no dlib) deixa o job em PROCESSANDO;
+            # a recuperação periódica o devolve à fila e o processo é substituído.
+            while True:
+                time.sleep(options['intervalo_supervisao'])
+                self._recuperar_jobs(options['timeout_travado'])
+                for i, processo in enumerate(processos):
+                    if not processo.is_alive():
+                        self.stdout.write(self.style.WARNING(
+                            f'Worker {processo.pid} encerrado (código {processo.exitcode}); iniciando outro.'))
+                        processos[i] = self._iniciar_worker(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Encerrando workers...')
+            for processo in processos:
+                processo.terminate()
+            for processo in processos:
+                processo.join()
@@ -0,0 +1,78 @@
+from collections import Counter
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.media_ingest import ImagemInvalida, calcular_hashes_perceptuais
+from core.models import CustomUser, HashPerceptual
+from core.phash_index import CAMPOS, IndicePerceptual, para_bigint
+
+
+class Command(BaseCommand):
+    help = ('Calcula o pHash/dHash das imagens do KYC de usuários já cadastrados (as enviadas antes do índice '
+            'de imagens semelhantes) e, opcionalmente, lista as imagens repetidas entre contas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=500, help='Usuários por lote.')
+        parser.add_argument('--recalcular', action='store_true', help='Recalcula também os hashes já gravados.')
+        parser.add_argument('--listar-semelhantes', action='store_true',
+                            help='Ao final, lista os pares de contas com imagens praticamente iguais.')
+
+    def handle(self, *args, **options):
+        totais = Counter()
+        sem_imagem = [Q(**{f'{campo}__isnull': True}) | Q(**{campo: ''}) for campo in CAMPOS]
+        usuarios = CustomUser.objects.exclude(*sem_imagem).order_by('pk')
+
+        ultimo_id = 0
+        while True:
+            lote = list(usuarios.filter(pk__gt=ultimo_id).values_list('pk', *CAMPOS)[:options['tamanho_lote']])
+            if not lote:
+                break
+            ultimo_id = lote[-1][0]
+
+            existentes = set() if options['recalcular'] else set(
+                HashPerceptual.objects.filter(usuario_id__in=[linha[0] for linha in lote])
+                .values_list('usuario_id', 'campo'))
+            novos = []
+            for usuario_id, *arquivos in lote:
+                for campo, nome in zip(CAMPOS, arquivos):
+                    if not nome or (usuario_id, campo) in existentes:
+                        continue
+                    try:
+                        with default_storage.open(nome, 'rb') as arquivo:
+                            phash, dhash = calcular_hashes_perceptuais(arquivo)
+                    except (OSError, ImagemInvalida) as e:
+                        totais['erros'] += 1
+                        self.stderr.write(f'Usuário {usuario_id}, {campo}: {e}')
+                        continue
+                    novos.append(HashPerceptual(usuario_id=usuario_id, campo=campo,
+                                                phash=para_bigint(phash), dhash=para_bigint(dhash)))
+
+            HashPerceptual.objects.bulk_create(novos, update_conflicts=True, unique_fields=['usuario', 'campo'],
+                                               update_fields=['phash', 'dhash', 'data_atualizacao'])
+            totais['calculados'] += len(novos)
+            totais['usuarios'] += len(lote)
+            self.stdout.write(f"{totais['usuarios']} usuários percorridos, {totais['calculados']} hashes calculados...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['calculados']} hashes calculados para {totais['usuarios']} usuários com imagens "
+            f"({totais['erros']} arquivos com erro)."))
+
+        if options['listar_semelhantes']:
+            self._listar_semelhantes()
+
+    def _listar_semelhantes(self):
+        indice = IndicePerceptual.construir_do_banco()
+        limiar_phash = getattr(settings, 'KYC_LIMIAR_PHASH', 10)
+        limiar_dhash = getattr(settings, 'KYC_LIMIAR_DHASH', 8)
+        pares = 0
+        for usuario_id, codigo, phash, dhash in zip(indice.usuario_ids.tolist(), indice.campos.tolist(),
+                                                    indice.phashes.tolist(), indice.dhashes.tolist()):
+            for outro_id, outro_campo, distancia_p, distancia_d in indice.consultar(
+                    phash, dhash, limiar_phash, limiar_dhash, excluir_usuario_id=usuario_id):
+                # Cada par aparece uma única vez
+                if outro_id > usuario_id:
+                    pares += 1
+                    self.stdout.write(f'Usuário {usuario_id} ({CAMPOS[codigo]}) ~ usuário {outro_id} ({outro_campo}): '
+                                      f'distâncias {distancia_p}/{distancia_d}')
+        self.stdout.write(f'{pares} par(es) de imagens semelhantes entre contas.')
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from core.carteira import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o resumo de carteira de todos os investidores a partir dos investimentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total, divergentes = reconstruir_resumos(tamanho_lote=options['tamanho_lote'])
+        duracao = time.perf_counter() - inicio
+
+        if divergentes:
+            self.stdout.write(self.style.WARNING(f'{divergentes} resumos estavam divergentes e foram corrigidos.'))
+        self.stdout.write(self.style.SUCCESS(f'{total} carteiras reconstruídas em {duracao:.2f}s.'))
@@ -0,0 +1,90 @@
+import json
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Bibliotecas pesadas acompanhadas no relatório
+MODULOS_PESADOS = ['numpy', 'PIL', 'cv2', 'pandas', 'requests', 'pytesseract', 'tesserocr', 'face_recognition', 'dlib']
+
+# O que core.kyc_service e seus motores puxam ao serem importados
+MODULOS_KYC = ['PIL.Image', 'cv2', 'pytesseract', 'requests', 'face_recognition', 'core.kyc_service']
+
+# Executado em um interpretador novo para medir a inicialização sem nada já carregado
+SCRIPT_MEDICAO = r'''
+import importlib, json, os, sys, time
+inicio = time.perf_counter()
+cenario = json.loads(sys.argv[1])
+erros = []
+if cenario['django']:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', cenario['settings'])
+    import django
+    django.setup()
+# Cada módulo separado: uma dependência ausente não impede a medição das demais
+for modulo in cenario['modulos']:
+    try:
+        importlib.import_module(modulo)
+    except Exception as e:
+        erros.append(f'{modulo}: {type(e).__name__}: {e}')
+if cenario['aquecer_kyc']:
+    from core.kyc_queue import carregar_dependencias_kyc
+    if carregar_dependencias_kyc() is None:
+        erros.append('dependências do KYC indisponíveis')
+duracao = time.perf_counter() - inicio
+
+# No Linux o pico de ru_maxrss sobrevive ao exec (herda o do processo pai): /proc é mais fiel
+rss_mb = None
+try:
+    with open('/proc/self/status') as status:
+        rss_mb = next(int(l.split()[1]) for l in status if l.startswith('VmHWM:')) / 1024
+except (OSError, StopIteration):
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+    except ImportError:
+        pass  # Windows: sem o módulo resource
+print(json.dumps({'duracao': duracao, 'rss_mb': rss_mb, 'erros': erros,
+                  'pesados': [m for m in cenario['pesados'] if m in sys.modules]}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Mede tempo de inicialização e memória (RSS máximo) de um processo web e de um worker de KYC, '
+            'cada um em um interpretador novo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=3, help='Execuções por cenário (usa a mediana).')
+
+    def _cenarios(self):
+        web = [settings.ROOT_URLCONF]
+        return [
+            ('Interpretador Python (referência)', {'django': False, 'modulos': [], 'aquecer_kyc': False}),
+            ('Processo web (urls + views)', {'django': True, 'modulos': web, 'aquecer_kyc': False}),
+            # Como era quando as views importavam o pipeline: todas as bibliotecas de visão no processo web
+            ('Processo web importando o pipeline de KYC', {'django': True, 'modulos': web + MODULOS_KYC,
+                                                           'aquecer_kyc': False}),
+            ('Worker de KYC (dependências carregadas)', {'django': True, 'modulos': [], 'aquecer_kyc': True}),
+        ]
+
+    def _medir(self, cenario):
+        cenario = dict(cenario, settings=settings.SETTINGS_MODULE, pesados=MODULOS_PESADOS)
+        processo = subprocess.run([sys.executable, '-c', SCRIPT_MEDICAO, json.dumps(cenario)],
+                                  capture_output=True, text=True, cwd=settings.BASE_DIR)
+        try:
+            return json.loads(processo.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            return {'duracao': None, 'rss_mb': None, 'pesados': [], 'erros': [processo.stderr.strip()[-200:]]}
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Cenário':<45} {'Tempo (ms)':>11} {'RSS máx (MB)':>13}  Bibliotecas pesadas")
+        for nome, cenario in self._cenarios():
+            medicoes = [self._medir(cenario) for _ in range(max(1, options['repeticoes']))]
+            duracoes = [m['duracao'] for m in medicoes if m['duracao'] is not None]
+            memorias = [m['rss_mb'] for m in medicoes if m['rss_mb'] is not None]
+            tempo = f'{statistics.median(duracoes) * 1000:.0f}' if duracoes else 'n/d'
+            rss = f'{statistics.median(memorias):.1f}' if memorias else 'n/d'
+            self.stdout.write(f"{nome:<45} {tempo:>11} {rss:>13}  {', '.join(medicoes[-1]['pesados']) or '-'}")
+            for erro in medicoes[-1]['erros']:
+                self.stdout.write(self.style.WARNING(f'  {erro}'))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from core.marketplace import invalidar_cache_marketplace
+from core.models import CustomUser
+from core.risk_analysis import calcular_riscos_em_lote, obter_scorecard
+
+
+class Command(BaseCommand):
+    help = 'Recalcula em lote o nível de risco de todos os usuários com o scorecard atual.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=5000)
+        parser.add_argument('--apenas-aprovados', action='store_true',
+                            help='Recalcula apenas usuários com KYC aprovado.')
+
+    def handle(self, *args, **options):
+        queryset = CustomUser.objects.all()
+        if options['apenas_aprovados']:
+            queryset = queryset.filter(kyc_status='APROVADO')
+
+        inicio = time.perf_counter()
+        resultado = calcular_riscos_em_lote(queryset, tamanho_lote=options['tamanho_lote'])
+        duracao = time.perf_counter() - inicio
+
+        # A listagem do marketplace mostra o risco do tomador
+        if resultado['atualizados']:
+            invalidar_cache_marketplace()
+
+        self.stdout.write(f"Scorecard versão {obter_scorecard()['versao']}")
+        for nivel, quantidade in sorted(resultado['distribuicao'].items()):
+            self.stdout.write(f'  {nivel}: {quantidade}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['total']} usuários processados, {resultado['atualizados']} atualizados em {duracao:.2f}s."))
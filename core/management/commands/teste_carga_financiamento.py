@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.financiamento import financiar, transacao_de_escrita, ErroFinanciamento
+from core.models import CustomUser, Emprestimo
+from core.validators import completar_cpf
+
+
+class Command(BaseCommand):
+    help = ('Teste de carga do financiamento: muitos investidores disputam, em paralelo, o mesmo '
+            'empréstimo e empréstimos diferentes. Mede a vazão e verifica que nenhum empréstimo '
+            'foi financiado duas vezes. Cria e remove os próprios dados de teste.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investidores', type=int, default=50)
+        parser.add_argument('--emprestimos', type=int, default=200,
+                            help='Empréstimos do cenário "diferentes".')
+        parser.add_argument('--tentativas', type=int, default=2000, help='Tentativas por cenário.')
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--manter-dados', action='store_true', help='Não apaga os dados de teste ao final.')
+
+    def handle(self, *args, **options):
+        prefixo = f'carga-{uuid.uuid4().hex[:8]}'
+        tomador, investidores = self._criar_usuarios(prefixo, options['investidores'])
+        try:
+            cenarios = [
+                ('mesmo empréstimo', 1),
+                ('empréstimos diferentes', options['emprestimos']),
+            ]
+            falhas = 0
+            for nome, quantidade in cenarios:
+                emprestimos = self._criar_emprestimos(tomador, quantidade)
+                falhas += self._executar_cenario(nome, emprestimos, investidores, options)
+        finally:
+            if not options['manter_dados']:
+                CustomUser.objects.filter(username__startswith=prefixo).delete()
+
+        if falhas:
+            raise CommandError(f'{falhas} empréstimo(s) com financiamento duplicado ou inconsistente.')
+
+    def _criar_usuarios(self, prefixo, quantidade):
+        # CPFs válidos de 11 dígitos a partir de uma base aleatória livre (cabem em cpf, max_length=14)
+        while True:
+            base = random.randrange(10 ** 8, 10 ** 9 - quantidade - 1)
+            cpfs = [completar_cpf(base + i) for i in range(quantidade + 1)]
+            if not CustomUser.objects.filter(cpf__in=cpfs).exists():
+                break
+        usuarios = [CustomUser(username=f'{prefixo}-tomador', cpf=cpfs[0], password='!', kyc_status='APROVADO')]
+        usuarios += [CustomUser(username=f'{prefixo}-inv{i}', cpf=cpfs[i + 1], password='!', kyc_status='APROVADO')
+                     for i in range(quantidade)]
+        for usuario in usuarios:
+            usuario.cpf_numero = int(usuario.cpf)
+        CustomUser.objects.bulk_create(usuarios)
+        ids = list(CustomUser.objects.filter(username__startswith=prefixo).order_by('pk').values_list('pk', flat=True))
+        return ids[0], ids[1:]
+
+    def _criar_emprestimos(self, tomador_id, quantidade):
+        emprestimos = Emprestimo.objects.bulk_create([
+            Emprestimo(tomador_id=tomador_id, valor_solicitado=Decimal('1000.00'), taxa_juros=Decimal('10.00'),
+                       meses_parcelamento=12, valor_total_pagamento=Decimal('1100.00'),
+                       valor_parcela=Decimal('91.67'), status='AGUARDANDO')
+            for _ in range(quantidade)
+        ])
+        if emprestimos and emprestimos[0].pk is None:
+            return list(Emprestimo.objects.filter(tomador_id=tomador_id, status='AGUARDANDO')
+                        .values_list('pk', flat=True))
+        return [e.pk for e in emprestimos]
+
+    def _executar_cenario(self, nome, emprestimos, investidores, options):
+        vencedores = {}
+        resultados = Counter()
+        lock = threading.Lock()
+
+        def tentativa(_):
+            emprestimo_id = random.choice(emprestimos)
+            investidor_id = random.choice(investidores)
+            try:
+                with transacao_de_escrita():
+                    financiar(emprestimo_id, investidor_id)
+                with lock:
+                    resultados['sucesso'] += 1
+                    vencedores.setdefault(emprestimo_id, []).append(investidor_id)
+            except ErroFinanciamento:
+                with lock:
+                    resultados['indisponivel'] += 1
+            except Exception as e:
+                with lock:
+                    resultados[f'erro: {type(e).__name__}'] += 1
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(tentativa, range(options['tentativas'])))
+        duracao = time.perf_counter() - inicio
+
+        # Verificação: cada empréstimo tem no máximo um vencedor e o banco concorda com ele
+        no_banco = dict(Emprestimo.objects.filter(pk__in=emprestimos, status='FINANCIADO')
+                        .values_list('pk', 'investidor_id'))
+        inconsistentes = [pk for pk, ids in vencedores.items() if len(ids) > 1 or no_banco.get(pk) != ids[0]]
+        inconsistentes += [pk for pk in no_banco if pk not in vencedores]
+
+        self.stdout.write(f'\nCenário: {nome} ({len(emprestimos)} empréstimo(s), '
+                          f'{options["tentativas"]} tentativas, {options["threads"]} threads)')
+        self.stdout.write(f'  Duração: {duracao:.2f}s | Vazão: {options["tentativas"] / duracao:.0f} tentativas/s')
+        for resultado, quantidade in sorted(resultados.items()):
+            self.stdout.write(f'  {resultado}: {quantidade}')
+        self.stdout.write(f'  Empréstimos financiados: {len(no_banco)}')
+
+        if inconsistentes:
+            self.stdout.write(self.style.ERROR(f'  Financiamento duplicado/inconsistente: {inconsistentes}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  Nenhum empréstimo financiado duas vezes.'))
+        return len(inconsistentes)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.models import SancaoRestritiva
+from core.triagem_sancoes import triar_novas_sancoes
+
+
+class Command(BaseCommand):
+    help = ('Cruza com os usuários cadastrados apenas os documentos que entraram nas listas restritivas desde a '
+            'última triagem. Rodar depois de carregar_sancoes (ex.: toda noite).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fonte', action='append', choices=[c for c, _ in SancaoRestritiva.FONTE_CHOICES],
+                            help='Fonte a triar (pode repetir). Padrão: todas com carga nova.')
+        parser.add_argument('--sem-bloqueio', action='store_true',
+                            help='Apenas registra os alertas, sem reprovar o KYC dos usuários encontrados.')
+
+    def handle(self, *args, **options):
+        resultado = triar_novas_sancoes(options['fonte'], bloquear=False if options['sem_bloqueio'] else None)
+        if not resultado['fontes_triadas']:
+            self.stdout.write('Nenhuma lista mudou desde a última triagem.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['fontes_triadas']} fonte(s) triada(s): {resultado['documentos_novos']} documentos novos, "
+            f"{resultado['usuarios_encontrados']} usuário(s) encontrado(s), "
+            f"{resultado['usuarios_bloqueados']} bloqueado(s)."))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.face_index import IndiceFacial
+
+
+class Command(BaseCommand):
+    help = 'Procura em toda a base de usuários aprovados rostos cadastrados sob mais de um CPF.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limiar', type=float,
+                            default=getattr(settings, 'KYC_LIMIAR_DUPLICIDADE_FACIAL', 0.5),
+                            help='Distância máxima entre encodings para considerar o mesmo rosto.')
+        parser.add_argument('--tamanho-bloco', type=int, default=1024)
+
+    def handle(self, *args, **options):
+        indice = IndiceFacial.construir_do_banco()
+        self.stdout.write(f'{len(indice)} rostos indexados.')
+
+        total = 0
+        for id_a, id_b, distancia in indice.pares_semelhantes(options['limiar'], options['tamanho_bloco']):
+            self.stdout.write(f'Usuários {id_a} e {id_b}: distância {distancia:.3f}')
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{total} par(es) suspeito(s) encontrado(s).'))
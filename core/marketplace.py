@@ -0,0 +1,151 @@
+# core/marketplace.py
+import base64
+import hashlib
+import json
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from .models import CustomUser, Emprestimo
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+CHAVE_VERSAO_CACHE = 'marketplace:versao'
+
+# Filtros aceitos na querystring -> lookup no queryset
+FILTROS_NUMERICOS = {
+    'valor_min': ('valor_solicitado__gte', Decimal),
+    'valor_max': ('valor_solicitado__lte', Decimal),
+    'taxa_min': ('taxa_juros__gte', Decimal),
+    'taxa_max': ('taxa_juros__lte', Decimal),
+    'meses_min': ('meses_parcelamento__gte', int),
+    'meses_max': ('meses_parcelamento__lte', int),
+}
+
+# Apenas as colunas usadas na resposta, com o tomador vindo do mesmo SELECT (JOIN)
+COLUNAS_LISTAGEM = ('id', 'data_criacao', 'valor_solicitado', 'taxa_juros', 'meses_parcelamento',
+                    'valor_captado', 'valor_total_pagamento', 'tomador__username', 'tomador__risco')
+
+
+def codificar_cursor(data_criacao, emprestimo_id):
+    return base64.urlsafe_b64encode(f'{data_criacao.isoformat()}|{emprestimo_id}'.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data_criacao, emprestimo_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(data_criacao), int(emprestimo_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor inválido.')
+
+
+def ler_parametros_listagem(parametros):
+    """
+    Valida a querystring da listagem. Retorna (filtros, cursor, limite) ou lança ValueError.
+    """
+    filtros = {}
+
+    riscos = [r for r in parametros.get('risco', '').upper().split(',') if r]
+    riscos_validos = {codigo for codigo, _ in CustomUser.RISCO_CHOICES}
+    if any(r not in riscos_validos for r in riscos):
+        raise ValueError(f"Risco inválido. Use: {', '.join(sorted(riscos_validos))}.")
+    if riscos:
+        filtros['tomador__risco__in'] = sorted(riscos)
+
+    for parametro, (lookup, conversor) in FILTROS_NUMERICOS.items():
+        valor = parametros.get(parametro)
+        if valor in (None, ''):
+            continue
+        try:
+            filtros[lookup] = conversor(valor)
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"Valor inválido para '{parametro}'.")
+
+    cursor = parametros.get('cursor') or None
+    if cursor:
+        cursor = decodificar_cursor(cursor)
+
+    try:
+        limite = int(parametros.get('limite', LIMITE_PADRAO))
+    except ValueError:
+        raise ValueError("Valor inválido para 'limite'.")
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+
+    return filtros, cursor, limite
+
+
+def consultar_emprestimos_disponiveis(filtros=None, cursor=None, limite=LIMITE_PADRAO):
+    """
+    Uma página de empréstimos AGUARDANDO, do mais novo para o mais antigo, com paginação por
+    chave em (data_criacao, id): o custo de cada página não depende de quantas vieram antes.
+    Retorna (lista_de_empréstimos, próximo_cursor ou None).
+    """
+    queryset = Emprestimo.objects.filter(status='AGUARDANDO', **(filtros or {}))
+    if cursor:
+        data_criacao, emprestimo_id = cursor
+        queryset = queryset.filter(
+            Q(data_criacao__lt=data_criacao) | Q(data_criacao=data_criacao, id__lt=emprestimo_id))
+
+    # Busca um item a mais para saber se existe próxima página
+    linhas = list(queryset.order_by('-data_criacao', '-id').values(*COLUNAS_LISTAGEM)[:limite + 1])
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1]['data_criacao'], linhas[-1]['id'])
+
+    lista_emprestimos = [{
+        'id_emprestimo': emp['id'],
+        'tomador_username': emp['tomador__username'],
+        'risco_tomador': emp['tomador__risco'],
+        'valor_pedido': f"{emp['valor_solicitado']:.2f}",
+        'valor_restante': f"{emp['valor_solicitado'] - emp['valor_captado']:.2f}",
+        'taxa_juros': f"{emp['taxa_juros']}%",
+        'parcelas': emp['meses_parcelamento'],
+        'valor_total_retorno': f"{emp['valor_total_pagamento']:.2f}",
+    } for emp in linhas]
+
+    return lista_emprestimos, proximo_cursor
+
+
+def _versao_cache_marketplace():
+    versao = cache.get(CHAVE_VERSAO_CACHE)
+    if versao is None:
+        # Começa de um valor baseado no relógio: se a chave for despejada do cache,
+        # páginas gravadas com a versão antiga nunca são reaproveitadas
+        cache.add(CHAVE_VERSAO_CACHE, int(time.time() * 1000), None)
+        versao = cache.get(CHAVE_VERSAO_CACHE)
+    return versao
+
+
+def invalidar_cache_marketplace():
+    """
+    Invalida todas as páginas em cache da listagem trocando a versão que compõe as chaves.
+    Chamado quando um empréstimo é criado, recebe investimento ou deixa de estar AGUARDANDO.
+    """
+    try:
+        cache.incr(CHAVE_VERSAO_CACHE)
+    except ValueError:
+        _versao_cache_marketplace()
+
+
+def obter_pagina_serializada(filtros, cursor, limite):
+    """
+    Retorna o JSON (bytes) de uma página da listagem, servido do cache enquanto a versão do
+    marketplace não mudar. Só acessa o banco quando a página não está em cache.
+    """
+    parametros = json.dumps([sorted(filtros.items()), cursor, limite], cls=DjangoJSONEncoder)
+    chave = f'marketplace:{_versao_cache_marketplace()}:{hashlib.sha1(parametros.encode()).hexdigest()}'
+
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        lista_emprestimos, proximo_cursor = consultar_emprestimos_disponiveis(filtros, cursor, limite)
+        conteudo = json.dumps({
+            'emprestimos_disponiveis': lista_emprestimos,
+            'proximo_cursor': proximo_cursor,
+        }).encode()
+        cache.set(chave, conteudo, getattr(settings, 'MARKETPLACE_CACHE_TIMEOUT', 300))
+    return conteudo
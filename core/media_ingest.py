@@ -0,0 +1,115 @@
+# core/media_ingest.py
+import hashlib
+import io
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+# pHash: DCT de uma miniatura 32x32 em tons de cinza, da qual ficam as 8x8 frequências mais baixas
+LADO_MINIATURA_PHASH = 32
+LADO_HASH = 8
+
+
+class ImagemInvalida(ValueError):
+    pass
+
+
+def normalizar_imagem(arquivo, lado_maximo=None, qualidade=None):
+    """
+    Aplica a rotação do EXIF, limita o lado maior da imagem e recodifica em JPEG.
+    Retorna os bytes da imagem normalizada.
+    """
+    # Pillow só é carregado no primeiro upload: a maioria das requisições do processo web não usa imagens
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    lado_maximo = lado_maximo or getattr(settings, 'KYC_UPLOAD_LADO_MAXIMO', 2000)
+    qualidade = qualidade or getattr(settings, 'KYC_UPLOAD_QUALIDADE_JPEG', 90)
+
+    try:
+        with Image.open(arquivo) as imagem:
+            # Em JPEG, draft() decodifica já reduzido quando a foto é muito maior que o limite
+            imagem.draft('RGB', (lado_maximo, lado_maximo))
+            imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        # DecompressionBombError: dimensões declaradas acima do limite do Pillow (imagem maliciosa)
+        raise ImagemInvalida(f'Arquivo de imagem inválido: {e}')
+
+    imagem.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    imagem.save(buffer, format='JPEG', quality=qualidade, optimize=True)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _matriz_dct(n, k):
+    """Primeiras k linhas da matriz da DCT-II (não normalizada) de tamanho n."""
+    import numpy as np
+
+    linhas = np.arange(k)[:, None]
+    colunas = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * colunas + 1) * linhas / (2 * n))
+
+
+def _bits_para_inteiro(bits):
+    import numpy as np
+
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def calcular_hashes_perceptuais(arquivo):
+    """
+    Calcula o pHash e o dHash (inteiros sem sinal de 64 bits) de uma imagem (caminho, arquivo ou bytes).
+    Recompressão, redimensionamento e pequenos recortes mudam poucos bits, então a mesma foto reenviada
+    fica a uma distância de Hamming pequena da original.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if isinstance(arquivo, bytes):
+        arquivo = io.BytesIO(arquivo)
+    try:
+        with Image.open(arquivo) as imagem:
+            # Em JPEG a decodificação já sai reduzida: só é preciso uma miniatura
+            imagem.draft('L', (4 * LADO_MINIATURA_PHASH, 4 * LADO_MINIATURA_PHASH))
+            imagem = ImageOps.exif_transpose(imagem).convert('L')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImagemInvalida(f'Arquivo de imagem inválido: {e}')
+
+    # pHash: coeficientes de baixa frequência acima da mediana
+    miniatura = np.asarray(imagem.resize((LADO_MINIATURA_PHASH, LADO_MINIATURA_PHASH), Image.LANCZOS),
+                           dtype=np.float64)
+    dct = _matriz_dct(LADO_MINIATURA_PHASH, LADO_HASH)
+    coeficientes = dct @ miniatura @ dct.T
+    phash = _bits_para_inteiro(coeficientes > np.median(coeficientes))
+
+    # dHash: cada pixel mais claro que o vizinho da direita, numa miniatura 9x8
+    miniatura = np.asarray(imagem.resize((LADO_HASH + 1, LADO_HASH), Image.LANCZOS), dtype=np.int16)
+    dhash = _bits_para_inteiro(miniatura[:, 1:] > miniatura[:, :-1])
+    return phash, dhash
+
+
+def caminho_por_conteudo(prefixo, conteudo, extensao='jpg'):
+    """
+    Caminho endereçado pelo SHA-256 do conteúdo, em subdiretórios para não concentrar
+    milhares de arquivos numa mesma pasta. Ex.: selfies/ab/cd/abcd...ef.jpg
+    Retorna (caminho, hash).
+    """
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    caminho = f'{prefixo.rstrip("/")}/{hash_conteudo[:2]}/{hash_conteudo[2:4]}/{hash_conteudo}.{extensao}'
+    return caminho, hash_conteudo
+
+
+def armazenar_imagem_kyc(arquivo, prefixo):
+    """
+    Normaliza a imagem enviada e grava no storage pelo hash do conteúdo.
+    Um reenvio da mesma imagem reaproveita o arquivo já gravado.
+    Retorna (nome do arquivo no storage, para o ImageField; (phash, dhash) da imagem normalizada).
+    """
+    conteudo = normalizar_imagem(arquivo)
+    caminho, _ = caminho_por_conteudo(prefixo, conteudo)
+    if not default_storage.exists(caminho):
+        caminho = default_storage.save(caminho, ContentFile(conteudo))
+    return caminho, calcular_hashes_perceptuais(conteudo)
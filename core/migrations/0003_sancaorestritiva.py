@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_remove_customuser_foto_documento_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SancaoRestritiva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documento', models.CharField(db_index=True, max_length=14)),
+                ('nome', models.CharField(blank=True, max_length=255)),
+                ('fonte', models.CharField(choices=[('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas')], default='CEIS', max_length=10)),
+                ('data_carga', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fonte', 'documento'), name='sancao_fonte_documento_unica')],
+            },
+        ),
+    ]
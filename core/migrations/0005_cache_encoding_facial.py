@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_kycjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='encoding_documento_frente',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='encoding_selfie',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='hash_documento_frente',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='hash_selfie',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_cache_encoding_facial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='risco_assinatura',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='risco_calculado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='risco_valido_ate',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='risco_versao_scorecard',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='score_risco',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
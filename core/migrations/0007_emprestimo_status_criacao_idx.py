@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_risco_materializado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['status', 'data_criacao'], name='emprestimo_status_criacao_idx'),
+        ),
+    ]
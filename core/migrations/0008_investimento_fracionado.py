@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:16
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_emprestimo_status_criacao_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emprestimo',
+            name='valor_captado',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='OrdemAutoInvestimento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_maximo_por_emprestimo', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('saldo_disponivel', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('riscos_aceitos', models.CharField(default='BAIXO,MEDIO', max_length=30)),
+                ('taxa_minima', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=5)),
+                ('ativa', models.BooleanField(default=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('investidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ordens_auto_investimento', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Investimento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('origem', models.CharField(choices=[('MANUAL', 'Manual'), ('AUTOMATICO', 'Auto-investimento')], default='MANUAL', max_length=10)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('emprestimo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='investimentos', to='core.emprestimo')),
+                ('investidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='investimentos', to=settings.AUTH_USER_MODEL)),
+                ('ordem', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='investimentos', to='core.ordemautoinvestimento')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_investimento_fracionado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emprestimo',
+            name='sistema_amortizacao',
+            field=models.CharField(choices=[('PRICE', 'Tabela Price (parcelas fixas)'), ('SAC', 'SAC (amortização constante)')], default='PRICE', max_length=5),
+        ),
+        migrations.CreateModel(
+            name='Parcela',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('data_vencimento', models.DateField()),
+                ('valor_amortizacao', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valor_juros', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('saldo_devedor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('emprestimo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parcelas', to='core.emprestimo')),
+            ],
+            options={
+                'ordering': ['emprestimo', 'numero'],
+                'constraints': [models.UniqueConstraint(fields=('emprestimo', 'numero'), name='parcela_unica_por_emprestimo')],
+            },
+        ),
+    ]
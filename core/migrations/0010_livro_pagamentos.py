@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:22
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_cronograma_parcelas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcela',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('PAGA', 'Paga')], default='PENDENTE', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='parcela',
+            name='valor_pago',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='Pagamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('data_pagamento', models.DateField()),
+                ('chave_idempotencia', models.CharField(max_length=64, unique=True)),
+                ('arquivo_origem', models.CharField(blank=True, max_length=255)),
+                ('data_registro', models.DateTimeField(auto_now_add=True)),
+                ('emprestimo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos', to='core.emprestimo')),
+                ('parcela', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos', to='core.parcela')),
+            ],
+        ),
+    ]
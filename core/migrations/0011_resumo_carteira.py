@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def registrar_investimentos_legados(apps, schema_editor):
+    """Empréstimos financiados antes do financiamento fracionado não têm Investimento: cria um por empréstimo."""
+    Emprestimo = apps.get_model('core', 'Emprestimo')
+    Investimento = apps.get_model('core', 'Investimento')
+    legados = (Emprestimo.objects.filter(investidor__isnull=False, investimentos__isnull=True)
+               .values_list('id', 'investidor_id', 'valor_solicitado'))
+    Investimento.objects.bulk_create([
+        Investimento(emprestimo_id=emprestimo_id, investidor_id=investidor_id, valor=valor, origem='MANUAL')
+        for emprestimo_id, investidor_id, valor in legados
+    ], batch_size=1000)
+    Emprestimo.objects.filter(investidor__isnull=False).exclude(status='AGUARDANDO').update(
+        valor_captado=models.F('valor_solicitado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_livro_pagamentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoCarteira',
+            fields=[
+                ('investidor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_carteira', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('quantidade_investimentos', models.PositiveIntegerField(default=0)),
+                ('capital_investido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('retorno_esperado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_risco_baixo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_risco_medio', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_risco_alto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_risco_nao_calculado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_aguardando', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_financiado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('capital_finalizado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('data_atualizacao', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(registrar_investimentos_legados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:31
+
+import re
+from django.db import migrations, models
+
+TAMANHO_LOTE = 5000
+
+
+# Cópias congeladas de core.validators (normalizar_documento, cpf_para_inteiro e validar_cpf), para que
+# o histórico de migrações não mude junto com o código da aplicação
+def _cpf_para_inteiro(cpf):
+    """CPF (formatado ou não) como inteiro de 11 dígitos, ou -1 se não tiver 11 dígitos ASCII."""
+    cpf = re.sub(r'[^0-9]', '', str(cpf or ''))
+    return int(cpf) if len(cpf) == 11 else -1
+
+
+def _cpf_valido(numero):
+    if numero < 0:
+        return False
+    digitos = [int(d) for d in f'{numero:011d}']
+    if len(set(digitos)) == 1:
+        return False
+    dv1 = sum(d * p for d, p in zip(digitos[:9], range(10, 1, -1))) * 10 % 11 % 10
+    dv2 = sum(d * p for d, p in zip(digitos[:10], range(11, 1, -1))) * 10 % 11 % 10
+    return (dv1, dv2) == (digitos[9], digitos[10])
+
+
+def preencher_cpf_numero(apps, schema_editor):
+    CustomUser = apps.get_model('core', 'CustomUser')
+    SancaoRestritiva = apps.get_model('core', 'SancaoRestritiva')
+
+    # Usuários: o mesmo CPF gravado em formatos diferentes em dois cadastros não cabe na chave única.
+    # Deixar cpf_numero nulo só adiaria o erro para o próximo save() do usuário; a migração para e
+    # lista os cadastros para serem mesclados ou corrigidos antes
+    primeiro_cadastro = {}
+    repetidos = []
+    ultimo_id = 0
+    while True:
+        lote = list(CustomUser.objects.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', 'cpf')[:TAMANHO_LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+        alterados = []
+        for pk, cpf in lote:
+            numero = _cpf_para_inteiro(cpf)
+            if numero < 0:
+                continue
+            if numero in primeiro_cadastro:
+                repetidos.append((pk, primeiro_cadastro[numero]))
+                continue
+            primeiro_cadastro[numero] = pk
+            alterados.append(CustomUser(pk=pk, cpf_numero=numero))
+        CustomUser.objects.bulk_update(alterados, ['cpf_numero'], batch_size=1000)
+
+    if repetidos:
+        raise RuntimeError(
+            f'{len(repetidos)} cadastro(s) com CPF repetido em outro usuário (usuário -> cadastro anterior): '
+            + ', '.join(f'{pk} -> {anterior}' for pk, anterior in repetidos[:50])
+            + '. Mescle ou corrija esses cadastros e rode a migração de novo.')
+
+    ultimo_id = 0
+    while True:
+        lote = list(SancaoRestritiva.objects.filter(pk__gt=ultimo_id).order_by('pk')
+                    .values_list('pk', 'documento')[:TAMANHO_LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+        numeros = [(pk, _cpf_para_inteiro(documento)) for pk, documento in lote]
+        SancaoRestritiva.objects.bulk_update([
+            SancaoRestritiva(pk=pk, cpf_numero=numero) for pk, numero in numeros if _cpf_valido(numero)
+        ], ['cpf_numero'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_resumo_carteira'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='cpf_numero',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='sancaorestritiva',
+            name='cpf_numero',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(preencher_cpf_numero, migrations.RunPython.noop),
+    ]
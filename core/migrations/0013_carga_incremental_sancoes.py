@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_cpf_numero'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FonteRestritiva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(choices=[('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas')], max_length=10, unique=True)),
+                ('origem', models.CharField(blank=True, max_length=500)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('ultima_modificacao', models.CharField(blank=True, max_length=64)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('versao', models.PositiveIntegerField(default=0)),
+                ('total_registros', models.PositiveIntegerField(default=0)),
+                ('data_verificacao', models.DateTimeField(blank=True, null=True)),
+                ('data_atualizacao', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sancaorestritiva',
+            name='ultima_carga',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='sancaorestritiva',
+            index=models.Index(fields=['fonte', 'ultima_carga'], name='sancao_fonte_carga_idx'),
+        ),
+    ]
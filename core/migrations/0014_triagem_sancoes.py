@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_primeira_carga(apps, schema_editor):
+    # Registros já carregados entram como novos na versão em que estão: a primeira triagem cobre a lista toda
+    SancaoRestritiva = apps.get_model('core', 'SancaoRestritiva')
+    SancaoRestritiva.objects.update(primeira_carga=F('ultima_carga'))
+    SancaoRestritiva.objects.filter(primeira_carga=0).update(primeira_carga=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_carga_incremental_sancoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaSancao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fonte', models.CharField(choices=[('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas'), ('CNEP', 'Cadastro Nacional de Empresas Punidas')], max_length=10)),
+                ('documento', models.CharField(max_length=14)),
+                ('nome_sancionado', models.CharField(blank=True, max_length=255)),
+                ('versao_carga', models.PositiveIntegerField()),
+                ('bloqueado', models.BooleanField(default=False)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fonterestritiva',
+            name='novos_ultima_carga',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fonterestritiva',
+            name='removidos_ultima_carga',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fonterestritiva',
+            name='versao_triada',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sancaorestritiva',
+            name='primeira_carga',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='fonterestritiva',
+            name='fonte',
+            field=models.CharField(choices=[('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas'), ('CNEP', 'Cadastro Nacional de Empresas Punidas')], max_length=10, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='sancaorestritiva',
+            name='fonte',
+            field=models.CharField(choices=[('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas'), ('CNEP', 'Cadastro Nacional de Empresas Punidas')], default='CEIS', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='sancaorestritiva',
+            index=models.Index(fields=['fonte', 'primeira_carga'], name='sancao_fonte_entrada_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertasancao',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_sancao', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='alertasancao',
+            constraint=models.UniqueConstraint(fields=('usuario', 'fonte', 'documento'), name='alerta_sancao_unico'),
+        ),
+        migrations.RunPython(preencher_primeira_carga, migrations.RunPython.noop),
+    ]
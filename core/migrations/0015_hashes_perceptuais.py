@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_triagem_sancoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashPerceptual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('foto_documento_frente', 'Documento (frente)'), ('foto_documento_verso', 'Documento (verso)'), ('selfie', 'Selfie')], max_length=25)),
+                ('phash', models.BigIntegerField()),
+                ('dhash', models.BigIntegerField()),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashes_perceptuais', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'campo'), name='hash_perceptual_usuario_campo')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_hashes_perceptuais'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KycExecucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('APROVADO', 'Aprovado'), ('REPROVADO', 'Reprovado'), ('FALHA', 'Falha')], max_length=10)),
+                ('motivo_falha', models.CharField(blank=True, max_length=255)),
+                ('concorrente', models.BooleanField(default=True)),
+                ('duracao_total_ms', models.PositiveIntegerField()),
+                ('ocr_frente_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('ocr_frente_resultado', models.CharField(blank=True, max_length=20)),
+                ('ocr_verso_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('ocr_verso_resultado', models.CharField(blank=True, max_length=20)),
+                ('face_encoding_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('face_encoding_resultado', models.CharField(blank=True, max_length=20)),
+                ('face_comparacao_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('face_comparacao_resultado', models.CharField(blank=True, max_length=20)),
+                ('sancoes_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('sancoes_resultado', models.CharField(blank=True, max_length=20)),
+                ('bytes_documento_frente', models.PositiveIntegerField(blank=True, null=True)),
+                ('bytes_documento_verso', models.PositiveIntegerField(blank=True, null=True)),
+                ('bytes_selfie', models.PositiveIntegerField(blank=True, null=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kyc_execucoes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
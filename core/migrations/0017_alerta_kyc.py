@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_kyc_execucao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='kyc_status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('APROVADO', 'Aprovado'), ('REPROVADO', 'Reprovado'), ('EM_ANALISE', 'Em análise manual')], default='PENDENTE', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='kycexecucao',
+            name='status',
+            field=models.CharField(choices=[('APROVADO', 'Aprovado'), ('REPROVADO', 'Reprovado'), ('EM_ANALISE', 'Em análise manual'), ('FALHA', 'Falha')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='AlertaKyc',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ROSTO_DUPLICADO', 'Mesmo rosto em outra conta')], max_length=25)),
+                ('detalhes', models.JSONField(blank=True, default=dict)),
+                ('revisado', models.BooleanField(default=False)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_kyc', to=settings.AUTH_USER_MODEL)),
+                ('usuario_relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'usuario_relacionado', 'tipo'), name='alerta_kyc_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_alerta_kyc'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamento',
+            name='lote_importacao',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_pagamento_lote_importacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='origem_cadastro',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
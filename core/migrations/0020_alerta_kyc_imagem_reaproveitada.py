@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_customuser_origem_cadastro'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertakyc',
+            name='tipo',
+            field=models.CharField(choices=[('ROSTO_DUPLICADO', 'Mesmo rosto em outra conta'), ('IMAGEM_REAPROVEITADA', 'Mesma imagem de documento ou selfie em outra conta')], max_length=25),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_risco_tomador(apps, schema_editor):
+    # O risco da época dos investimentos já feitos não foi guardado: a melhor referência é o atual do tomador
+    Emprestimo = apps.get_model('core', 'Emprestimo')
+    Investimento = apps.get_model('core', 'Investimento')
+    Investimento.objects.update(risco_tomador=Subquery(
+        Emprestimo.objects.filter(pk=OuterRef('emprestimo_id')).values('tomador__risco')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_alerta_kyc_imagem_reaproveitada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investimento',
+            name='risco_tomador',
+            field=models.CharField(choices=[('BAIXO', 'Baixo'), ('MEDIO', 'Médio'), ('ALTO', 'Alto'), ('NAO_CALCULADO', 'Não Calculado')], default='NAO_CALCULADO', max_length=15),
+        ),
+        migrations.RunPython(preencher_risco_tomador, migrations.RunPython.noop),
+    ]
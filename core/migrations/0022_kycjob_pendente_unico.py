@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:19
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def descartar_pendentes_duplicados(apps, schema_editor):
+    # Antes da constraint, o mesmo usuário podia ter vários jobs pendentes: fica só o mais recente
+    KycJob = apps.get_model('core', 'KycJob')
+    mais_recente = KycJob.objects.filter(usuario_id=OuterRef('usuario_id'), status='PENDENTE', pk__gt=OuterRef('pk'))
+    KycJob.objects.filter(status='PENDENTE').filter(Exists(mais_recente)).update(
+        status='FALHA', resultado={'status': 'FALHA', 'motivo': 'Substituído por um job mais recente do mesmo usuário.'})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_investimento_risco_tomador'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kycjob',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('FALHA', 'Falha'), ('ESGOTADO', 'Tentativas esgotadas')], default='PENDENTE', max_length=15),
+        ),
+        migrations.RunPython(descartar_pendentes_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='kycjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDENTE')), fields=('usuario',), name='kycjob_um_pendente_por_usuario'),
+        ),
+    ]
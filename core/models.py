@@ -3,6 +3,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from .validators import cpf_para_inteiro
 
 # --- Modelo de Usuário Customizado ---
 class CustomUser(AbstractUser):
@@ -11,6 +12,7 @@ class CustomUser(AbstractUser):
         ('PENDENTE', 'Pendente'),
         ('APROVADO', 'Aprovado'),
         ('REPROVADO', 'Reprovado'),
+        ('EM_ANALISE', 'Em análise manual'),
     ]
     RISCO_CHOICES = [
         ('BAIXO', 'Baixo'),
@@ -21,8 +23,12 @@ class CustomUser(AbstractUser):
 
     # Campos adicionais ao usuário padrão do Django
     cpf = models.CharField(max_length=14, unique=True) # Ex: 123.456.789-00
+    # CPF normalizado como inteiro (chave compacta para buscas e joins, independe da formatação)
+    cpf_numero = models.BigIntegerField(unique=True, null=True, blank=True, editable=False)
     data_nascimento = models.DateField(null=True, blank=True)
     renda_mensal = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    # Trilha de auditoria: vazio para cadastro pela API, "importacao:<arquivo>" para importações em massa
+    origem_cadastro = models.CharField(max_length=255, blank=True, default='')
     
     # Campos para o processo de KYC
     foto_documento_frente = models.ImageField(upload_to='documentos/frente/', null=True, blank=True)
@@ -31,9 +37,30 @@ class CustomUser(AbstractUser):
     selfie = models.ImageField(upload_to='selfies/', null=True, blank=True)
     kyc_status = models.CharField(max_length=10, choices=STATUS_KYC_CHOICES, default='PENDENTE')
     
+    # Cache dos encodings faciais (128 floats32 em bytes), válidos enquanto o SHA-256 da imagem não mudar
+    hash_documento_frente = models.CharField(max_length=64, blank=True, default='')
+    encoding_documento_frente = models.BinaryField(null=True, blank=True)
+    hash_selfie = models.CharField(max_length=64, blank=True, default='')
+    encoding_selfie = models.BinaryField(null=True, blank=True)
+
     # Campo para o resultado da análise de risco
     risco = models.CharField(max_length=15, choices=RISCO_CHOICES, default='NAO_CALCULADO')
 
+    # Score materializado: só é recalculado quando as entradas, a versão do scorecard mudam
+    # ou quando passa de risco_valido_ate (ex.: aniversário que muda a faixa de idade)
+    score_risco = models.IntegerField(null=True, blank=True)
+    risco_versao_scorecard = models.CharField(max_length=20, blank=True, default='')
+    risco_assinatura = models.CharField(max_length=40, blank=True, default='')
+    risco_calculado_em = models.DateTimeField(null=True, blank=True)
+    risco_valido_ate = models.DateField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        self.cpf_numero = cpf_para_inteiro(self.cpf)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cpf' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'cpf_numero'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
 
@@ -44,6 +71,10 @@ class Emprestimo(models.Model):
         ('FINANCIADO', 'Financiado'),
         ('FINALIZADO', 'Finalizado'),
     ]
+    SISTEMA_AMORTIZACAO_CHOICES = [
+        ('PRICE', 'Tabela Price (parcelas fixas)'),
+        ('SAC', 'SAC (amortização constante)'),
+    ]
 
     # Relacionamento: Quem está pedindo o empréstimo
     tomador = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='emprestimos_pedidos')
@@ -52,15 +83,329 @@ class Emprestimo(models.Model):
     investidor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='emprestimos_investidos')
 
     valor_solicitado = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
-    taxa_juros = models.DecimalField(max_digits=5, decimal_places=2) # Ex: 5.00 para 5%
+    taxa_juros = models.DecimalField(max_digits=5, decimal_places=2) # Ex: 5.00 para 5% sobre o valor, em todo o prazo
     meses_parcelamento = models.IntegerField(validators=[MinValueValidator(1)])
+    sistema_amortizacao = models.CharField(max_length=5, choices=SISTEMA_AMORTIZACAO_CHOICES, default='PRICE')
     
     # Campos calculados para facilitar a visualização
     valor_total_pagamento = models.DecimalField(max_digits=10, decimal_places=2)
     valor_parcela = models.DecimalField(max_digits=10, decimal_places=2)
+
+    # Quanto já foi captado junto aos investidores (financiamento fracionado, ver Investimento)
+    valor_captado = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     
     data_criacao = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=15, choices=STATUS_EMPRESTIMO_CHOICES, default='AGUARDANDO')
 
+    class Meta:
+        indexes = [
+            # Listagem do marketplace: filtra por status e pagina por (data_criacao, id)
+            models.Index(fields=['status', 'data_criacao'], name='emprestimo_status_criacao_idx'),
+        ]
+
+    def __str__(self):
+        return f"Empréstimo de R$ {self.valor_solicitado} para {self.tomador.username}"
+
+class Parcela(models.Model):
+    """Parcela do cronograma de pagamento, gerada quando o empréstimo é financiado."""
+    STATUS_PARCELA_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PAGA', 'Paga'),
+    ]
+
+    emprestimo = models.ForeignKey(Emprestimo, on_delete=models.CASCADE, related_name='parcelas')
+    numero = models.PositiveSmallIntegerField()
+    data_vencimento = models.DateField()
+    valor_amortizacao = models.DecimalField(max_digits=10, decimal_places=2)
+    valor_juros = models.DecimalField(max_digits=10, decimal_places=2)
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+    saldo_devedor = models.DecimalField(max_digits=10, decimal_places=2)  # Após o pagamento desta parcela
+    valor_pago = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    status = models.CharField(max_length=10, choices=STATUS_PARCELA_CHOICES, default='PENDENTE')
+
+    class Meta:
+        ordering = ['emprestimo', 'numero']
+        constraints = [
+            models.UniqueConstraint(fields=['emprestimo', 'numero'], name='parcela_unica_por_emprestimo'),
+        ]
+
+    def __str__(self):
+        return f"Parcela {self.numero} do empréstimo #{self.emprestimo_id} (R$ {self.valor})"
+
+class Pagamento(models.Model):
+    """Lançamento do livro de pagamentos. A chave de idempotência torna reimportações inócuas."""
+    emprestimo = models.ForeignKey(Emprestimo, on_delete=models.CASCADE, related_name='pagamentos')
+    parcela = models.ForeignKey(Parcela, on_delete=models.CASCADE, related_name='pagamentos')
+    valor = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    data_pagamento = models.DateField()
+    chave_idempotencia = models.CharField(max_length=64, unique=True)
+    arquivo_origem = models.CharField(max_length=255, blank=True)
+    # Lote da importação que gravou o lançamento: separa o que este lote inseriu do que outro já tinha lançado
+    lote_importacao = models.UUIDField(null=True, blank=True, editable=False)
+    data_registro = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pagamento de R$ {self.valor} da parcela {self.parcela_id} ({self.data_pagamento})"
+
+# --- Modelos de Investimento ---
+class OrdemAutoInvestimento(models.Model):
+    """Ordem permanente de um investidor, executada pelo motor de auto-investimento."""
+    investidor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ordens_auto_investimento')
+    valor_maximo_por_emprestimo = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    saldo_disponivel = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    riscos_aceitos = models.CharField(max_length=30, default='BAIXO,MEDIO')  # Ex: "BAIXO,MEDIO"
+    taxa_minima = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'))
+    ativa = models.BooleanField(default=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    def lista_riscos_aceitos(self):
+        return [r for r in self.riscos_aceitos.split(',') if r]
+
+    def __str__(self):
+        return f"Auto-investimento de {self.investidor.username} (saldo R$ {self.saldo_disponivel})"
+
+
+class Investimento(models.Model):
+    """Parte de um empréstimo financiada por um investidor."""
+    ORIGEM_CHOICES = [
+        ('MANUAL', 'Manual'),
+        ('AUTOMATICO', 'Auto-investimento'),
+    ]
+
+    emprestimo = models.ForeignKey(Emprestimo, on_delete=models.CASCADE, related_name='investimentos')
+    investidor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='investimentos')
+    valor = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    origem = models.CharField(max_length=10, choices=ORIGEM_CHOICES, default='MANUAL')
+    ordem = models.ForeignKey(OrdemAutoInvestimento, on_delete=models.SET_NULL, null=True, blank=True, related_name='investimentos')
+    # Risco do tomador no momento do investimento: é a faixa do resumo da carteira (incremental e reconstrução)
+    risco_tomador = models.CharField(max_length=15, choices=CustomUser.RISCO_CHOICES, default='NAO_CALCULADO')
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"R$ {self.valor} de {self.investidor.username} no empréstimo #{self.emprestimo_id}"
+
+
+class ResumoCarteira(models.Model):
+    """
+    Resumo da carteira de um investidor, mantido de forma incremental (ver core/carteira.py).
+    O risco é o do tomador no momento do investimento; manage.py reconciliar_carteiras reconstrói tudo.
+    """
+    investidor = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='resumo_carteira')
+    quantidade_investimentos = models.PositiveIntegerField(default=0)
+    capital_investido = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    retorno_esperado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    # Exposição por faixa de risco do tomador
+    capital_risco_baixo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    capital_risco_medio = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    capital_risco_alto = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    capital_risco_nao_calculado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    # Exposição por status do empréstimo
+    capital_aguardando = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    capital_financiado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    capital_finalizado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    data_atualizacao = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Carteira de {self.investidor_id}: R$ {self.capital_investido}"
+
+
+# --- Modelo da Base Restritiva (Sanções) ---
+class SancaoRestritiva(models.Model):
+    FONTE_CHOICES = [
+        ('CEIS', 'Cadastro de Empresas Inidôneas e Suspensas'),
+        ('CNEP', 'Cadastro Nacional de Empresas Punidas'),
+    ]
+
+    # Documento normalizado (apenas dígitos), usado como chave de consulta no KYC
+    documento = models.CharField(max_length=14, db_index=True)
+    # Preenchido apenas para CPFs válidos: casa com CustomUser.cpf_numero por inteiro
+    cpf_numero = models.BigIntegerField(null=True, blank=True, db_index=True)
+    nome = models.CharField(max_length=255, blank=True)
+    fonte = models.CharField(max_length=10, choices=FONTE_CHOICES, default='CEIS')
+    data_carga = models.DateTimeField(auto_now_add=True)
+    # Versões (FonteRestritiva.versao) da carga em que o documento entrou na lista e da última em que constava
+    primeira_carga = models.PositiveIntegerField(default=0)
+    ultima_carga = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fonte', 'documento'], name='sancao_fonte_documento_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['fonte', 'ultima_carga'], name='sancao_fonte_carga_idx'),
+            models.Index(fields=['fonte', 'primeira_carga'], name='sancao_fonte_entrada_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fonte}: {self.documento}"
+
+
+class FonteRestritiva(models.Model):
+    """Estado da última carga de cada lista restritiva, usado para não baixar de novo o que não mudou."""
+    fonte = models.CharField(max_length=10, choices=SancaoRestritiva.FONTE_CHOICES, unique=True)
+    origem = models.CharField(max_length=500, blank=True)
+    # Validadores HTTP devolvidos pelo servidor e SHA-256 do conteúdo carregado
+    etag = models.CharField(max_length=255, blank=True)
+    ultima_modificacao = models.CharField(max_length=64, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    versao = models.PositiveIntegerField(default=0)
+    total_registros = models.PositiveIntegerField(default=0)
+    # Diferença da última carga em relação à anterior
+    novos_ultima_carga = models.PositiveIntegerField(default=0)
+    removidos_ultima_carga = models.PositiveIntegerField(default=0)
+    # Última versão já cruzada com a base de usuários (triar_sancoes)
+    versao_triada = models.PositiveIntegerField(default=0)
+    data_verificacao = models.DateTimeField(null=True, blank=True)
+    data_atualizacao = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.fonte} (versão {self.versao})"
+
+
+class AlertaSancao(models.Model):
+    """Usuário já cadastrado cujo CPF entrou em uma lista restritiva depois do KYC."""
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='alertas_sancao')
+    # Cópia do registro da lista: a sanção pode sair da lista depois, o alerta permanece
+    fonte = models.CharField(max_length=10, choices=SancaoRestritiva.FONTE_CHOICES)
+    documento = models.CharField(max_length=14)
+    nome_sancionado = models.CharField(max_length=255, blank=True)
+    versao_carga = models.PositiveIntegerField()
+    bloqueado = models.BooleanField(default=False)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'fonte', 'documento'], name='alerta_sancao_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario} em {self.fonte}"
+
+
+class AlertaKyc(models.Model):
+    """
+    Indício de fraude encontrado no KYC (ex.: o mesmo rosto em outra conta), para revisão manual pela
+    equipe. As contas relacionadas ficam só aqui e no log: nunca vão para a resposta ao solicitante.
+    """
+    TIPO_CHOICES = [
+        ('ROSTO_DUPLICADO', 'Mesmo rosto em outra conta'),
+        ('IMAGEM_REAPROVEITADA', 'Mesma imagem de documento ou selfie em outra conta'),
+    ]
+
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='alertas_kyc')
+    usuario_relacionado = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    tipo = models.CharField(max_length=25, choices=TIPO_CHOICES)
+    # Medidas da semelhança (ex.: distância entre os encodings, distâncias de Hamming entre as imagens)
+    detalhes = models.JSONField(default=dict, blank=True)
+    revisado = models.BooleanField(default=False)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'usuario_relacionado', 'tipo'], name='alerta_kyc_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.usuario_id} ~ {self.usuario_relacionado_id}"
+
+
+class HashPerceptual(models.Model):
+    """pHash e dHash das imagens do KYC, para achar a mesma foto reenviada (recortada ou recomprimida) em outra conta."""
+    CAMPO_CHOICES = [
+        ('foto_documento_frente', 'Documento (frente)'),
+        ('foto_documento_verso', 'Documento (verso)'),
+        ('selfie', 'Selfie'),
+    ]
+
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='hashes_perceptuais')
+    campo = models.CharField(max_length=25, choices=CAMPO_CHOICES)
+    # Hashes de 64 bits gravados com sinal (BigIntegerField); ver phash_index.para_bigint
+    phash = models.BigIntegerField()
+    dhash = models.BigIntegerField()
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'campo'], name='hash_perceptual_usuario_campo'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id}/{self.campo}: {self.phash & (2 ** 64 - 1):016x}"
+
+
+# --- Fila de processamento do KYC ---
+class KycJob(models.Model):
+    STATUS_JOB_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('FALHA', 'Falha'),
+        ('ESGOTADO', 'Tentativas esgotadas'),
+    ]
+
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='kyc_jobs')
+    status = models.CharField(max_length=15, choices=STATUS_JOB_CHOICES, default='PENDENTE')
+    resultado = models.JSONField(null=True, blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    data_fim = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'data_criacao'], name='kycjob_status_criacao_idx'),
+        ]
+        constraints = [
+            # No máximo um job pendente por usuário: enfileirar de novo reaproveita o existente.
+            models.UniqueConstraint(fields=['usuario'], condition=models.Q(status='PENDENTE'),
+                                    name='kycjob_um_pendente_por_usuario'),
+        ]
+
+    def __str__(self):
+        return f"KYC #{self.pk} de {self.usuario.username} ({self.status})"
+
+
+class KycExecucao(models.Model):
+    """Uma execução do pipeline de KYC: tempo e resultado de cada etapa, para acompanhar a latência."""
+    ETAPAS = ['ocr_frente', 'ocr_verso', 'face_encoding', 'face_comparacao', 'sancoes']
+    STATUS_CHOICES = [
+        ('APROVADO', 'Aprovado'),
+        ('REPROVADO', 'Reprovado'),
+        ('EM_ANALISE', 'Em análise manual'),
+        ('FALHA', 'Falha'),
+    ]
+
+    usuario = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='kyc_execucoes')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    motivo_falha = models.CharField(max_length=255, blank=True)
+    concorrente = models.BooleanField(default=True)
+    duracao_total_ms = models.PositiveIntegerField()
+
+    # Tempo de parede (ms) e resultado de cada etapa; nulo/vazio quando a etapa não terminou
+    # (ex.: cancelada porque o resultado já estava decidido)
+    ocr_frente_ms = models.PositiveIntegerField(null=True, blank=True)
+    ocr_frente_resultado = models.CharField(max_length=20, blank=True)
+    ocr_verso_ms = models.PositiveIntegerField(null=True, blank=True)
+    ocr_verso_resultado = models.CharField(max_length=20, blank=True)
+    face_encoding_ms = models.PositiveIntegerField(null=True, blank=True)
+    face_encoding_resultado = models.CharField(max_length=20, blank=True)
+    face_comparacao_ms = models.PositiveIntegerField(null=True, blank=True)
+    face_comparacao_resultado = models.CharField(max_length=20, blank=True)
+    sancoes_ms = models.PositiveIntegerField(null=True, blank=True)
+    sancoes_resultado = models.CharField(max_length=20, blank=True)
+
+    # Tamanho (bytes) das imagens processadas
+    bytes_documento_frente = models.PositiveIntegerField(null=True, blank=True)
+    bytes_documento_verso = models.PositiveIntegerField(null=True, blank=True)
+    bytes_selfie = models.PositiveIntegerField(null=True, blank=True)
+
+    data_criacao = models.DateTimeField(auto_now_add=True, db_index=True)
+
     def __str__(self):
-        return f"Empréstimo de R$ {self.valor_solicitado} para {self.tomador.username}"
\ No newline at end of file
+        return f"KYC de {self.usuario_id} em {self.data_criacao:%d/%m/%Y %H:%M} ({self.status}, {self.duracao_total_ms} ms)"
@@ -0,0 +1,158 @@
+# core/ocr_engine.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MotorOCR:
+    """
+    Interface dos motores de OCR usados no KYC.
+    `psm` é o modo de segmentação de página do Tesseract e `whitelist` restringe os caracteres reconhecidos.
+    """
+
+    def __init__(self, idioma='por', tamanho_pool=2):
+        self.idioma = idioma
+        self.tamanho_pool = max(1, tamanho_pool)
+        self._executor = ThreadPoolExecutor(max_workers=self.tamanho_pool, thread_name_prefix='ocr')
+
+    def reconhecer(self, imagem, psm=3, whitelist=None):
+        raise NotImplementedError
+
+    def reconhecer_lote(self, imagens, psm=3, whitelist=None, duracoes=None):
+        """
+        Reconhece várias imagens de uma vez, em paralelo, mantendo a ordem da entrada.
+        Com `duracoes` (lista), acrescenta a ela os segundos gastos em cada imagem, na mesma ordem.
+        """
+        def reconhecer(imagem):
+            inicio = time.perf_counter()
+            return self.reconhecer(imagem, psm, whitelist), time.perf_counter() - inicio
+
+        if len(imagens) == 1:
+            resultados = [reconhecer(imagens[0])]
+        else:
+            resultados = list(self._executor.map(reconhecer, imagens))
+        if duracoes is not None:
+            duracoes.extend(duracao for _, duracao in resultados)
+        return [texto for texto, _ in resultados]
+
+    def detectar_orientacao(self, imagem):
+        """Retorna a rotação horária (0, 90, 180 ou 270 graus) que endireita a imagem, pelo OSD do Tesseract."""
+        raise NotImplementedError
+
+
+class MotorPytesseract(MotorOCR):
+    """Executa o binário `tesseract` em um subprocesso por imagem (recarrega o idioma a cada chamada)."""
+
+    def __init__(self, tesseract_cmd='tesseract', **kwargs):
+        super().__init__(**kwargs)
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    def reconhecer(self, imagem, psm=3, whitelist=None):
+        config = f'--psm {psm}'
+        if whitelist:
+            config += f' -c tessedit_char_whitelist={whitelist}'
+        return self._pytesseract.image_to_string(imagem, lang=self.idioma, config=config)
+
+    def detectar_orientacao(self, imagem):
+        osd = self._pytesseract.image_to_osd(imagem, output_type=self._pytesseract.Output.DICT)
+        return osd['rotate']
+
+
+class MotorTesserocr(MotorOCR):
+    """
+    Mantém `tamanho_pool` instâncias da API C do Tesseract (via tesserocr) já inicializadas
+    com o idioma carregado (e, na primeira detecção de orientação, outras tantas com o modelo do OSD).
+    Cada chamada só paga o tempo de reconhecimento; as instâncias são emprestadas de uma fila,
+    então o motor pode ser usado por várias threads.
+    """
+
+    def __init__(self, tessdata=None, **kwargs):
+        super().__init__(**kwargs)
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self._tessdata = tessdata
+        self._apis = self._criar_pool(lang=self.idioma)
+        # Instâncias do OSD (modelo 'osd'), criadas só na primeira detecção de orientação
+        self._apis_osd = None
+        self._lock_osd = threading.Lock()
+
+    def _criar_pool(self, **opcoes):
+        if self._tessdata:
+            opcoes['path'] = self._tessdata
+        apis = queue.Queue()
+        for _ in range(self.tamanho_pool):
+            apis.put(self._tesserocr.PyTessBaseAPI(**opcoes))
+        return apis
+
+    def _emprestar(self, apis, imagem, funcao):
+        from PIL import Image
+
+        if not isinstance(imagem, Image.Image):
+            imagem = Image.fromarray(imagem)
+
+        api = apis.get()
+        try:
+            api.SetImage(imagem)
+            return funcao(api)
+        finally:
+            api.Clear()
+            apis.put(api)
+
+    def reconhecer(self, imagem, psm=3, whitelist=None):
+        def reconhecer(api):
+            api.SetPageSegMode(psm)
+            api.SetVariable('tessedit_char_whitelist', whitelist or '')
+            return api.GetUTF8Text()
+
+        return self._emprestar(self._apis, imagem, reconhecer)
+
+    def detectar_orientacao(self, imagem):
+        with self._lock_osd:
+            if self._apis_osd is None:
+                self._apis_osd = self._criar_pool(lang='osd', psm=self._tesserocr.PSM.OSD_ONLY)
+        osd = self._emprestar(self._apis_osd, imagem, lambda api: api.DetectOrientationScript())
+        # orient_deg é a orientação do texto (anti-horária); o giro que endireita é o complemento
+        return (360 - osd['orient_deg']) % 360
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def criar_motor_ocr():
+    """Cria o motor configurado em settings.KYC_OCR_MOTOR ('tesserocr' ou 'pytesseract')."""
+    motor = getattr(settings, 'KYC_OCR_MOTOR', 'tesserocr')
+    opcoes = {
+        'idioma': getattr(settings, 'KYC_OCR_IDIOMA', 'por'),
+        'tamanho_pool': getattr(settings, 'KYC_OCR_TAMANHO_POOL', 2),
+    }
+
+    if motor == 'tesserocr':
+        try:
+            return MotorTesserocr(tessdata=getattr(settings, 'KYC_TESSDATA_DIR', None), **opcoes)
+        except ImportError:
+            logger.warning("tesserocr não está instalado: o OCR do KYC vai executar o binário do tesseract "
+                           "a cada imagem (pytesseract). Instale o tesserocr (requirements.txt) ou defina "
+                           "KYC_OCR_MOTOR='pytesseract' para assumir esse modo.")
+    elif motor != 'pytesseract':
+        raise ValueError(f"Motor de OCR desconhecido: {motor}")
+
+    return MotorPytesseract(tesseract_cmd=getattr(settings, 'KYC_TESSERACT_CMD', 'tesseract'), **opcoes)
+
+
+def obter_motor_ocr():
+    """Retorna o motor de OCR do processo, criado (e aquecido) na primeira chamada."""
+    global _motor
+    with _lock_motor:
+        if _motor is None:
+            _motor = criar_motor_ocr()
+        return _motor
@@ -0,0 +1,176 @@
+# core/pagamentos.py
+import hashlib
+import uuid
+from collections import Counter
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .arquivos import ler_linhas_arquivo
+from .carteira import transferir_status
+from .models import Emprestimo, Pagamento, Parcela
+
+TAMANHO_LOTE_PADRAO = 5000
+
+# Quantos erros de linha são guardados para o relatório (o total é sempre contado)
+MAXIMO_ERROS_RELATADOS = 20
+
+
+def ler_arquivo_pagamentos(caminho, formato=None):
+    """
+    Lê um arquivo de pagamentos (CSV ou JSONL) em streaming. Colunas: emprestimo_id, valor,
+    data_pagamento (AAAA-MM-DD) e, opcionais, numero_parcela e chave_idempotencia.
+    """
+    return ler_linhas_arquivo(caminho, formato)
+
+
+def _interpretar_linha(linha, ocorrencias):
+    """
+    Converte e valida uma linha. Retorna dict normalizado ou lança ValueError.
+    `ocorrencias` conta, ao longo de toda a importação, quantas vezes o mesmo pagamento já apareceu.
+    """
+    if not isinstance(linha, dict):
+        raise ValueError('linha malformada')
+    try:
+        emprestimo_id = int(linha['emprestimo_id'])
+        valor = Decimal(str(linha['valor']).replace(',', '.')).quantize(Decimal('0.01'))
+        data_pagamento = date.fromisoformat(str(linha['data_pagamento']).strip())
+        numero_parcela = int(linha['numero_parcela']) if linha.get('numero_parcela') not in (None, '') else None
+    except KeyError as e:
+        raise ValueError(f'coluna obrigatória ausente: {e.args[0]}')
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError('valor, data ou identificador inválido')
+    if valor <= 0:
+        raise ValueError('valor deve ser positivo')
+
+    chave = str(linha.get('chave_idempotencia') or '').strip()
+    if not chave:
+        # Sem identificador no arquivo: só o conteúdo identifica o pagamento, mais a sequência dele entre
+        # os pagamentos iguais do dia. Dois pagamentos iguais no mesmo dia continuam distintos e
+        # reimportar o arquivo (mesmo renomeado ou reordenado) não duplica nada
+        conteudo = f'{emprestimo_id}|{numero_parcela or ""}|{valor}|{data_pagamento.isoformat()}'
+        sequencia = ocorrencias[conteudo]
+        ocorrencias[conteudo] += 1
+        chave = hashlib.sha256(f'{conteudo}|{sequencia}'.encode()).hexdigest()
+
+    return {'emprestimo_id': emprestimo_id, 'numero_parcela': numero_parcela, 'valor': valor,
+            'data_pagamento': data_pagamento, 'chave_idempotencia': chave[:64]}
+
+
+@transaction.atomic
+def registrar_lote_pagamentos(pagamentos, arquivo_origem=''):
+    """
+    Lança um lote de pagamentos já validados. As consultas são feitas uma vez por lote
+    (chaves já lançadas, parcelas dos empréstimos envolvidos) e viram dicionários de busca;
+    a gravação é um bulk_create mais UPDATEs em conjunto nas parcelas e nos empréstimos quitados.
+    Retorna um Counter com o resultado de cada linha.
+    """
+    resultado = Counter()
+    lote = uuid.uuid4()
+
+    chaves = {p['chave_idempotencia'] for p in pagamentos}
+    ja_lancadas = set(Pagamento.objects.filter(chave_idempotencia__in=chaves)
+                      .values_list('chave_idempotencia', flat=True))
+
+    parcelas_por_emprestimo = {}
+    for parcela in (Parcela.objects
+                    .filter(emprestimo_id__in={p['emprestimo_id'] for p in pagamentos},
+                            emprestimo__status='FINANCIADO')
+                    .order_by('emprestimo_id', 'numero')
+                    .values('id', 'emprestimo_id', 'numero', 'valor', 'valor_pago')):
+        parcelas_por_emprestimo.setdefault(parcela['emprestimo_id'], {})[parcela['numero']] = parcela
+
+    novos = []
+    for pagamento in pagamentos:
+        chave = pagamento['chave_idempotencia']
+        if chave in ja_lancadas:
+            resultado['duplicados'] += 1
+            continue
+
+        parcelas = parcelas_por_emprestimo.get(pagamento['emprestimo_id'])
+        if not parcelas:
+            resultado['sem_emprestimo_financiado'] += 1
+            continue
+
+        if pagamento['numero_parcela'] is not None:
+            parcela = parcelas.get(pagamento['numero_parcela'])
+            if parcela is None:
+                resultado['parcela_inexistente'] += 1
+                continue
+        else:
+            # Sem número: vai para a primeira parcela ainda em aberto (ou a última, se tudo já foi pago)
+            parcela = next((p for p in parcelas.values() if p['valor_pago'] < p['valor']),
+                           parcelas[max(parcelas)])
+
+        parcela['valor_pago'] += pagamento['valor']
+        ja_lancadas.add(chave)
+        novos.append(Pagamento(emprestimo_id=pagamento['emprestimo_id'], parcela_id=parcela['id'],
+                               valor=pagamento['valor'], data_pagamento=pagamento['data_pagamento'],
+                               chave_idempotencia=chave, arquivo_origem=arquivo_origem[:255],
+                               lote_importacao=lote))
+
+    if not novos:
+        return resultado
+
+    # ignore_conflicts: se outra importação lançou a mesma chave nesse meio tempo, o banco descarta.
+    # Só conta e baixa o que foi de fato gravado por este lote
+    Pagamento.objects.bulk_create(novos, batch_size=1000, ignore_conflicts=True)
+    inseridos = list(Pagamento.objects
+                     .filter(chave_idempotencia__in=[p.chave_idempotencia for p in novos], lote_importacao=lote)
+                     .values_list('parcela_id', 'emprestimo_id'))
+    resultado['lancados'] += len(inseridos)
+    resultado['duplicados'] += len(novos) - len(inseridos)
+    if not inseridos:
+        return resultado
+
+    # valor_pago é sempre a soma do livro: recalculado no banco a partir dos lançamentos (não
+    # incrementado) com UPDATEs em conjunto, em vez de um CASE por linha do bulk_update
+    parcelas_afetadas = Parcela.objects.filter(pk__in={parcela_id for parcela_id, _ in inseridos})
+    soma_pagamentos = (Pagamento.objects.filter(parcela=OuterRef('pk')).order_by()
+                       .values('parcela').annotate(total=Sum('valor')).values('total'))
+    parcelas_afetadas.update(valor_pago=Coalesce(Subquery(soma_pagamentos), Decimal('0.00')))
+    parcelas_afetadas.filter(valor_pago__gte=F('valor')).update(status='PAGA')
+    parcelas_afetadas.filter(valor_pago__lt=F('valor')).update(status='PENDENTE')
+
+    # Empréstimos sem nenhuma parcela pendente são finalizados com um único UPDATE
+    quitados = list(Emprestimo.objects
+                    .filter(pk__in={emprestimo_id for _, emprestimo_id in inseridos}, status='FINANCIADO')
+                    .exclude(Exists(Parcela.objects.filter(emprestimo=OuterRef('pk'), status='PENDENTE')))
+                    .values_list('pk', flat=True))
+    if quitados:
+        resultado['emprestimos_finalizados'] += (Emprestimo.objects.filter(pk__in=quitados, status='FINANCIADO')
+                                                 .update(status='FINALIZADO'))
+        transferir_status(quitados, 'FINANCIADO', 'FINALIZADO')
+    return resultado
+
+
+def importar_pagamentos(linhas, tamanho_lote=TAMANHO_LOTE_PADRAO, arquivo_origem=''):
+    """
+    Importa um fluxo de linhas (numero_da_linha, dict) em lotes de tamanho fixo: a memória usada
+    depende do tamanho do lote, não do arquivo. Cada lote é uma transação; reimportar o mesmo
+    arquivo não lança nada de novo. Retorna (Counter com os totais, lista de erros de linha).
+    """
+    totais = Counter()
+    erros = []
+    ocorrencias = Counter()
+    linhas = iter(linhas)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+
+        pagamentos = []
+        for numero, linha in lote:
+            try:
+                pagamentos.append(_interpretar_linha(linha, ocorrencias))
+            except ValueError as e:
+                totais['invalidos'] += 1
+                if len(erros) < MAXIMO_ERROS_RELATADOS:
+                    erros.append(f'linha {numero}: {e}')
+
+        totais['linhas'] += len(lote)
+        if pagamentos:
+            totais.update(registrar_lote_pagamentos(pagamentos, arquivo_origem))
+    return totais, erros
@@ -0,0 +1,197 @@
+# core/phash_index.py
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+import numpy as np
+from django.conf import settings
+from .models import HashPerceptual
+
+BITS_HASH = 64
+BITS_BLOCO = 16
+NUMERO_BLOCOS = BITS_HASH // BITS_BLOCO
+MASCARA_BLOCO = (1 << BITS_BLOCO) - 1
+CAMPOS = [campo for campo, _ in HashPerceptual.CAMPO_CHOICES]
+
+# Inclusões feitas depois da construção ficam numa lista conferida uma a uma até serem indexadas
+LIMITE_PENDENTES = 1024
+
+
+def para_bigint(valor):
+    """Hash sem sinal de 64 bits como inteiro com sinal, para o BigIntegerField."""
+    return valor - (1 << BITS_HASH) if valor >= (1 << (BITS_HASH - 1)) else valor
+
+
+@lru_cache(maxsize=None)
+def _variacoes(raio):
+    """Máscaras de um bloco com até `raio` bits ligados: o XOR com elas enumera os vizinhos do bloco."""
+    mascaras = [0]
+    for quantidade in range(1, raio + 1):
+        mascaras += [sum(1 << bit for bit in bits) for bits in combinations(range(BITS_BLOCO), quantidade)]
+    return np.array(mascaras, dtype=np.uint16)
+
+
+class IndicePerceptual:
+    """
+    Índice em memória dos hashes perceptuais das imagens do KYC, por multi-index hashing.
+    O pHash de 64 bits é dividido em 4 blocos de 16 bits; se dois hashes diferem em até r bits, ao
+    menos um bloco difere em até r // 4 (casa dos pombos). A consulta procura, em cada bloco, só os
+    valores vizinhos (busca binária em uma tabela ordenada por bloco e valor) e confere pHash e dHash completos
+    apenas desses candidatos, em vez de comparar com todas as imagens da base.
+    """
+
+    def __init__(self, usuario_ids=None, campos=None, phashes=None, dhashes=None):
+        self.usuario_ids = np.asarray(usuario_ids if usuario_ids is not None else [], dtype=np.int64)
+        self.campos = np.asarray(campos if campos is not None else [], dtype=np.int8)
+        self.phashes = np.asarray(phashes if phashes is not None else [], dtype=np.uint64)
+        self.dhashes = np.asarray(dhashes if dhashes is not None else [], dtype=np.uint64)
+        self.ativos = np.ones(len(self.usuario_ids), dtype=bool)
+        self.pendentes = []
+        self._indexar()
+        self.construido_em = time.monotonic()
+
+    def __len__(self):
+        return int(self.ativos.sum()) + len(self.pendentes)
+
+    def _indexar(self):
+        # As 4 tabelas numa só, ordenada por (bloco, valor do bloco): uma busca binária atende todos os blocos
+        deslocamentos = np.arange(NUMERO_BLOCOS, dtype=np.uint64) * np.uint64(BITS_BLOCO)
+        valores = (self.phashes[None, :] >> deslocamentos[:, None]) & np.uint64(MASCARA_BLOCO)
+        chaves = (valores.astype(np.uint32) | (np.arange(NUMERO_BLOCOS, dtype=np.uint32)[:, None] << BITS_BLOCO)).ravel()
+        ordem = np.argsort(chaves, kind='stable')
+        self.chaves = chaves[ordem]
+        self.posicoes = (ordem % max(len(self.phashes), 1)).astype(np.int32)
+
+    @classmethod
+    def construir_do_banco(cls, tamanho_lote=5000):
+        """Monta o índice a partir dos hashes gravados."""
+        codigos = {campo: codigo for codigo, campo in enumerate(CAMPOS)}
+        linhas = (HashPerceptual.objects
+                  .values_list('usuario_id', 'campo', 'phash', 'dhash')
+                  .iterator(chunk_size=tamanho_lote))
+        usuario_ids, campos, phashes, dhashes = [], [], [], []
+        for usuario_id, campo, phash, dhash in linhas:
+            usuario_ids.append(usuario_id)
+            campos.append(codigos[campo])
+            phashes.append(phash)
+            dhashes.append(dhash)
+        # Os valores vêm com sinal do banco: .view reinterpreta os mesmos 64 bits como sem sinal
+        return cls(usuario_ids, campos, np.array(phashes, dtype=np.int64).view(np.uint64),
+                   np.array(dhashes, dtype=np.int64).view(np.uint64))
+
+    def adicionar(self, usuario_id, campo, phash, dhash):
+        """Inclui (ou substitui) o hash de uma imagem de um usuário."""
+        codigo = CAMPOS.index(campo)
+        self.ativos[(self.usuario_ids == usuario_id) & (self.campos == codigo)] = False
+        self.pendentes = [p for p in self.pendentes if (p[0], p[1]) != (usuario_id, codigo)]
+        self.pendentes.append((usuario_id, codigo, phash, dhash))
+
+        if len(self.pendentes) >= LIMITE_PENDENTES:
+            manter = self.ativos
+            usuario_ids, campos, phashes, dhashes = zip(*self.pendentes)
+            self.usuario_ids = np.concatenate([self.usuario_ids[manter], np.array(usuario_ids, dtype=np.int64)])
+            self.campos = np.concatenate([self.campos[manter], np.array(campos, dtype=np.int8)])
+            self.phashes = np.concatenate([self.phashes[manter], np.array(phashes, dtype=np.uint64)])
+            self.dhashes = np.concatenate([self.dhashes[manter], np.array(dhashes, dtype=np.uint64)])
+            self.ativos = np.ones(len(self.usuario_ids), dtype=bool)
+            self.pendentes = []
+            self._indexar()
+
+    def _candidatos(self, phash, raio):
+        variacoes = _variacoes(raio // NUMERO_BLOCOS).astype(np.uint32)
+        vizinhos = np.concatenate([
+            (variacoes ^ ((phash >> (bloco * BITS_BLOCO)) & MASCARA_BLOCO)) | (bloco << BITS_BLOCO)
+            for bloco in range(NUMERO_BLOCOS)
+        ])
+        inicios = np.searchsorted(self.chaves, vizinhos, side='left')
+        tamanhos = np.searchsorted(self.chaves, vizinhos, side='right') - inicios
+        # Junta as faixas [inicio, inicio + tamanho) sem laço em Python
+        total = int(tamanhos.sum())
+        indices = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos) + np.arange(total)
+        return np.unique(self.posicoes[indices])
+
+    def consultar(self, phash, dhash, limiar_phash=10, limiar_dhash=8, excluir_usuario_id=None):
+        """
+        Retorna [(usuario_id, campo, distancia_phash, distancia_dhash), ...] das imagens com as duas
+        distâncias de Hamming dentro dos limiares, da mais próxima para a mais distante.
+        """
+        resultados = []
+        candidatos = self._candidatos(phash, limiar_phash)
+        if len(candidatos):
+            distancias_p = np.bitwise_count(self.phashes[candidatos] ^ np.uint64(phash))
+            distancias_d = np.bitwise_count(self.dhashes[candidatos] ^ np.uint64(dhash))
+            manter = self.ativos[candidatos] & (distancias_p <= limiar_phash) & (distancias_d <= limiar_dhash)
+            if excluir_usuario_id is not None:
+                manter &= self.usuario_ids[candidatos] != excluir_usuario_id
+            for posicao, distancia_p, distancia_d in zip(candidatos[manter], distancias_p[manter],
+                                                           distancias_d[manter]):
+                resultados.append((int(self.usuario_ids[posicao]), CAMPOS[self.campos[posicao]],
+                                   int(distancia_p), int(distancia_d)))
+
+        for usuario_id, codigo, outro_phash, outro_dhash in self.pendentes:
+            distancia_p, distancia_d = (phash ^ outro_phash).bit_count(), (dhash ^ outro_dhash).bit_count()
+            if usuario_id != excluir_usuario_id and distancia_p <= limiar_phash and distancia_d <= limiar_dhash:
+                resultados.append((usuario_id, CAMPOS[codigo], distancia_p, distancia_d))
+
+        resultados.sort(key=lambda r: (r[2] + r[3], r[0]))
+        return resultados
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def obter_indice_perceptual():
+    """
+    Retorna o índice do processo atual, reconstruindo-o a partir do banco quando ainda não existe
+    ou quando passou de settings.KYC_INDICE_PERCEPTUAL_TTL segundos (envios feitos por outros processos).
+    """
+    global _indice
+    ttl = getattr(settings, 'KYC_INDICE_PERCEPTUAL_TTL', 300)
+    with _lock_indice:
+        if _indice is None or time.monotonic() - _indice.construido_em > ttl:
+            _indice = IndicePerceptual.construir_do_banco()
+        return _indice
+
+
+def buscar_imagens_semelhantes(usuario_id, phash, dhash):
+    """Imagens de outros usuários praticamente iguais à informada: [(usuario_id, campo, dist_phash, dist_dhash)]."""
+    limiar_phash = getattr(settings, 'KYC_LIMIAR_PHASH', 10)
+    limiar_dhash = getattr(settings, 'KYC_LIMIAR_DHASH', 8)
+    indice = obter_indice_perceptual()
+    with _lock_indice:
+        return indice.consultar(phash, dhash, limiar_phash, limiar_dhash, excluir_usuario_id=usuario_id)
+
+
+def gravar_hashes_kyc(usuario_id, hashes):
+    """
+    Grava os hashes das imagens recém-enviadas ({campo: (phash, dhash)}). A busca de imagens
+    semelhantes fica para o worker do KYC (buscar_imagens_reaproveitadas), fora da requisição.
+    """
+    HashPerceptual.objects.bulk_create([
+        HashPerceptual(usuario_id=usuario_id, campo=campo, phash=para_bigint(phash), dhash=para_bigint(dhash))
+        for campo, (phash, dhash) in hashes.items()
+    ], update_conflicts=True, unique_fields=['usuario', 'campo'], update_fields=['phash', 'dhash', 'data_atualizacao'])
+
+
+def buscar_imagens_reaproveitadas(usuario_id):
+    """
+    Procura no índice do processo as imagens de outras contas semelhantes às do usuário (hashes gravados
+    no upload) e inclui as dele no índice. Retorna {outro_usuario_id: [dict por par de imagens]}.
+    """
+    hashes = [(campo, phash & (2 ** BITS_HASH - 1), dhash & (2 ** BITS_HASH - 1))
+              for campo, phash, dhash in (HashPerceptual.objects.filter(usuario_id=usuario_id)
+                                          .values_list('campo', 'phash', 'dhash'))]
+    semelhantes = {}
+    for campo, phash, dhash in hashes:
+        for outro_id, outro_campo, distancia_p, distancia_d in buscar_imagens_semelhantes(usuario_id, phash, dhash):
+            semelhantes.setdefault(outro_id, []).append({
+                'campo': campo, 'campo_existente': outro_campo,
+                'distancia_phash': distancia_p, 'distancia_dhash': distancia_d})
+
+    # O índice é atualizado aos poucos pelo próprio worker; o que outros processos gravaram entra no TTL
+    with _lock_indice:
+        if _indice is not None:
+            for campo, phash, dhash in hashes:
+                _indice.adicionar(usuario_id, campo, phash, dhash)
+    return semelhantes
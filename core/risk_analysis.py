@@ -1,11 +1,65 @@
 # core/risk_analysis.py
 from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
 
-def calcular_risco(usuario):
+# Regras do score. Pode ser sobrescrito por settings.RISCO_SCORECARD (mesmo formato).
+SCORECARD_PADRAO = {
+    'versao': '1',
+    # (idade mínima, idade máxima exclusiva ou None, pontos)
+    'idade': [
+        (18, 25, 10),    # Risco maior
+        (25, 45, 30),    # Risco menor (estabilidade)
+        (45, None, 25),  # Risco moderado
+    ],
+    # (renda máxima inclusiva ou None, pontos)
+    'renda': [
+        (2000, 5),    # Risco muito alto
+        (5000, 20),   # Risco médio
+        (None, 40),   # Risco baixo
+    ],
+    # Usuário antigo é mais confiável
+    'dias_cadastro_bonus': 365,
+    'pontos_cadastro_bonus': 15,
+    # (score máximo inclusivo ou None, nível de risco)
+    'faixas_risco': [
+        (30, 'ALTO'),
+        (60, 'MEDIO'),
+        (None, 'BAIXO'),
+    ],
+}
+
+
+# Campos de CustomUser gravados quando o risco é (re)calculado
+CAMPOS_RISCO_MATERIALIZADO = ['risco', 'score_risco', 'risco_versao_scorecard', 'risco_assinatura',
+                              'risco_calculado_em', 'risco_valido_ate']
+
+
+def obter_scorecard():
+    return getattr(settings, 'RISCO_SCORECARD', SCORECARD_PADRAO)
+
+
+def assinatura_entradas_risco(data_nascimento, renda_mensal):
+    """Resume as entradas do score que o usuário pode alterar; se a assinatura mudar, o score é recalculado."""
+    return f'{data_nascimento or ""}|{Decimal(renda_mensal or 0):.2f}'
+
+
+def _decompor_datas(datas):
+    """Separa um array datetime64[D] em arrays (ano, mês, dia)."""
+    ano = datas.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes = datas.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    dia = (datas - datas.astype('datetime64[M]')).astype(np.int64) + 1
+    return ano, mes, dia
+
+
+def calcular_risco(usuario, scorecard=None):
     """
     Calcula o score de risco de um usuário com base em suas informações.
     Retorna uma tupla: (NÍVEL_DE_RISCO, score)
     """
+    scorecard = scorecard or obter_scorecard()
     score = 0
     hoje = date.today()
 
@@ -13,36 +67,197 @@ def calcular_risco(usuario):
     if usuario.data_nascimento:
         idade = hoje.year - usuario.data_nascimento.year - \
                 ((hoje.month, hoje.day) < (usuario.data_nascimento.month, usuario.data_nascimento.day))
-        
-        if 18 <= idade < 25:
-            score += 10 # Risco maior
-        elif 25 <= idade < 45:
-            score += 30 # Risco menor (estabilidade)
-        elif idade >= 45:
-            score += 25 # Risco moderado
+
+        for idade_minima, idade_maxima, pontos in scorecard['idade']:
+            if idade >= idade_minima and (idade_maxima is None or idade < idade_maxima):
+                score += pontos
+                break
 
     # 2. Análise baseada na Renda Mensal
     renda = float(usuario.renda_mensal)
-    if renda <= 2000:
-        score += 5  # Risco muito alto
-    elif 2000 < renda <= 5000:
-        score += 20 # Risco médio
-    elif renda > 5000:
-        score += 40 # Risco baixo
+    for renda_maxima, pontos in scorecard['renda']:
+        if renda_maxima is None or renda <= renda_maxima:
+            score += pontos
+            break
 
     # 3. (Simulação) Análise baseada em histórico de crédito
     # Em um sistema real, aqui você consultaria um bureau de crédito (Serasa, etc.).
     # Vamos simular com base no tempo de cadastro no nosso sistema.
     dias_de_cadastro = (hoje - usuario.date_joined.date()).days
-    if dias_de_cadastro > 365:
-        score += 15 # Usuário antigo é mais confiável
+    if dias_de_cadastro > scorecard['dias_cadastro_bonus']:
+        score += scorecard['pontos_cadastro_bonus']
 
     # --- Definição do Nível de Risco com base no Score Final ---
-    if score <= 30:
-        risco = 'ALTO'
-    elif 30 < score <= 60:
-        risco = 'MEDIO'
-    else: # score > 60
-        risco = 'BAIXO'
-        
-    return (risco, score)
\ No newline at end of file
+    for score_maximo, nivel in scorecard['faixas_risco']:
+        if score_maximo is None or score <= score_maximo:
+            risco = nivel
+            break
+
+    return (risco, score)
+
+
+def calcular_scores_vetorizado(nascimentos, rendas, datas_cadastro, scorecard=None, hoje=None):
+    """
+    Versão vetorizada de calcular_risco para vários usuários de uma vez.
+    nascimentos e datas_cadastro: arrays datetime64[D] (NaT quando não informado); rendas: array float.
+    Retorna (riscos, scores) como arrays do NumPy.
+    """
+    scorecard = scorecard or obter_scorecard()
+    hoje = np.datetime64(hoje or date.today(), 'D')
+    hoje_ano, hoje_mes, hoje_dia = _decompor_datas(hoje)
+
+    scores = np.zeros(len(rendas), dtype=np.int64)
+
+    # 1. Idade (mesma regra do aniversário de calcular_risco)
+    tem_nascimento = ~np.isnat(nascimentos)
+    ano, mes, dia = _decompor_datas(np.where(tem_nascimento, nascimentos, hoje))
+    antes_do_aniversario = (hoje_mes < mes) | ((hoje_mes == mes) & (hoje_dia < dia))
+    idades = hoje_ano - ano - antes_do_aniversario
+
+    condicoes, pontos = [], []
+    for idade_minima, idade_maxima, pontos_faixa in scorecard['idade']:
+        condicao = tem_nascimento & (idades >= idade_minima)
+        if idade_maxima is not None:
+            condicao &= idades < idade_maxima
+        condicoes.append(condicao)
+        pontos.append(pontos_faixa)
+    scores += np.select(condicoes, pontos, default=0)
+
+    # 2. Renda
+    condicoes = [np.ones(len(rendas), dtype=bool) if renda_maxima is None else rendas <= renda_maxima
+                 for renda_maxima, _ in scorecard['renda']]
+    scores += np.select(condicoes, [pontos_faixa for _, pontos_faixa in scorecard['renda']], default=0)
+
+    # 3. Tempo de cadastro
+    dias_de_cadastro = (hoje - datas_cadastro).astype(int)
+    scores += np.where(dias_de_cadastro > scorecard['dias_cadastro_bonus'], scorecard['pontos_cadastro_bonus'], 0)
+
+    # Nível de risco
+    condicoes = [np.ones(len(scores), dtype=bool) if score_maximo is None else scores <= score_maximo
+                 for score_maximo, _ in scorecard['faixas_risco']]
+    riscos = np.select(condicoes, [nivel for _, nivel in scorecard['faixas_risco']], default='NAO_CALCULADO')
+
+    return riscos, scores
+
+
+def calcular_validade_vetorizada(nascimentos, datas_cadastro, scorecard=None, hoje=None):
+    """
+    Para cada usuário, a primeira data futura em que o score pode mudar só pela passagem do
+    tempo: o aniversário em que a idade cruza um limite de faixa ou o dia em que o bônus de
+    tempo de cadastro passa a valer. NaT quando nenhuma das duas coisas vai acontecer.
+    """
+    scorecard = scorecard or obter_scorecard()
+    hoje = np.datetime64(hoje or date.today(), 'D')
+    sem_limite = np.datetime64('9999-12-31', 'D')
+    validade = np.full(len(datas_cadastro), sem_limite, dtype='datetime64[D]')
+
+    tem_nascimento = ~np.isnat(nascimentos)
+    ano, mes, dia = _decompor_datas(np.where(tem_nascimento, nascimentos, hoje))
+    limites = sorted({idade for faixa in scorecard['idade'] for idade in faixa[:2] if idade is not None})
+    for limite in limites:
+        # Somar (dia - 1) ao mês faz 29/02 cair em 01/03 nos anos não bissextos, como na regra do aniversário
+        meses = (ano + limite - 1970) * 12 + (mes - 1)
+        aniversario = meses.astype('datetime64[M]').astype('datetime64[D]') + (dia - 1)
+        validade = np.where(tem_nascimento & (aniversario > hoje) & (aniversario < validade), aniversario, validade)
+
+    # O bônus vale quando dias_de_cadastro > N, ou seja, a partir de cadastro + N + 1
+    inicio_bonus = datas_cadastro + np.timedelta64(scorecard['dias_cadastro_bonus'] + 1, 'D')
+    validade = np.where((inicio_bonus > hoje) & (inicio_bonus < validade), inicio_bonus, validade)
+
+    return np.where(validade == sem_limite, np.datetime64('NaT'), validade)
+
+
+def _validade_como_date(validade):
+    return None if np.isnat(validade) else validade.astype(object)
+
+
+def risco_materializado_valido(usuario, scorecard=None, hoje=None):
+    scorecard = scorecard or obter_scorecard()
+    hoje = hoje or date.today()
+    return (usuario.score_risco is not None
+            and usuario.risco_versao_scorecard == str(scorecard['versao'])
+            and usuario.risco_assinatura == assinatura_entradas_risco(usuario.data_nascimento, usuario.renda_mensal)
+            and (usuario.risco_valido_ate is None or hoje < usuario.risco_valido_ate))
+
+
+def obter_risco(usuario, scorecard=None):
+    """
+    Retorna (NÍVEL_DE_RISCO, score) materializado no usuário. Só recalcula (e grava, apenas os
+    campos de risco) quando a renda, a data de nascimento ou a versão do scorecard mudaram,
+    ou quando o valor salvo expirou.
+    """
+    scorecard = scorecard or obter_scorecard()
+    hoje = date.today()
+    if risco_materializado_valido(usuario, scorecard, hoje):
+        return usuario.risco, usuario.score_risco
+
+    risco, score = calcular_risco(usuario, scorecard)
+    validade = calcular_validade_vetorizada(
+        np.array([usuario.data_nascimento], dtype='datetime64[D]'),
+        np.array([usuario.date_joined.date()], dtype='datetime64[D]'),
+        scorecard,
+        hoje,
+    )[0]
+
+    usuario.risco = risco
+    usuario.score_risco = score
+    usuario.risco_versao_scorecard = str(scorecard['versao'])
+    usuario.risco_assinatura = assinatura_entradas_risco(usuario.data_nascimento, usuario.renda_mensal)
+    usuario.risco_calculado_em = timezone.now()
+    usuario.risco_valido_ate = _validade_como_date(validade)
+    usuario.save(update_fields=CAMPOS_RISCO_MATERIALIZADO)
+    return risco, score
+
+
+def calcular_riscos_em_lote(queryset=None, scorecard=None, tamanho_lote=5000):
+    """
+    Recalcula o risco de todos os usuários do queryset em lotes: lê só as colunas necessárias,
+    calcula os scores com NumPy e grava com bulk_update apenas os usuários cujo resultado
+    materializado mudou.
+    Retorna um dicionário com o total processado, o total atualizado e a distribuição por nível.
+    """
+    from .models import CustomUser
+
+    queryset = queryset if queryset is not None else CustomUser.objects.all()
+    scorecard = scorecard or obter_scorecard()
+    versao = str(scorecard['versao'])
+    hoje = date.today()
+    agora = timezone.now()
+
+    total, atualizados, distribuicao = 0, 0, {}
+    ultimo_id = 0
+    while True:
+        # Paginação por chave (id) em vez de OFFSET: cada lote custa o mesmo
+        lote = list(queryset.filter(pk__gt=ultimo_id).order_by('pk').values_list(
+            'pk', 'data_nascimento', 'renda_mensal', 'date_joined',
+            'risco', 'score_risco', 'risco_versao_scorecard', 'risco_assinatura', 'risco_valido_ate')[:tamanho_lote])
+        if not lote:
+            break
+
+        ids, nascimentos, rendas, cadastros = zip(*[linha[:4] for linha in lote])
+        nascimentos = np.array(nascimentos, dtype='datetime64[D]')
+        cadastros = np.array([d.date() for d in cadastros], dtype='datetime64[D]')
+        riscos, scores = calcular_scores_vetorizado(
+            nascimentos, np.array(rendas, dtype=np.float64), cadastros, scorecard, hoje)
+        validades = calcular_validade_vetorizada(nascimentos, cadastros, scorecard, hoje)
+
+        alterados = []
+        for linha, risco, score, validade in zip(lote, riscos, scores, validades):
+            pk, nascimento, renda = linha[:3]
+            novo = (str(risco), int(score), versao, assinatura_entradas_risco(nascimento, renda),
+                    _validade_como_date(validade))
+            if novo != tuple(linha[4:]):
+                alterados.append(CustomUser(
+                    pk=pk, risco=novo[0], score_risco=novo[1], risco_versao_scorecard=novo[2],
+                    risco_assinatura=novo[3], risco_valido_ate=novo[4], risco_calculado_em=agora))
+        CustomUser.objects.bulk_update(alterados, CAMPOS_RISCO_MATERIALIZADO, batch_size=1000)
+
+        niveis, contagens = np.unique(riscos, return_counts=True)
+        for nivel, contagem in zip(niveis, contagens):
+            distribuicao[str(nivel)] = distribuicao.get(str(nivel), 0) + int(contagem)
+
+        total += len(ids)
+        atualizados += len(alterados)
+        ultimo_id = ids[-1]
+
+    return {'total': total, 'atualizados': atualizados, 'distribuicao': distribuicao}
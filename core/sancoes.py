@@ -0,0 +1,168 @@
+# core/sancoes.py
+import csv
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from .models import FonteRestritiva, SancaoRestritiva
+from .validators import cpfs_para_inteiros, normalizar_documento, validar_cpfs_em_lote
+
+URL_CEIS = 'https://www.portaltransparencia.gov.br/pessoa-fisica/busca/lista?output=csv'
+URLS_FONTES = {'CEIS': URL_CEIS}
+COLUNA_CPF_CNPJ = 'CPF OU CNPJ DO SANCIONADO'
+COLUNA_NOME = 'NOME DO SANCIONADO'
+
+TAMANHO_LOTE_PADRAO = 5000
+TAMANHO_BLOCO_DOWNLOAD = 1024 * 1024
+
+
+def _checksum_arquivo(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_DOWNLOAD), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+@contextmanager
+def _arquivo_da_origem(origem, estado, forcar=False):
+    """
+    Disponibiliza a lista como arquivo local: um caminho é usado direto; uma URL é baixada em blocos
+    para um arquivo temporário (removido na saída), com If-None-Match/If-Modified-Since a partir dos
+    validadores da carga anterior. Entrega um dict com caminho, etag, ultima_modificacao e checksum,
+    ou None quando o servidor responde 304 (nada é baixado).
+    """
+    if not re.match(r'^https?://', origem):
+        yield {'caminho': origem, 'etag': '', 'ultima_modificacao': '', 'checksum': _checksum_arquivo(origem)}
+        return
+
+    import requests
+
+    cabecalhos = {}
+    if not forcar and estado.origem == origem:
+        if estado.etag:
+            cabecalhos['If-None-Match'] = estado.etag
+        if estado.ultima_modificacao:
+            cabecalhos['If-Modified-Since'] = estado.ultima_modificacao
+
+    with requests.get(origem, headers=cabecalhos, stream=True, timeout=60) as response:
+        if response.status_code == 304:
+            arquivo = None
+        else:
+            response.raise_for_status()
+            sha = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(prefix='sancoes_', suffix='.csv', delete=False) as temporario:
+                for bloco in response.iter_content(TAMANHO_BLOCO_DOWNLOAD):
+                    sha.update(bloco)
+                    temporario.write(bloco)
+            arquivo = {'caminho': temporario.name, 'etag': response.headers.get('ETag', ''),
+                       'ultima_modificacao': response.headers.get('Last-Modified', ''), 'checksum': sha.hexdigest()}
+    try:
+        yield arquivo
+    finally:
+        if arquivo:
+            os.remove(arquivo['caminho'])
+
+
+def ler_registros_csv(caminho):
+    """
+    Lê o CSV de sanções (separado por ';') registro a registro, com o documento já normalizado.
+    Gera (documento, nome); a memória usada não depende do tamanho do arquivo.
+    """
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        leitor = csv.DictReader(arquivo, delimiter=';')
+        if COLUNA_CPF_CNPJ not in (leitor.fieldnames or []):
+            raise ValueError(f"A coluna '{COLUNA_CPF_CNPJ}' não foi encontrada no CSV.")
+        for linha in leitor:
+            documento = normalizar_documento(linha[COLUNA_CPF_CNPJ])
+            if documento:
+                yield documento, str(linha.get(COLUNA_NOME) or '')[:255]
+
+
+def _gravar_lote(lote, fonte, versao):
+    # O mesmo documento duas vezes no lote derrubaria o upsert: fica a primeira ocorrência
+    registros = {}
+    for documento, nome in lote:
+        registros.setdefault(documento, nome)
+
+    # CPFs válidos ganham a chave inteira, validados todos de uma vez
+    documentos = list(registros)
+    SancaoRestritiva.objects.bulk_create([
+        SancaoRestritiva(documento=documento, nome=registros[documento], fonte=fonte, primeira_carga=versao,
+                         ultima_carga=versao, cpf_numero=numero if valido else None)
+        for documento, valido, numero in zip(documentos, validar_cpfs_em_lote(documentos),
+                                             cpfs_para_inteiros(documentos).tolist())
+    ], update_conflicts=True, unique_fields=['fonte', 'documento'],
+        update_fields=['nome', 'cpf_numero', 'ultima_carga'])  # primeira_carga só é gravada na inserção
+
+
+@transaction.atomic
+def carregar_sancoes(registros, fonte='CEIS', tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Substitui os registros de uma fonte pela lista recebida, um fluxo de (documento, nome).
+    Grava em lotes com upsert marcando a nova versão da carga e, no fim, remove o que não veio
+    nesta versão; tudo numa transação, então o KYC nunca vê a lista pela metade. Documentos que
+    entraram nesta versão ficam com primeira_carga = versão (o delta usado por triar_novas_sancoes).
+    Retorna o número de documentos carregados.
+    """
+    estado, _ = FonteRestritiva.objects.select_for_update().get_or_create(fonte=fonte)
+    versao = estado.versao + 1
+
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamanho_lote))
+        if not lote:
+            break
+        _gravar_lote(lote, fonte, versao)
+
+    estado.removidos_ultima_carga, _ = SancaoRestritiva.objects.filter(fonte=fonte, ultima_carga__lt=versao).delete()
+    estado.novos_ultima_carga = SancaoRestritiva.objects.filter(fonte=fonte, primeira_carga=versao).count()
+    estado.versao = versao
+    estado.total_registros = SancaoRestritiva.objects.filter(fonte=fonte).count()
+    estado.data_atualizacao = timezone.now()
+    estado.save(update_fields=['versao', 'total_registros', 'novos_ultima_carga', 'removidos_ultima_carga',
+                               'data_atualizacao'])
+    return estado.total_registros
+
+
+def atualizar_lista_restritiva(fonte='CEIS', origem=None, forcar=False, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Atualiza a base local de uma fonte a partir de um CSV local ou de uma URL, só quando a lista mudou:
+    o servidor confirma com 304 (ETag/Last-Modified) ou o SHA-256 do conteúdo é igual ao da última carga.
+    Retorna (carregada, estado da fonte após a atualização).
+    """
+    origem = origem or URLS_FONTES.get(fonte)
+    if not origem:
+        raise ValueError(f'Nenhuma origem conhecida para a fonte {fonte}; informe um arquivo ou URL.')
+
+    estado, _ = FonteRestritiva.objects.get_or_create(fonte=fonte)
+    with _arquivo_da_origem(origem, estado, forcar) as arquivo:
+        agora = timezone.now()
+        if arquivo is None or (not forcar and arquivo['checksum'] == estado.checksum):
+            campos = {'data_verificacao': agora}
+            if arquivo and (arquivo['etag'] or arquivo['ultima_modificacao']):
+                campos.update(origem=origem, etag=arquivo['etag'], ultima_modificacao=arquivo['ultima_modificacao'])
+            FonteRestritiva.objects.filter(pk=estado.pk).update(**campos)
+            return False, estado
+
+        with transaction.atomic():
+            carregar_sancoes(ler_registros_csv(arquivo['caminho']), fonte, tamanho_lote)
+            FonteRestritiva.objects.filter(pk=estado.pk).update(
+                origem=origem, etag=arquivo['etag'], ultima_modificacao=arquivo['ultima_modificacao'],
+                checksum=arquivo['checksum'], data_verificacao=agora)
+    estado.refresh_from_db()
+    return True, estado
+
+
+def documento_tem_restricao(documento):
+    """Consulta indexada na base local de sanções. Não acessa a rede."""
+    documento = normalizar_documento(documento)
+    if not documento:
+        return False
+    if len(documento) == 11:
+        return SancaoRestritiva.objects.filter(cpf_numero=int(documento)).exists()
+    return SancaoRestritiva.objects.filter(documento=documento).exists()
@@ -0,0 +1,45 @@
+# core/senhas.py
+# Sem imports de modelos: este módulo é carregado pelos processos do pool de hashing.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _inicializar_processo():
+    # Com o método "spawn" (Windows/macOS) o processo filho começa sem o Django configurado
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'p2p_emprestimo.settings')
+    import django
+    django.setup()
+
+
+def _gerar_hash(senha):
+    from django.contrib.auth.hashers import make_password
+    return make_password(senha)
+
+
+class PoolHashSenhas:
+    """
+    Gera hashes de senha (PBKDF2, lento de propósito) em um pool de processos, contornando o GIL.
+    Usar como context manager para reaproveitar os processos entre lotes.
+    """
+
+    def __init__(self, processos=None):
+        self.processos = processos or os.cpu_count() or 1
+        self._executor = None
+
+    def __enter__(self):
+        if self.processos > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.processos, initializer=_inicializar_processo)
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def gerar_hashes(self, senhas):
+        """Lista de hashes na mesma ordem das senhas. Senha vazia/None gera senha inutilizável."""
+        if self._executor is None:
+            return [_gerar_hash(senha) for senha in senhas]
+        # Blocos de algumas senhas por tarefa para diluir o custo de comunicação entre processos
+        tamanho_bloco = max(1, len(senhas) // (self.processos * 4))
+        return list(self._executor.map(_gerar_hash, senhas, chunksize=tamanho_bloco))
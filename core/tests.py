@@ -1,3 +1,755 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from .amortizacao import calcular_cronogramas, gerar_parcelas
+from .auto_investimento import calcular_alocacoes, executar_auto_investimento
+from .carteira import CAMPOS_VALOR, reconstruir_resumos
+from .financiamento import ErroFinanciamento, financiar, transacao_de_escrita
+from .kyc_queue import enfileirar_kyc, executar_job, recuperar_jobs_travados, reservar_proximo_job
+from .marketplace import invalidar_cache_marketplace
+from .media_ingest import ImagemInvalida, calcular_hashes_perceptuais, normalizar_imagem
+from .models import (AlertaSancao, CustomUser, Emprestimo, Investimento, KycJob, OrdemAutoInvestimento, Pagamento, Parcela,
+                     ResumoCarteira, SancaoRestritiva)
+from .pagamentos import importar_pagamentos, ler_arquivo_pagamentos
+from .risk_analysis import calcular_risco, calcular_scores_vetorizado
+from .sancoes import atualizar_lista_restritiva, carregar_sancoes, documento_tem_restricao
+from .triagem_sancoes import triar_novas_sancoes
+from .validators import completar_cpf, cpf_para_inteiro, cpfs_para_inteiros, validar_cpf, validar_cpfs_em_lote
 
-# Create your tests here.
+
+def criar_usuario(username, base_cpf, **campos):
+    campos.setdefault('kyc_status', 'APROVADO')
+    return CustomUser.objects.create(username=username, cpf=completar_cpf(base_cpf), password='!', **campos)
+
+
+class CronogramaTests(TestCase):
+    """Parcelas (geradas ou projetadas) sempre somam o valor_total_pagamento gravado no empréstimo."""
+
+    def setUp(self):
+        self.tomador = criar_usuario('tomador', 123456789, data_nascimento=date(1990, 1, 1),
+                                     renda_mensal=Decimal('5000'))
+
+    def _pedir(self, valor, meses, sistema):
+        resposta = self.client.post('/api/pedir-emprestimo/', json.dumps({
+            'user_id': self.tomador.pk, 'valor_solicitado': valor, 'meses_parcelamento': meses,
+            'sistema_amortizacao': sistema}), content_type='application/json')
+        self.assertEqual(resposta.status_code, 201, resposta.content)
+        return Emprestimo.objects.get(pk=resposta.json()['id_emprestimo'])
+
+    def test_total_do_pedido_e_a_taxa_sobre_o_valor(self):
+        emprestimo = self._pedir('1000', 12, 'PRICE')
+        esperado = (emprestimo.valor_solicitado * (1 + emprestimo.taxa_juros / 100)).quantize(Decimal('0.01'))
+        self.assertEqual(emprestimo.valor_total_pagamento, esperado)
+
+    def test_projecao_e_parcelas_geradas_somam_o_total_gravado(self):
+        for valor, meses, sistema in (('1000', 12, 'PRICE'), ('1000', 12, 'SAC'), ('333.33', 7, 'PRICE'),
+                                      ('2500.01', 24, 'SAC'), ('10', 1, 'PRICE')):
+            with self.subTest(valor=valor, meses=meses, sistema=sistema):
+                emprestimo = self._pedir(valor, meses, sistema)
+
+                projecao = self.client.get(f'/api/emprestimos/{emprestimo.pk}/cronograma/').json()['parcelas']
+                self.assertEqual(len(projecao), meses)
+                self.assertEqual(sum(Decimal(p['valor']) for p in projecao), emprestimo.valor_total_pagamento)
+
+                gerar_parcelas([emprestimo.pk])
+                parcelas = Parcela.objects.filter(emprestimo=emprestimo)
+                self.assertEqual(sum(p.valor for p in parcelas), emprestimo.valor_total_pagamento)
+                self.assertEqual(sum(p.valor_amortizacao for p in parcelas), emprestimo.valor_solicitado)
+                self.assertEqual(parcelas.order_by('numero').last().saldo_devedor, Decimal('0.00'))
+
+    def test_total_gravado_prevalece_sobre_a_taxa(self):
+        # Empréstimos antigos: o cronograma fecha com o total armazenado, qualquer que seja a taxa
+        cronograma = calcular_cronogramas([Decimal('1000')], [Decimal('15')], [12], ['PRICE'],
+                                          totais=[Decimal('1234.56')])
+        self.assertEqual(int(cronograma['parcela'][0].sum()), 123456)
+        self.assertEqual(int(cronograma['amortizacao'][0].sum()), 100000)
+
+    def test_lote_aleatorio_fecha_em_centavos(self):
+        aleatorio = random.Random(16)
+        quantidade = 2000
+        valores = [Decimal(aleatorio.randint(1, 5_000_000)) / 100 for _ in range(quantidade)]
+        taxas = [Decimal(aleatorio.choice((0, 5, 10, 15, 99))) for _ in range(quantidade)]
+        prazos = [aleatorio.randint(1, 360) for _ in range(quantidade)]
+        sistemas = [aleatorio.choice(('PRICE', 'SAC')) for _ in range(quantidade)]
+        cronograma = calcular_cronogramas(valores, taxas, prazos, sistemas)
+
+        for linha, (valor, taxa, prazo) in enumerate(zip(valores, taxas, prazos)):
+            principal = int(valor * 100)
+            juros = int((valor * taxa).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+            self.assertEqual(int(cronograma['amortizacao'][linha].sum()), principal)
+            self.assertEqual(int(cronograma['parcela'][linha].sum()), principal + juros)
+            self.assertEqual(int(cronograma['saldo'][linha][prazo - 1]), 0)
+        self.assertGreaterEqual(int(cronograma['amortizacao'].min()), 0)
+        self.assertGreaterEqual(int(cronograma['juros'].min()), 0)
+
+
+class ImportacaoPagamentosTests(TestCase):
+    """Reimportar um arquivo de pagamentos (mesmo renomeado ou reordenado) não lança nada de novo."""
+
+    def setUp(self):
+        tomador = criar_usuario('tomador', 123456789)
+        self.emprestimo = Emprestimo.objects.create(
+            tomador=tomador, valor_solicitado=Decimal('300'), taxa_juros=Decimal('0'), meses_parcelamento=3,
+            valor_total_pagamento=Decimal('300'), valor_parcela=Decimal('100'), valor_captado=Decimal('300'),
+            status='FINANCIADO')
+        gerar_parcelas([self.emprestimo.pk])
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+    def _arquivo(self, nome, linhas):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('emprestimo_id,numero_parcela,valor,data_pagamento\n')
+            for numero_parcela, valor, data_pagamento in linhas:
+                arquivo.write(f'{self.emprestimo.pk},{numero_parcela},{valor},{data_pagamento}\n')
+        return caminho
+
+    def _importar(self, caminho):
+        totais, erros = importar_pagamentos(ler_arquivo_pagamentos(caminho), arquivo_origem=os.path.basename(caminho))
+        self.assertEqual(erros, [])
+        return totais
+
+    def _valores_pagos(self):
+        return list(Parcela.objects.filter(emprestimo=self.emprestimo).order_by('numero')
+                    .values_list('valor_pago', flat=True))
+
+    def test_pagamentos_iguais_no_mesmo_dia_sao_distintos(self):
+        linhas = [(1, '50', '2026-10-01'), (1, '50', '2026-10-01'), (2, '30', '2026-10-02')]
+        totais = self._importar(self._arquivo('pagamentos.csv', linhas))
+        self.assertEqual(totais['lancados'], 3)
+        self.assertEqual(self._valores_pagos(), [Decimal('100.00'), Decimal('30.00'), Decimal('0.00')])
+
+    def test_reimportacao_do_arquivo_renomeado_nao_duplica(self):
+        linhas = [(1, '50', '2026-10-01'), (1, '50', '2026-10-01'), (2, '30', '2026-10-02')]
+        self._importar(self._arquivo('pagamentos.csv', linhas))
+
+        for nome, reimportadas in (('pagamentos.csv', linhas), ('pagamentos_renomeado.csv', linhas),
+                                   ('reordenado.csv', linhas[::-1])):
+            with self.subTest(arquivo=nome):
+                totais = self._importar(self._arquivo(nome, reimportadas))
+                self.assertEqual(totais['lancados'], 0)
+                self.assertEqual(totais['duplicados'], 3)
+        self.assertEqual(Pagamento.objects.count(), 3)
+        self.assertEqual(self._valores_pagos(), [Decimal('100.00'), Decimal('30.00'), Decimal('0.00')])
+
+    def test_arquivo_com_pagamento_novo_lanca_so_o_novo(self):
+        linhas = [(1, '50', '2026-10-01'), (2, '30', '2026-10-02')]
+        self._importar(self._arquivo('outubro.csv', linhas))
+        totais = self._importar(self._arquivo('outubro_v2.csv', linhas + [(1, '50', '2026-10-01')]))
+        self.assertEqual((totais['lancados'], totais['duplicados']), (1, 2))
+        self.assertEqual(self._valores_pagos()[0], Decimal('100.00'))
+        self.assertEqual(Parcela.objects.get(emprestimo=self.emprestimo, numero=1).status, 'PAGA')
+
+
+class FinanciamentoConcorrenteTests(TransactionTestCase):
+    """Investidores em paralelo nunca captam, juntos, mais que o valor solicitado."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.tomador = criar_usuario('tomador', 123456789)
+        self.investidores = [criar_usuario(f'investidor{i}', 200000000 + i) for i in range(24)]
+
+    def _emprestimo(self, valor):
+        return Emprestimo.objects.create(
+            tomador=self.tomador, valor_solicitado=Decimal(valor), taxa_juros=Decimal('10'), meses_parcelamento=6,
+            valor_total_pagamento=Decimal(valor) * Decimal('1.1'), valor_parcela=Decimal('1'))
+
+    def _disputar(self, emprestimo, valores):
+        inicio = threading.Barrier(self.THREADS)
+
+        def investir(investidor, valor):
+            try:
+                inicio.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                with transacao_de_escrita():
+                    financiar(emprestimo.pk, investidor.pk, valor)
+                return 'ok'
+            except ErroFinanciamento:
+                return 'recusado'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            return list(executor.map(investir, self.investidores[:len(valores)], valores))
+
+    def _verificar(self, emprestimo, resultados):
+        emprestimo.refresh_from_db()
+        investido = Investimento.objects.filter(emprestimo=emprestimo).aggregate(total=Sum('valor'))['total']
+        self.assertEqual(resultados.count('ok'), Investimento.objects.filter(emprestimo=emprestimo).count())
+        self.assertEqual(investido, emprestimo.valor_captado)
+        self.assertLessEqual(emprestimo.valor_captado, emprestimo.valor_solicitado)
+        return emprestimo
+
+    def test_financiamento_integral_em_paralelo_tem_um_unico_vencedor(self):
+        emprestimo = self._emprestimo('1000')
+        resultados = self._disputar(emprestimo, [None] * 16)
+        emprestimo = self._verificar(emprestimo, resultados)
+        self.assertEqual(resultados.count('ok'), 1)
+        self.assertEqual(emprestimo.valor_captado, Decimal('1000.00'))
+        self.assertEqual(emprestimo.status, 'FINANCIADO')
+
+    def test_fracoes_em_paralelo_nao_passam_do_valor_solicitado(self):
+        emprestimo = self._emprestimo('1000')
+        # 24 x 70 = 1680 oferecidos para 1000: no máximo 14 frações cabem
+        resultados = self._disputar(emprestimo, [Decimal('70')] * 24)
+        emprestimo = self._verificar(emprestimo, resultados)
+        self.assertEqual(resultados.count('ok'), 14)
+        self.assertEqual(emprestimo.valor_captado, Decimal('980.00'))
+        self.assertEqual(emprestimo.status, 'AGUARDANDO')
+
+
+class AutoInvestimentoTests(TestCase):
+    """Motor de auto-investimento: ordem de atendimento, saldo e limite por empréstimo entre execuções."""
+
+    @staticmethod
+    def _emprestimo(id, valor, risco='BAIXO', taxa=Decimal('10'), tomador_id=1):
+        return {'id': id, 'tomador_id': tomador_id, 'risco': risco, 'taxa_juros': taxa,
+                'valor_solicitado': Decimal(valor), 'valor_captado': Decimal('0')}
+
+    @staticmethod
+    def _ordem(id, maximo, saldo, data_criacao, investidor_id=None, riscos=('BAIXO',), taxa_minima=Decimal('0')):
+        return {'id': id, 'investidor_id': investidor_id or 100 + id, 'riscos': list(riscos),
+                'taxa_minima': taxa_minima, 'valor_maximo': Decimal(maximo), 'saldo': Decimal(saldo),
+                'data_criacao': data_criacao}
+
+    def test_ordem_mais_antiga_primeiro_e_rodizio_entre_ordens(self):
+        ordens = {1: self._ordem(1, '100', '1000', 2), 2: self._ordem(2, '100', '1000', 1)}
+        alocacoes = calcular_alocacoes([self._emprestimo(10, '150'), self._emprestimo(11, '150')], ordens)
+        # A ordem 2 é a mais antiga; quem acabou de receber vai para o fim da fila
+        self.assertEqual(alocacoes, [(10, 2, Decimal('100')), (10, 1, Decimal('50')),
+                                     (11, 2, Decimal('100')), (11, 1, Decimal('50'))])
+
+    def test_saldo_limita_a_alocacao(self):
+        ordens = {1: self._ordem(1, '100', '150', 1)}
+        alocacoes = calcular_alocacoes([self._emprestimo(10, '500'), self._emprestimo(11, '500'),
+                                        self._emprestimo(12, '500')], ordens)
+        self.assertEqual(alocacoes, [(10, 1, Decimal('100')), (11, 1, Decimal('50'))])
+        self.assertEqual(ordens[1]['saldo'], Decimal('0'))
+
+    def test_risco_taxa_e_proprio_emprestimo_sao_respeitados(self):
+        ordens = {1: self._ordem(1, '100', '1000', 1, investidor_id=7, taxa_minima=Decimal('12'))}
+        emprestimos = [
+            self._emprestimo(10, '100', taxa=Decimal('10')),               # taxa abaixo da mínima
+            self._emprestimo(11, '100', risco='ALTO', taxa=Decimal('15')),  # risco não aceito
+            self._emprestimo(12, '100', taxa=Decimal('15'), tomador_id=7),  # empréstimo do próprio investidor
+            self._emprestimo(13, '100', taxa=Decimal('15')),
+        ]
+        self.assertEqual(calcular_alocacoes(emprestimos, ordens), [(13, 1, Decimal('100'))])
+
+    def test_limite_por_emprestimo_desconta_o_ja_investido(self):
+        ordens = {1: self._ordem(1, '100', '1000', 1)}
+        alocacoes = calcular_alocacoes([self._emprestimo(10, '500'), self._emprestimo(11, '500')], ordens,
+                                       {(1, 10): Decimal('100'), (1, 11): Decimal('30')})
+        self.assertEqual(alocacoes, [(11, 1, Decimal('70'))])
+
+    def test_limite_por_emprestimo_vale_entre_execucoes(self):
+        tomador = criar_usuario('tomador', 123456789, risco='BAIXO')
+        investidor = criar_usuario('investidor', 987654321)
+        ordem = OrdemAutoInvestimento.objects.create(investidor=investidor, valor_maximo_por_emprestimo=Decimal('100'),
+                                                     saldo_disponivel=Decimal('1000'), riscos_aceitos='BAIXO')
+        emprestimo = Emprestimo.objects.create(
+            tomador=tomador, valor_solicitado=Decimal('1000'), taxa_juros=Decimal('10'), meses_parcelamento=6,
+            valor_total_pagamento=Decimal('1100'), valor_parcela=Decimal('183.33'))
+
+        primeira = executar_auto_investimento()
+        segunda = executar_auto_investimento()
+
+        self.assertEqual((primeira['investimentos'], primeira['valor_alocado']), (1, Decimal('100.00')))
+        self.assertEqual((segunda['investimentos'], segunda['valor_alocado']), (0, Decimal('0.00')))
+        emprestimo.refresh_from_db()
+        ordem.refresh_from_db()
+        self.assertEqual(emprestimo.valor_captado, Decimal('100.00'))
+        self.assertEqual(ordem.saldo_disponivel, Decimal('900.00'))
+        self.assertEqual(Investimento.objects.filter(ordem=ordem).aggregate(total=Sum('valor'))['total'],
+                         Decimal('100.00'))
+
+
+class ValidacaoCpfTests(TestCase):
+    """A validação vetorizada (importações, sanções) dá o mesmo resultado que a validação de um CPF."""
+
+    def _casos(self):
+        aleatorio = random.Random(20)
+        validos = [completar_cpf(aleatorio.randrange(10 ** 9)) for _ in range(300)]
+        casos = list(validos)
+        # Formatados
+        casos += [f'{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}' for c in validos[:50]]
+        casos += [f' {c[:9]}/{c[9:]} ' for c in validos[50:80]]
+        # Dígito verificador errado (cada um dos dois)
+        casos += [c[:9] + str((int(c[9]) + 1) % 10) + c[10] for c in validos[:50]]
+        casos += [c[:10] + str((int(c[10]) + 1) % 10) for c in validos[50:100]]
+        # Dígitos repetidos, alguns com DV "válido"
+        casos += [str(d) * 11 for d in range(10)] + ['000.000.000-00', '111.111.111-11']
+        # Malformados
+        casos += ['', '123', '1234567890', '123456789012', '12.345.678/0001-90', 'abc.def.ghi-jk',
+                  '529x982247y25', '529_982_247_25', '5299822472\n5', '١٢٣٤٥٦٧٨٩٠٩', '52998224725.0']
+        return casos
+
+    def test_lote_igual_a_validacao_individual(self):
+        casos = self._casos()
+        self.assertEqual(validar_cpfs_em_lote(casos).tolist(), [validar_cpf(c) for c in casos])
+
+    def test_conversao_em_lote_igual_a_individual(self):
+        casos = self._casos()
+        self.assertEqual(cpfs_para_inteiros(casos).tolist(),
+                         [-1 if cpf_para_inteiro(c) is None else cpf_para_inteiro(c) for c in casos])
+
+    def test_casos_conhecidos(self):
+        self.assertTrue(validar_cpf('529.982.247-25'))
+        self.assertFalse(validar_cpf('529.982.247-26'))
+        self.assertFalse(validar_cpf('111.111.111-11'))
+        self.assertEqual(validar_cpfs_em_lote(['529.982.247-25', '52998224726', '11111111111', '']).tolist(),
+                         [True, False, False, False])
+
+
+class ResumoCarteiraTests(TestCase):
+    """O resumo mantido de forma incremental é igual ao reconstruído a partir dos Investimentos."""
+
+    def _resumos(self):
+        campos = ['quantidade_investimentos'] + CAMPOS_VALOR
+        return {linha[0]: linha[1:] for linha in ResumoCarteira.objects.values_list('investidor_id', *campos)}
+
+    def _emprestimo(self, tomador, valor):
+        return Emprestimo.objects.create(
+            tomador=tomador, valor_solicitado=Decimal(valor), taxa_juros=Decimal('10'), meses_parcelamento=6,
+            valor_total_pagamento=Decimal(valor) * Decimal('1.1'), valor_parcela=Decimal('1'))
+
+    def test_incremental_igual_a_reconstrucao_mesmo_apos_mudanca_de_risco(self):
+        arriscado = criar_usuario('arriscado', 111111112, risco='ALTO')
+        seguro = criar_usuario('seguro', 222222223, risco='BAIXO')
+        investidores = [criar_usuario(f'investidor{i}', 300000000 + i) for i in range(3)]
+        OrdemAutoInvestimento.objects.create(investidor=investidores[2], valor_maximo_por_emprestimo=Decimal('250'),
+                                             saldo_disponivel=Decimal('1000'), riscos_aceitos='BAIXO,ALTO')
+
+        parcial = self._emprestimo(arriscado, '1000')
+        integral = self._emprestimo(seguro, '300')
+        auto = self._emprestimo(arriscado, '500')
+        financiar(parcial.pk, investidores[0].pk, Decimal('400'))
+        financiar(parcial.pk, investidores[1].pk, Decimal('350'))
+        financiar(integral.pk, investidores[0].pk)
+        executar_auto_investimento()
+
+        # O risco do tomador muda depois dos investimentos: a carteira continua na faixa da época
+        CustomUser.objects.filter(pk=arriscado.pk).update(risco='BAIXO')
+        CustomUser.objects.filter(pk=seguro.pk).update(risco='ALTO')
+
+        incremental = self._resumos()
+        total, divergentes = reconstruir_resumos()
+        self.assertEqual((total, divergentes), (3, 0))
+        self.assertEqual(self._resumos(), incremental)
+
+        resumo = ResumoCarteira.objects.get(investidor=investidores[0])
+        self.assertEqual(resumo.capital_risco_alto, Decimal('400.00'))
+        self.assertEqual(resumo.capital_risco_baixo, Decimal('300.00'))
+        # O auto-investimento completou o parcial (faltavam 250): os dois empréstimos estão financiados
+        self.assertEqual(resumo.capital_financiado, Decimal('700.00'))
+        self.assertTrue(Investimento.objects.filter(emprestimo=auto, risco_tomador='ALTO').exists())
+
+
+@override_settings(KYC_MAX_TENTATIVAS=2)
+class FilaKycTests(TestCase):
+    """Um job pendente por usuário e tentativas limitadas, tanto para erros quanto para jobs travados."""
+
+    def setUp(self):
+        self.usuario = criar_usuario('cliente', 123456789, kyc_status='PENDENTE')
+
+    def _travar(self, job, tentativas):
+        KycJob.objects.filter(pk=job.pk).update(status='PROCESSANDO', tentativas=tentativas,
+                                                data_inicio=timezone.now() - timedelta(hours=1))
+
+    def test_enfileirar_reaproveita_o_pendente(self):
+        job = enfileirar_kyc(self.usuario)
+        self.assertEqual(enfileirar_kyc(self.usuario), job)
+        with self.assertRaises(IntegrityError):
+            KycJob.objects.create(usuario=self.usuario)
+
+    def test_erro_devolve_para_a_fila_ate_esgotar(self):
+        enfileirar_kyc(self.usuario)
+        # O kyc_service é substituído no sys.modules: o worker o importa tardiamente e ele exige o dlib.
+        kyc_service = mock.Mock(processar_kyc_automatico=mock.Mock(side_effect=RuntimeError('dlib caiu')))
+        with mock.patch.dict('sys.modules', {'core.kyc_service': kyc_service}), \
+                self.assertLogs('core.kyc_queue', 'ERROR'):
+            job = executar_job(reservar_proximo_job())
+            self.assertEqual((job.status, job.tentativas), ('PENDENTE', 1))
+            job = executar_job(reservar_proximo_job())
+        self.assertEqual((job.status, job.tentativas), ('ESGOTADO', 2))
+        self.assertIn('dlib caiu', job.resultado['motivo'])
+        self.assertIsNone(reservar_proximo_job())
+
+    def test_recuperacao_de_jobs_travados(self):
+        outro = criar_usuario('outro', 987654321, kyc_status='PENDENTE')
+        terceiro = criar_usuario('terceiro', 111222333, kyc_status='PENDENTE')
+        devolvido, esgotado, substituido = (enfileirar_kyc(u) for u in (self.usuario, outro, terceiro))
+        self._travar(devolvido, 1)
+        self._travar(esgotado, 2)
+        self._travar(substituido, 1)
+        novo = enfileirar_kyc(terceiro)
+
+        self.assertEqual(recuperar_jobs_travados(timeout_minutos=15), (1, 1))
+        status = dict(KycJob.objects.values_list('pk', 'status'))
+        self.assertEqual(status, {devolvido.pk: 'PENDENTE', esgotado.pk: 'ESGOTADO',
+                                  substituido.pk: 'FALHA', novo.pk: 'PENDENTE'})
+
+
+class CacheMarketplaceTests(TestCase):
+    """A listagem vem do cache até a versão ser trocada; a carteira é lida do resumo, sem cache."""
+
+    def setUp(self):
+        # O cache em memória sobrevive ao rollback de cada teste
+        cache.clear()
+        tomador = criar_usuario('tomador', 123456789, risco='BAIXO')
+        self.investidor = criar_usuario('investidor', 987654321)
+        self.emprestimo = Emprestimo.objects.create(
+            tomador=tomador, valor_solicitado=Decimal('1000'), taxa_juros=Decimal('10'), meses_parcelamento=6,
+            valor_total_pagamento=Decimal('1100'), valor_parcela=Decimal('1'))
+
+    def _listagem(self):
+        return {e['id_emprestimo']: e['valor_restante']
+                for e in self.client.get('/api/emprestimos/').json()['emprestimos_disponiveis']}
+
+    def _carteira(self):
+        return self.client.get(f'/api/investidores/{self.investidor.pk}/carteira/').json()
+
+    def test_pagina_em_cache_ate_invalidar_a_versao(self):
+        self.assertEqual(self._listagem(), {self.emprestimo.pk: '1000.00'})
+        Emprestimo.objects.filter(pk=self.emprestimo.pk).update(valor_captado=Decimal('400'))
+        self.assertEqual(self._listagem(), {self.emprestimo.pk: '1000.00'})
+
+        invalidar_cache_marketplace()
+        self.assertEqual(self._listagem(), {self.emprestimo.pk: '600.00'})
+
+    def test_financiamento_atualiza_listagem_e_carteira(self):
+        self.assertEqual(self._listagem(), {self.emprestimo.pk: '1000.00'})
+        self.assertEqual(self._carteira()['capital_investido'], '0.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post('/api/financiar/', json.dumps({
+                'emprestimo_id': self.emprestimo.pk, 'investidor_id': self.investidor.pk, 'valor': '250'}),
+                content_type='application/json')
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        self.assertEqual(self._listagem(), {self.emprestimo.pk: '750.00'})
+        self.assertEqual(self._carteira()['capital_investido'], '250.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            financiar(self.emprestimo.pk, self.investidor.pk)
+        self.assertEqual(self._listagem(), {})
+        carteira = self._carteira()
+        self.assertEqual((carteira['quantidade_investimentos'], carteira['capital_investido']), (2, '1000.00'))
+
+
+class ScoreRiscoTests(TestCase):
+    """O score vetorizado é igual ao escalar, e o rescore_users só grava quem mudou."""
+
+    def _anos_atras(self, hoje, anos, dias=0):
+        try:
+            return hoje.replace(year=hoje.year - anos) + timedelta(days=dias)
+        except ValueError:  # 29/02 em ano não bissexto
+            return hoje.replace(year=hoje.year - anos, day=28) + timedelta(days=dias)
+
+    def test_vetorizado_igual_ao_escalar(self):
+        hoje = date.today()
+        gerador = random.Random(7)
+        # Fronteiras: aniversários das faixas de idade (ontem, hoje, amanhã), 29/02, sem nascimento,
+        # rendas nos limites e o dia exato em que o bônus de cadastro passa a valer
+        nascimentos = [self._anos_atras(hoje, anos, dias) for anos in (18, 25, 45) for dias in (-1, 0, 1)]
+        nascimentos += [date(2000, 2, 29), date(1980, 2, 29), None]
+        nascimentos += [hoje - timedelta(days=gerador.randint(17 * 365, 80 * 365)) for _ in range(300)]
+        rendas = [Decimal('1999.99'), Decimal('2000'), Decimal('2000.01'), Decimal('5000'), Decimal('5000.01'), 0]
+        cadastros = [hoje - timedelta(days=dias) for dias in (0, 365, 366, 367)]
+
+        usuarios = [CustomUser(
+            data_nascimento=nascimento,
+            renda_mensal=rendas[i % len(rendas)] if i < 60 else Decimal(gerador.randint(0, 900000)) / 100,
+            date_joined=timezone.make_aware(datetime.combine(
+                cadastros[i % len(cadastros)] if i < 60 else hoje - timedelta(days=gerador.randint(0, 1000)),
+                datetime.min.time())),
+        ) for i, nascimento in enumerate(nascimentos)]
+
+        riscos, scores = calcular_scores_vetorizado(
+            np.array([u.data_nascimento for u in usuarios], dtype='datetime64[D]'),
+            np.array([u.renda_mensal for u in usuarios], dtype=np.float64),
+            np.array([u.date_joined.date() for u in usuarios], dtype='datetime64[D]'),
+        )
+        for usuario, risco, score in zip(usuarios, riscos, scores):
+            with self.subTest(nascimento=usuario.data_nascimento, renda=usuario.renda_mensal,
+                              cadastro=usuario.date_joined.date()):
+                self.assertEqual(calcular_risco(usuario), (str(risco), int(score)))
+
+    def _rescore(self):
+        saida = StringIO()
+        call_command('rescore_users', stdout=saida)
+        return saida.getvalue()
+
+    def test_rescore_atualiza_so_quem_mudou(self):
+        usuarios = [criar_usuario(f'usuario{i}', 100000000 + i, data_nascimento=date(1960 + i * 10, 5, 17),
+                                  renda_mensal=Decimal(1500 * (i + 1))) for i in range(4)]
+
+        self.assertIn('4 usuários processados, 4 atualizados', self._rescore())
+        calculados = dict(CustomUser.objects.values_list('pk', 'risco_calculado_em'))
+        self.assertIn('4 usuários processados, 0 atualizados', self._rescore())
+        self.assertEqual(dict(CustomUser.objects.values_list('pk', 'risco_calculado_em')), calculados)
+
+        CustomUser.objects.filter(pk=usuarios[0].pk).update(renda_mensal=Decimal('9000'))
+        self.assertIn('4 usuários processados, 1 atualizados', self._rescore())
+        depois = dict(CustomUser.objects.values_list('pk', 'risco_calculado_em'))
+        self.assertEqual([pk for pk in depois if depois[pk] != calculados[pk]], [usuarios[0].pk])
+        self.assertEqual(CustomUser.objects.get(pk=usuarios[0].pk).score_risco,
+                         calcular_risco(CustomUser.objects.get(pk=usuarios[0].pk))[1])
+
+
+class PaginacaoMarketplaceTests(TestCase):
+    """Paginação por chave (data_criacao, id) da listagem do marketplace."""
+
+    def setUp(self):
+        cache.clear()
+        self.tomador = criar_usuario('tomador', 123456789, risco='MEDIO')
+
+    def _criar(self, quantidade, data_criacao):
+        ids = [Emprestimo.objects.create(
+            tomador=self.tomador, valor_solicitado=Decimal('1000'), taxa_juros=Decimal('10'), meses_parcelamento=6,
+            valor_total_pagamento=Decimal('1100'), valor_parcela=Decimal('1')).pk for _ in range(quantidade)]
+        Emprestimo.objects.filter(pk__in=ids).update(data_criacao=data_criacao)
+        return ids
+
+    def _pagina(self, cursor=None, limite=3):
+        parametros = {'limite': limite, **({'cursor': cursor} if cursor else {})}
+        resposta = self.client.get('/api/emprestimos/', parametros)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        corpo = resposta.json()
+        return [e['id_emprestimo'] for e in corpo['emprestimos_disponiveis']], corpo['proximo_cursor']
+
+    def test_chaves_de_ordenacao_iguais_nao_repetem_nem_pulam(self):
+        instante = timezone.now() - timedelta(days=1)
+        antigos = self._criar(2, instante - timedelta(hours=1))
+        empatados = self._criar(5, instante)
+
+        primeira, cursor = self._pagina()
+        self.assertEqual(primeira, sorted(empatados, reverse=True)[:3])
+
+        # Um empréstimo novo entre as páginas entra no topo, sem deslocar as seguintes
+        self._criar(1, timezone.now())
+        invalidar_cache_marketplace()
+        segunda, cursor = self._pagina(cursor)
+        terceira, cursor = self._pagina(cursor)
+
+        self.assertEqual(primeira + segunda + terceira,
+                         sorted(empatados, reverse=True) + sorted(antigos, reverse=True))
+        self.assertIsNone(cursor)
+
+    def test_ultima_pagina_cheia_nao_tem_cursor(self):
+        ids = self._criar(6, timezone.now())
+        primeira, cursor = self._pagina()
+        self.assertIsNotNone(cursor)
+        segunda, cursor = self._pagina(cursor)
+        self.assertEqual(primeira + segunda, sorted(ids, reverse=True))
+        self.assertIsNone(cursor)
+
+    def test_cursor_invalido(self):
+        for cursor in ('nao-e-base64!', 'YWJj', base64.urlsafe_b64encode(b'2024-01-01|x').decode(),
+                       base64.urlsafe_b64encode(b'\xff\xfe').decode()):
+            with self.subTest(cursor=cursor):
+                resposta = self.client.get('/api/emprestimos/', {'cursor': cursor})
+                self.assertEqual(resposta.status_code, 400)
+                self.assertEqual(resposta.json(), {'erro': 'Cursor inválido.'})
+
+
+class ListaRestritivaTests(TestCase):
+    """Cargas versionadas da lista restritiva e consulta por documento formatado ou só dígitos."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+        self.cpfs = [completar_cpf(base) for base in (123456789, 987654321, 111444777)]
+        self.cnpj = '11222333000181'
+
+    def _formatado(self, cpf):
+        return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+    def _csv(self, nome, documentos):
+        caminho = os.path.join(self.diretorio, nome)
+        with open(caminho, 'w', encoding='utf-8-sig') as arquivo:
+            arquivo.write('CPF OU CNPJ DO SANCIONADO;NOME DO SANCIONADO\n')
+            for i, documento in enumerate(documentos):
+                arquivo.write(f'{documento};Sancionado {i}\n')
+        return caminho
+
+    def _resumo(self, estado):
+        return (estado.versao, estado.total_registros, estado.novos_ultima_carga, estado.removidos_ultima_carga)
+
+    def test_versoes_e_diferenca_entre_cargas(self):
+        primeira = self._csv('ceis_1.csv', [self._formatado(self.cpfs[0]), self.cpfs[1], '11.222.333/0001-81'])
+        carregada, estado = atualizar_lista_restritiva('CEIS', primeira)
+        self.assertTrue(carregada)
+        self.assertEqual(self._resumo(estado), (1, 3, 3, 0))
+
+        # Mesmo conteúdo: nada é recarregado e a versão não muda; forçando, sobe sem diferença
+        self.assertEqual(atualizar_lista_restritiva('CEIS', primeira)[0], False)
+        carregada, estado = atualizar_lista_restritiva('CEIS', primeira, forcar=True)
+        self.assertTrue(carregada)
+        self.assertEqual(self._resumo(estado), (2, 3, 0, 0))
+
+        segunda = self._csv('ceis_2.csv', [self.cpfs[1], self.cnpj, self._formatado(self.cpfs[2])])
+        carregada, estado = atualizar_lista_restritiva('CEIS', segunda)
+        self.assertTrue(carregada)
+        self.assertEqual(self._resumo(estado), (3, 3, 1, 1))
+        self.assertEqual(SancaoRestritiva.objects.get(documento=self.cpfs[1]).primeira_carga, 1)
+        self.assertEqual(SancaoRestritiva.objects.get(documento=self.cpfs[2]).primeira_carga, 3)
+
+    def test_consulta_formatada_ou_so_digitos(self):
+        atualizar_lista_restritiva('CEIS', self._csv('ceis.csv', [self._formatado(self.cpfs[0]), self.cnpj]))
+
+        for documento, esperado in ((self.cpfs[0], True), (self._formatado(self.cpfs[0]), True),
+                                    (self.cnpj, True), ('11.222.333/0001-81', True),
+                                    (self.cpfs[1], False), (self._formatado(self.cpfs[1]), False), ('', False)):
+            with self.subTest(documento=documento):
+                self.assertEqual(documento_tem_restricao(documento), esperado)
+
+
+class TriagemSancoesTests(TestCase):
+    """A triagem olha só as entradas novas das listas e reabre o alerta de quem volta a elas."""
+
+    def setUp(self):
+        self.usuarios = [criar_usuario(f'usuario{i}', base) for i, base in enumerate((123456789, 987654321))]
+
+    def _carregar(self, *usuarios):
+        carregar_sancoes([(u.cpf, u.username.upper()) for u in usuarios])
+
+    def _triar(self, bloquear):
+        with redirect_stdout(StringIO()):
+            return triar_novas_sancoes(bloquear=bloquear)
+
+    def _kyc(self, usuario):
+        return CustomUser.objects.get(pk=usuario.pk).kyc_status
+
+    def test_so_as_entradas_novas_sao_triadas(self):
+        primeiro, segundo = self.usuarios
+        self._carregar(primeiro)
+        resultado = self._triar(bloquear=True)
+        self.assertEqual((resultado['documentos_novos'], resultado['usuarios_encontrados'],
+                          resultado['usuarios_bloqueados']), (1, 1, 1))
+        self.assertEqual(self._kyc(primeiro), 'REPROVADO')
+
+        # Liberado manualmente: continuar na lista não o bloqueia de novo, só o documento novo é triado
+        CustomUser.objects.filter(pk=primeiro.pk).update(kyc_status='APROVADO')
+        self._carregar(primeiro, segundo)
+        resultado = self._triar(bloquear=True)
+        self.assertEqual((resultado['documentos_novos'], resultado['usuarios_encontrados'],
+                          resultado['usuarios_bloqueados']), (1, 1, 1))
+        self.assertEqual((self._kyc(primeiro), self._kyc(segundo)), ('APROVADO', 'REPROVADO'))
+        self.assertEqual(self._triar(bloquear=True)['fontes_triadas'], 0)
+
+    def test_alerta_reaberto_quando_o_documento_volta(self):
+        usuario = self.usuarios[0]
+        self._carregar(usuario)
+        self._triar(bloquear=True)
+        CustomUser.objects.filter(pk=usuario.pk).update(kyc_status='APROVADO')
+
+        self._carregar()
+        self._carregar(usuario)
+        resultado = self._triar(bloquear=False)
+        self.assertEqual((resultado['usuarios_encontrados'], resultado['usuarios_bloqueados']), (1, 0))
+        alerta = AlertaSancao.objects.get(usuario=usuario)
+        # Reaberto com a versão nova; sem bloqueio, o bloqueio já registrado é mantido
+        self.assertEqual((alerta.versao_carga, alerta.bloqueado), (3, True))
+        self.assertEqual(self._kyc(usuario), 'APROVADO')
+
+        self._carregar()
+        self._carregar(usuario)
+        resultado = self._triar(bloquear=True)
+        self.assertEqual(resultado['usuarios_bloqueados'], 1)
+        self.assertEqual(AlertaSancao.objects.get(usuario=usuario).versao_carga, 5)
+        self.assertEqual(self._kyc(usuario), 'REPROVADO')
+
+    def test_sem_bloqueio_registra_alerta_sem_bloquear(self):
+        usuario = self.usuarios[0]
+        self._carregar(usuario)
+        self._triar(bloquear=False)
+        self.assertFalse(AlertaSancao.objects.get(usuario=usuario).bloqueado)
+        self.assertEqual(self._kyc(usuario), 'APROVADO')
+
+
+class QuantidadeConsultasTests(TestCase):
+    """Consultas feitas pelas leituras do painel: carteira, listagem do marketplace e lista restritiva."""
+
+    def setUp(self):
+        cache.clear()
+        tomador = criar_usuario('tomador', 123456789, risco='ALTO')
+        self.investidor = criar_usuario('investidor', 987654321)
+        for valor in ('500', '800', '1200'):
+            emprestimo = Emprestimo.objects.create(
+                tomador=tomador, valor_solicitado=Decimal(valor), taxa_juros=Decimal('10'), meses_parcelamento=6,
+                valor_total_pagamento=Decimal(valor) * Decimal('1.1'), valor_parcela=Decimal('1'))
+            financiar(emprestimo.pk, self.investidor.pk, Decimal('100'))
+        carregar_sancoes([(tomador.cpf, 'TOMADOR')])
+
+    def test_carteira_le_so_o_resumo(self):
+        with self.assertNumQueries(1):
+            carteira = self.client.get(f'/api/investidores/{self.investidor.pk}/carteira/').json()
+        self.assertEqual((carteira['quantidade_investimentos'], carteira['capital_investido']), (3, '300.00'))
+
+        # Sem resumo: uma consulta a mais só para distinguir investidor sem carteira de inexistente
+        sem_carteira = criar_usuario('novo', 111444777)
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/investidores/{sem_carteira.pk}/carteira/')
+
+    def test_listagem_em_uma_consulta_e_depois_do_cache(self):
+        with self.assertNumQueries(1):
+            listagem = self.client.get('/api/emprestimos/').json()['emprestimos_disponiveis']
+        self.assertEqual(len(listagem), 3)
+        self.assertEqual({e['risco_tomador'] for e in listagem}, {'ALTO'})
+        with self.assertNumQueries(0):
+            self.client.get('/api/emprestimos/')
+
+    def test_consulta_restritiva_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(documento_tem_restricao(completar_cpf(123456789)))
+
+
+class ImagemDescompressaoTests(TestCase):
+    """Imagem acima do limite de pixels do Pillow (bomba de descompressão) é rejeitada como inválida."""
+
+    def setUp(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (100, 100), 'white').save(buffer, format='PNG')
+        self.conteudo = buffer.getvalue()
+        # 100x100 passa de duas vezes o limite: o Pillow lança DecompressionBombError em vez de avisar
+        limite = mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 1000)
+        limite.start()
+        self.addCleanup(limite.stop)
+
+    def test_funcoes_de_imagem_lancam_imagem_invalida(self):
+        with self.assertRaises(ImagemInvalida):
+            normalizar_imagem(io.BytesIO(self.conteudo))
+        with self.assertRaises(ImagemInvalida):
+            calcular_hashes_perceptuais(self.conteudo)
+
+    def test_upload_responde_400(self):
+        usuario = criar_usuario('cliente', 123456789, kyc_status='PENDENTE')
+        arquivos = {campo: SimpleUploadedFile(f'{campo}.png', self.conteudo, content_type='image/png')
+                    for campo in ('foto_documento_frente', 'foto_documento_verso', 'selfie')}
+        resposta = self.client.post('/api/upload-documentos/', {'user_id': usuario.pk, **arquivos})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('Arquivo de imagem inválido', resposta.json()['erro'])
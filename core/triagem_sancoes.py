@@ -0,0 +1,59 @@
+# core/triagem_sancoes.py
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from .models import AlertaSancao, CustomUser, FonteRestritiva, SancaoRestritiva
+
+
+@transaction.atomic
+def triar_novas_sancoes(fontes=None, bloquear=None):
+    """
+    Recheca a base de usuários contra as listas restritivas olhando só o que entrou nelas desde a
+    última triagem (primeira_carga > versao_triada de cada fonte). Cada documento novo é procurado
+    no índice único de CustomUser.cpf_numero, então o custo acompanha o tamanho da mudança nas listas,
+    não o da base de usuários. Os encontrados ganham um AlertaSancao e, com bloquear, têm o KYC
+    reprovado, com um bulk_create e um UPDATE por fonte.
+    Retorna um Counter com os totais.
+    """
+    if bloquear is None:
+        bloquear = getattr(settings, 'TRIAGEM_SANCOES_BLOQUEAR', True)
+
+    resultado = Counter()
+    estados = FonteRestritiva.objects.select_for_update().filter(versao__gt=F('versao_triada'))
+    if fontes:
+        estados = estados.filter(fonte__in=fontes)
+
+    for estado in estados:
+        novos = SancaoRestritiva.objects.filter(fonte=estado.fonte, primeira_carga__gt=estado.versao_triada)
+        resultado['documentos_novos'] += novos.count()
+
+        encontrados = list(
+            novos.filter(cpf_numero__isnull=False)
+            .annotate(usuario_id=Subquery(CustomUser.objects.filter(cpf_numero=OuterRef('cpf_numero')).values('pk')[:1]))
+            .filter(usuario_id__isnull=False)
+            .values_list('usuario_id', 'documento', 'nome', 'primeira_carga')
+        )
+        if encontrados:
+            AlertaSancao.objects.bulk_create([
+                AlertaSancao(usuario_id=usuario_id, fonte=estado.fonte, documento=documento, nome_sancionado=nome,
+                             versao_carga=versao, bloqueado=bloquear)
+                for usuario_id, documento, nome, versao in encontrados
+            ], batch_size=1000, update_conflicts=True, unique_fields=['usuario', 'fonte', 'documento'],
+                # Documento que saiu da lista e voltou: o alerta existente é reaberto com a nova versão,
+                # para entrar no bloqueio abaixo. Sem bloquear, um bloqueio já registrado é mantido.
+                update_fields=['nome_sancionado', 'versao_carga'] + (['bloqueado'] if bloquear else []))
+            resultado['usuarios_encontrados'] += len(encontrados)
+            print(f"ALERTA: {len(encontrados)} usuário(s) encontrado(s) nas novas entradas do {estado.fonte}.")
+
+            if bloquear:
+                alertados = AlertaSancao.objects.filter(fonte=estado.fonte, versao_carga__gt=estado.versao_triada)
+                resultado['usuarios_bloqueados'] += (CustomUser.objects
+                                                     .filter(pk__in=alertados.values('usuario_id'))
+                                                     .exclude(kyc_status='REPROVADO')
+                                                     .update(kyc_status='REPROVADO'))
+
+        estado.versao_triada = estado.versao
+        estado.save(update_fields=['versao_triada'])
+        resultado['fontes_triadas'] += 1
+    return resultado
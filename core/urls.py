@@ -19,8 +19,13 @@ urlpatterns += [
     path('api/cadastro/', views.cadastro, name='api_cadastro'),
     path('api/pedir-emprestimo/', views.analise_e_pedido_emprestimo, name='api_pedir_emprestimo'),
     path('api/emprestimos/', views.listar_emprestimos_disponiveis, name='api_listar_emprestimos'),
+    path('api/emprestimos/<int:emprestimo_id>/cronograma/', views.cronograma_emprestimo, name='api_cronograma_emprestimo'),
     path('api/financiar/', views.financiar_emprestimo, name='api_financiar_emprestimo'),
+    path('api/auto-investimento/', views.criar_ordem_auto_investimento, name='api_auto_investimento'),
+    path('api/investidores/<int:investidor_id>/carteira/', views.carteira_investidor, name='api_carteira_investidor'),
     path('api/iniciar-kyc/', views.iniciar_kyc_view, name='api_iniciar_kyc'),
+    path('api/kyc/<int:job_id>/', views.status_kyc_view, name='api_status_kyc'),
+    path('api/kyc/relatorio/', views.relatorio_kyc_view, name='api_relatorio_kyc'),
     path('api/upload-documentos/', views.upload_documentos_view, name='api_upload_documentos'),
     path('api/login/', views.login_api, name='api_login'),
 ]
\ No newline at end of file
@@ -1,31 +1,109 @@
 # core/validators.py
 import re
+import numpy as np
+
+# Pesos dos dígitos verificadores: 10..2 para o primeiro e 11..2 para o segundo
+PESOS_DV1 = np.arange(10, 1, -1, dtype=np.int64)
+PESOS_DV2 = np.arange(11, 1, -1, dtype=np.int64)
+POTENCIAS_CPF = 10 ** np.arange(10, -1, -1, dtype=np.int64)
+
+# Única regra de limpeza de CPF/CNPJ do projeto: cadastro, importações, KYC, sanções e cpf_numero
+# descartam tudo que não for dígito ASCII (0-9)
+_NAO_DIGITO = re.compile(r'[^0-9]')
+
+
+def normalizar_documento(documento):
+    """Remove a formatação de um CPF/CNPJ, mantendo apenas os dígitos."""
+    return _NAO_DIGITO.sub('', str(documento or ''))
+
 
 def validar_cpf(cpf):
     """
     Valida o formato e os dígitos verificadores de um CPF.
     Retorna True se for válido, False caso contrário.
     """
-    # Remove caracteres não numéricos
-    cpf = ''.join(re.findall(r'\d', str(cpf)))
+    cpf = normalizar_documento(cpf)
 
-    if not cpf or len(cpf) != 11 or cpf == cpf[0] * 11:
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
         return False
 
+    digitos = [int(d) for d in cpf]
+
     # Validação do primeiro dígito verificador
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    resto = (soma * 10) % 11
-    if resto == 10:
-        resto = 0
-    if resto != int(cpf[9]):
+    soma = sum(d * (10 - i) for i, d in enumerate(digitos[:9]))
+    if (soma * 10) % 11 % 10 != digitos[9]:
         return False
 
     # Validação do segundo dígito verificador
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    resto = (soma * 10) % 11
-    if resto == 10:
-        resto = 0
-    if resto != int(cpf[10]):
-        return False
+    soma = sum(d * (11 - i) for i, d in enumerate(digitos[:10]))
+    return (soma * 10) % 11 % 10 == digitos[10]
+
+
+def completar_cpf(base):
+    """CPF de 11 dígitos (string) formado pela base de 9 dígitos e os dois dígitos verificadores."""
+    digitos = [int(d) for d in f'{int(base):09d}']
+    for pesos in (PESOS_DV1, PESOS_DV2):
+        digitos.append(int(np.dot(digitos, pesos)) * 10 % 11 % 10)
+    return ''.join(map(str, digitos))
+
+
+def cpf_para_inteiro(cpf):
+    """CPF (formatado ou não) como inteiro de 11 dígitos, ou None se não tiver 11 dígitos."""
+    cpf = normalizar_documento(cpf)
+    return int(cpf) if len(cpf) == 11 else None
+
+
+def digitos_cpfs(cpfs):
+    """
+    Matriz N x 11 com os dígitos de cada CPF e uma máscara dos que têm exatamente 11 dígitos.
+    Aceita um array de inteiros (conversão puramente aritmética) ou uma sequência de strings,
+    formatadas ou não, com a mesma limpeza de normalizar_documento: a formatação usual
+    (. - / espaço) sai nas rotinas vetorizadas de np.char e o resto passa por normalizar_documento.
+    """
+    cpfs = np.asarray(cpfs)
+    if not cpfs.size:
+        return np.zeros((0, 11), dtype=np.int64), np.zeros(0, dtype=bool)
+    if np.issubdtype(cpfs.dtype, np.integer):
+        numeros = cpfs.astype(np.int64)
+        formato_ok = (numeros >= 0) & (numeros < 10 ** 11)
+        return (numeros[:, None] // POTENCIAS_CPF) % 10, formato_ok
+
+    originais = cpfs.astype(str)
+    texto = originais
+    for separador in ('.', '-', ' ', '/'):
+        texto = np.char.replace(texto, separador, '')
+    formato_ok = (np.char.str_len(texto) == 11) & np.char.isdigit(texto)
+
+    # Cada caractere UTF-32 vira um uint32; '0' é 48
+    digitos = np.zeros((len(texto), 11), dtype=np.int64)
+    if formato_ok.any():
+        validos = np.ascontiguousarray(texto[formato_ok].astype('U11'))
+        digitos[formato_ok] = validos.view(np.uint32).reshape(-1, 11) - 48
+        # isdigit aceita dígitos de outros alfabetos (ex.: árabe-índicos)
+        formato_ok &= ((digitos >= 0) & (digitos <= 9)).all(axis=1)
+
+    # Fora do formato usual (outros separadores, letras, CNPJs): limpeza de normalizar_documento, um a um
+    for posicao in np.flatnonzero(~formato_ok):
+        cpf = normalizar_documento(originais[posicao])
+        if len(cpf) == 11:
+            digitos[posicao] = [int(d) for d in cpf]
+            formato_ok[posicao] = True
+    return digitos, formato_ok
+
+
+def validar_cpfs_em_lote(cpfs):
+    """
+    Versão vetorizada de validar_cpf para milhões de CPFs de uma vez (importações, bases de sanções).
+    Retorna um array booleano alinhado com a entrada.
+    """
+    digitos, validos = digitos_cpfs(cpfs)
+    validos &= ~(digitos == digitos[:, :1]).all(axis=1)
+    dv1 = (digitos[:, :9] @ PESOS_DV1) * 10 % 11 % 10
+    dv2 = (digitos[:, :10] @ PESOS_DV2) * 10 % 11 % 10
+    return validos & (dv1 == digitos[:, 9]) & (dv2 == digitos[:, 10])
+
 
-    return True
\ No newline at end of file
+def cpfs_para_inteiros(cpfs):
+    """Array int64 com o CPF como número (chave compacta para buscas e joins); -1 onde não há 11 dígitos."""
+    digitos, formato_ok = digitos_cpfs(cpfs)
+    return np.where(formato_ok, digitos @ POTENCIAS_CPF, -1)
@@ -1,17 +1,26 @@
 import json
+from datetime import datetime, timedelta
 from decimal import Decimal
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth import authenticate, login, logout
 from django.db import transaction
+from django.utils import timezone
 from django.shortcuts import render, redirect
-from .kyc_service import processar_kyc_automatico
-import re
+from .kyc_queue import enfileirar_kyc
+from .kyc_metricas import resumo_execucoes
+from .financiamento import financiar, transacao_de_escrita, ErroFinanciamento
+from .marketplace import ler_parametros_listagem, obter_pagina_serializada, invalidar_cache_marketplace
+from .media_ingest import armazenar_imagem_kyc, ImagemInvalida
+from .phash_index import gravar_hashes_kyc
+from .amortizacao import calcular_cronogramas, centavos_para_decimal, resumo_cronograma
+from .carteira import CAMPOS_RISCO, CAMPOS_STATUS
 
-from .models import CustomUser, Emprestimo
-from .validators import validar_cpf
-from .risk_analysis import calcular_risco
+from .models import CustomUser, Emprestimo, KycJob, OrdemAutoInvestimento, Parcela, ResumoCarteira
+from .validators import normalizar_documento, validar_cpf
+from .risk_analysis import obter_risco
 
 
 @csrf_exempt
@@ -61,7 +70,7 @@ def cadastro(request):
         if not validar_cpf(data['cpf']):
             return JsonResponse({'erro': 'CPF inválido'}, status=400)
 
-        cpf_limpo = re.sub(r'[^\d]', '', data['cpf'])
+        cpf_limpo = normalizar_documento(data['cpf'])
 
         novo_usuario = CustomUser.objects.create(
             username=data['username'],
@@ -95,9 +104,8 @@ def analise_e_pedido_emprestimo(request):
         if tomador.kyc_status != 'APROVADO':
             return JsonResponse({'erro': 'KYC não aprovado. Não é possível pedir empréstimo.'}, status=403)
 
-        risco, score = calcular_risco(tomador)
-        tomador.risco = risco
-        tomador.save()
+        # Score materializado: recalcula e grava (só os campos de risco) apenas se necessário
+        risco, score = obter_risco(tomador)
 
         taxas = {'ALTO': Decimal('15.0'), 'MEDIO': Decimal('10.0'), 'BAIXO': Decimal('5.0')}
         taxa_juros = taxas[risco]
@@ -105,19 +113,25 @@ def analise_e_pedido_emprestimo(request):
         valor_solicitado = Decimal(data['valor_solicitado'])
         meses_parcelamento = int(data['meses_parcelamento'])
 
-        juros_total = valor_solicitado * (taxa_juros / 100)
-        valor_total = valor_solicitado + juros_total
-        valor_parcela = valor_total / meses_parcelamento
+        sistema_amortizacao = str(data.get('sistema_amortizacao', 'PRICE')).upper()
+        if sistema_amortizacao not in dict(Emprestimo.SISTEMA_AMORTIZACAO_CHOICES):
+            return JsonResponse({'erro': 'Sistema de amortização inválido. Use PRICE ou SAC.'}, status=400)
+
+        # A taxa incide sobre o valor em todo o prazo; na SAC a primeira parcela é a maior
+        valor_total, valor_parcela = resumo_cronograma(
+            valor_solicitado, taxa_juros, meses_parcelamento, sistema_amortizacao)
         
         novo_emprestimo = Emprestimo.objects.create(
             tomador=tomador,
             valor_solicitado=valor_solicitado,
             taxa_juros=taxa_juros,
             meses_parcelamento=meses_parcelamento,
+            sistema_amortizacao=sistema_amortizacao,
             valor_total_pagamento=valor_total,
             valor_parcela=valor_parcela,
             status='AGUARDANDO'
         )
+        transaction.on_commit(invalidar_cache_marketplace)
         
         return JsonResponse({
             'mensagem': 'Pedido de empréstimo criado com sucesso!',
@@ -125,6 +139,7 @@ def analise_e_pedido_emprestimo(request):
             'risco_calculado': risco,
             'score': score,
             'taxa_juros_aplicada': f'{taxa_juros}%',
+            'sistema_amortizacao': sistema_amortizacao,
             'valor_total_a_pagar': f'{valor_total:.2f}',
             'valor_da_parcela': f'{valor_parcela:.2f}'
         }, status=201)
@@ -133,26 +148,21 @@ def analise_e_pedido_emprestimo(request):
 
 def listar_emprestimos_disponiveis(request):
     if request.method == 'GET':
-        emprestimos = Emprestimo.objects.filter(status='AGUARDANDO').order_by('-data_criacao')
-
-        lista_emprestimos = []
-        for emp in emprestimos:
-            lista_emprestimos.append({
-                'id_emprestimo': emp.id,
-                'tomador_username': emp.tomador.username,
-                'risco_tomador': emp.tomador.risco,
-                'valor_pedido': f'{emp.valor_solicitado:.2f}',
-                'taxa_juros': f'{emp.taxa_juros}%',
-                'parcelas': emp.meses_parcelamento,
-                'valor_total_retorno': f'{emp.valor_total_pagamento:.2f}'
-            })
-            
-        return JsonResponse({'emprestimos_disponiveis': lista_emprestimos}, status=200)
+        # Filtros opcionais: risco=BAIXO,MEDIO | valor_min/valor_max | taxa_min/taxa_max |
+        # meses_min/meses_max | limite | cursor (devolvido em 'proximo_cursor')
+        try:
+            filtros, cursor, limite = ler_parametros_listagem(request.GET)
+        except ValueError as e:
+            return JsonResponse({'erro': str(e)}, status=400)
+
+        # Página já serializada, vinda do cache enquanto nenhum empréstimo entrar ou sair da lista
+        conteudo = obter_pagina_serializada(filtros, cursor, limite)
+        return HttpResponse(conteudo, content_type='application/json', status=200)
 
     return JsonResponse({'erro': 'Método não permitido'}, status=405)
 
 @csrf_exempt
-@transaction.atomic
+@transacao_de_escrita()
 def financiar_emprestimo(request):
     if request.method == 'POST':
         data = json.loads(request.body)
@@ -160,31 +170,137 @@ def financiar_emprestimo(request):
         try:
             emprestimo_id = data['emprestimo_id']
             investidor_id = data['investidor_id']
-            
-            emprestimo = Emprestimo.objects.get(pk=emprestimo_id)
-            investidor = CustomUser.objects.get(pk=investidor_id)
-
-        except (Emprestimo.DoesNotExist, CustomUser.DoesNotExist, KeyError):
+        except KeyError:
             return JsonResponse({'erro': 'Empréstimo ou Investidor não encontrado.'}, status=404)
 
-        if emprestimo.status != 'AGUARDANDO':
-            return JsonResponse({'erro': 'Este empréstimo não está mais disponível para investimento.'}, status=400)
+        # 'valor' é opcional: sem ele o investidor financia todo o restante do empréstimo.
+        # UPDATE condicional: concorrentes não se bloqueiam e nunca se capta além do solicitado
+        try:
+            investimento, status_novo = financiar(emprestimo_id, investidor_id, data.get('valor'))
+        except ErroFinanciamento as e:
+            return JsonResponse({'erro': e.mensagem}, status=e.status_http)
+        
+        return JsonResponse({
+            'mensagem': 'Empréstimo financiado com sucesso!' if status_novo == 'FINANCIADO'
+                        else 'Investimento registrado com sucesso!',
+            'emprestimo_id': emprestimo_id,
+            'investimento_id': investimento.id,
+            'valor_investido': f'{investimento.valor:.2f}',
+            'status_novo': status_novo
+        }, status=200)
+
+    return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+def cronograma_emprestimo(request, emprestimo_id):
+    if request.method == 'GET':
+        emprestimo = (Emprestimo.objects.filter(pk=emprestimo_id)
+                      .values('id', 'status', 'valor_solicitado', 'taxa_juros', 'meses_parcelamento',
+                              'sistema_amortizacao', 'valor_total_pagamento').first())
+        if emprestimo is None:
+            return JsonResponse({'erro': 'Empréstimo não encontrado.'}, status=404)
+
+        parcelas = list(Parcela.objects.filter(emprestimo_id=emprestimo_id).order_by('numero').values(
+            'numero', 'data_vencimento', 'valor_amortizacao', 'valor_juros', 'valor', 'saldo_devedor',
+            'valor_pago', 'status'))
+        projecao = not parcelas
+        if projecao:
+            # Ainda não financiado: simula o cronograma sem datas de vencimento
+            cronograma = calcular_cronogramas([emprestimo['valor_solicitado']], [emprestimo['taxa_juros']],
+                                              [emprestimo['meses_parcelamento']], [emprestimo['sistema_amortizacao']],
+                                              totais=[emprestimo['valor_total_pagamento']])
+            parcelas = [{
+                'numero': numero + 1,
+                'data_vencimento': None,
+                'valor_amortizacao': centavos_para_decimal(cronograma['amortizacao'][0, numero]),
+                'valor_juros': centavos_para_decimal(cronograma['juros'][0, numero]),
+                'valor': centavos_para_decimal(cronograma['parcela'][0, numero]),
+                'saldo_devedor': centavos_para_decimal(cronograma['saldo'][0, numero]),
+                'valor_pago': Decimal('0.00'),
+                'status': 'PENDENTE',
+            } for numero in range(emprestimo['meses_parcelamento'])]
+
+        return JsonResponse({
+            'emprestimo_id': emprestimo['id'],
+            'status': emprestimo['status'],
+            'sistema_amortizacao': emprestimo['sistema_amortizacao'],
+            'projecao': projecao,
+            'parcelas': [{
+                'numero': p['numero'],
+                'data_vencimento': p['data_vencimento'].isoformat() if p['data_vencimento'] else None,
+                'amortizacao': f"{p['valor_amortizacao']:.2f}",
+                'juros': f"{p['valor_juros']:.2f}",
+                'valor': f"{p['valor']:.2f}",
+                'saldo_devedor': f"{p['saldo_devedor']:.2f}",
+                'valor_pago': f"{p['valor_pago']:.2f}",
+                'status': p['status'],
+            } for p in parcelas],
+        }, status=200)
+
+    return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+def carteira_investidor(request, investidor_id):
+    if request.method == 'GET':
+        # Leitura por chave primária do resumo mantido incrementalmente: não agrega empréstimos
+        resumo = ResumoCarteira.objects.filter(pk=investidor_id).first()
+        if resumo is None:
+            if not CustomUser.objects.filter(pk=investidor_id).exists():
+                return JsonResponse({'erro': 'Investidor não encontrado.'}, status=404)
+            resumo = ResumoCarteira(investidor_id=investidor_id)
+
+        return JsonResponse({
+            'investidor_id': investidor_id,
+            'quantidade_investimentos': resumo.quantidade_investimentos,
+            'capital_investido': f'{resumo.capital_investido:.2f}',
+            'retorno_esperado': f'{resumo.retorno_esperado:.2f}',
+            'exposicao_por_risco': {risco: f'{getattr(resumo, campo):.2f}' for risco, campo in CAMPOS_RISCO.items()},
+            'exposicao_por_status': {status: f'{getattr(resumo, campo):.2f}' for status, campo in CAMPOS_STATUS.items()},
+            'atualizado_em': resumo.data_atualizacao.isoformat() if resumo.data_atualizacao else None,
+        }, status=200)
+
+    return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+@csrf_exempt
+def criar_ordem_auto_investimento(request):
+    if request.method == 'POST':
+        data = json.loads(request.body)
+
+        try:
+            investidor = CustomUser.objects.get(pk=data.get('investidor_id'))
+        except CustomUser.DoesNotExist:
+            return JsonResponse({'erro': 'Investidor não encontrado.'}, status=404)
 
         if investidor.kyc_status != 'APROVADO':
             return JsonResponse({'erro': 'Ação não permitida. O KYC do investidor não está aprovado.'}, status=403)
 
-        if emprestimo.tomador == investidor:
-            return JsonResponse({'erro': 'Você não pode financiar seu próprio empréstimo.'}, status=400)
-        
-        emprestimo.investidor = investidor
-        emprestimo.status = 'FINANCIADO'
-        emprestimo.save()
-        
+        try:
+            valor_maximo = Decimal(str(data['valor_maximo_por_emprestimo']))
+            saldo = Decimal(str(data['saldo_disponivel']))
+            taxa_minima = Decimal(str(data.get('taxa_minima', '0')))
+        except (KeyError, ArithmeticError):
+            return JsonResponse({'erro': 'Informe valor_maximo_por_emprestimo e saldo_disponivel válidos.'}, status=400)
+
+        if valor_maximo <= 0 or saldo <= 0 or taxa_minima < 0:
+            return JsonResponse({'erro': 'Valores devem ser positivos.'}, status=400)
+
+        riscos = [str(r).upper() for r in data.get('riscos_aceitos', ['BAIXO', 'MEDIO'])]
+        riscos_validos = {codigo for codigo, _ in CustomUser.RISCO_CHOICES}
+        if not riscos or any(r not in riscos_validos for r in riscos):
+            return JsonResponse({'erro': f"Risco inválido. Use: {', '.join(sorted(riscos_validos))}."}, status=400)
+
+        # A alocação acontece nas rodadas do motor (manage.py executar_auto_investimento)
+        ordem = OrdemAutoInvestimento.objects.create(
+            investidor=investidor,
+            valor_maximo_por_emprestimo=valor_maximo,
+            saldo_disponivel=saldo,
+            riscos_aceitos=','.join(riscos),
+            taxa_minima=taxa_minima,
+        )
+
         return JsonResponse({
-            'mensagem': 'Empréstimo financiado com sucesso!',
-            'emprestimo_id': emprestimo.id,
-            'status_novo': emprestimo.status
-        }, status=200)
+            'mensagem': 'Ordem de auto-investimento criada.',
+            'ordem_id': ordem.id,
+            'riscos_aceitos': riscos,
+        }, status=201)
 
     return JsonResponse({'erro': 'Método não permitido'}, status=405)
 
@@ -196,11 +312,61 @@ def iniciar_kyc_view(request):
         if not user_id:
             return JsonResponse({'erro': 'user_id é obrigatório'}, status=400)
 
-        resultado = processar_kyc_automatico(user_id)
+        try:
+            usuario = CustomUser.objects.get(pk=user_id)
+        except CustomUser.DoesNotExist:
+            return JsonResponse({'erro': 'Usuário não encontrado.'}, status=404)
+
+        # O processamento (OCR, reconhecimento facial, base restritiva) é feito pelos workers
+        # (manage.py kyc_worker). Aqui apenas enfileiramos e devolvemos o id do job.
+        job = enfileirar_kyc(usuario)
 
-        return JsonResponse(resultado, status=200)
+        return JsonResponse({
+            'mensagem': 'Verificação de KYC enfileirada.',
+            'job_id': job.id,
+            'status': job.status,
+        }, status=202)
     return JsonResponse({'erro': 'Método não permitido'}, status=405)
 
+def status_kyc_view(request, job_id):
+    if request.method == 'GET':
+        try:
+            job = KycJob.objects.get(pk=job_id)
+        except KycJob.DoesNotExist:
+            return JsonResponse({'erro': 'Job de KYC não encontrado.'}, status=404)
+
+        return JsonResponse({
+            'job_id': job.id,
+            'user_id': job.usuario_id,
+            'status': job.status,
+            'resultado': job.resultado,
+            'data_criacao': job.data_criacao.isoformat(),
+            'data_inicio': job.data_inicio.isoformat() if job.data_inicio else None,
+            'data_fim': job.data_fim.isoformat() if job.data_fim else None,
+        }, status=200)
+    return JsonResponse({'erro': 'Método não permitido'}, status=405)
+
+
+@staff_member_required
+def relatorio_kyc_view(request):
+    """
+    Latência do KYC por etapa (p50/p95/p99 em ms) numa janela de tempo: ?horas=24 (padrão)
+    ou ?inicio=...&fim=... em ISO 8601. Restrito à equipe.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'erro': 'Método não permitido'}, status=405)
+    try:
+        fim = datetime.fromisoformat(request.GET['fim']) if request.GET.get('fim') else None
+        if request.GET.get('inicio'):
+            inicio = datetime.fromisoformat(request.GET['inicio'])
+        else:
+            inicio = (fim or timezone.now()) - timedelta(hours=float(request.GET.get('horas', 24)))
+    except ValueError:
+        return JsonResponse({'erro': 'Parâmetros de janela inválidos.'}, status=400)
+
+    inicio, fim = (timezone.make_aware(d) if d and timezone.is_naive(d) else d for d in (inicio, fim))
+    return JsonResponse(resumo_execucoes(inicio, fim), status=200)
+
 def perfil_page(request):
     try:
         user = CustomUser.objects.get(pk=1)
@@ -224,12 +390,28 @@ def upload_documentos_view(request):
 
         try:
             usuario = CustomUser.objects.get(pk=user_id)
-            usuario.foto_documento_frente = foto_documento_frente  # Modificado
-            usuario.foto_documento_verso = foto_documento_verso  # Adicionado
-            usuario.selfie = selfie
-            usuario.save()
-            return JsonResponse({'mensagem': 'Documentos enviados com sucesso!'}, status=200)
         except CustomUser.DoesNotExist:
             return JsonResponse({'erro': 'Usuário não encontrado.'}, status=404)
 
+        arquivos = {
+            'foto_documento_frente': foto_documento_frente,
+            'foto_documento_verso': foto_documento_verso,
+            'selfie': selfie,
+        }
+        hashes = {}
+        try:
+            # Normaliza (rotação EXIF, resolução máxima, JPEG) e grava pelo hash do conteúdo
+            for campo, arquivo in arquivos.items():
+                prefixo = CustomUser._meta.get_field(campo).upload_to
+                caminho, hashes[campo] = armazenar_imagem_kyc(arquivo, prefixo)
+                setattr(usuario, campo, caminho)
+        except ImagemInvalida as e:
+            return JsonResponse({'erro': str(e)}, status=400)
+
+        # Os hashes perceptuais ficam gravados para o KYC procurar a mesma foto em outras contas
+        with transaction.atomic():
+            usuario.save(update_fields=list(arquivos))
+            gravar_hashes_kyc(usuario.pk, hashes)
+        return JsonResponse({'mensagem': 'Documentos enviados com sucesso!'}, status=200)
+
     return JsonResponse({'erro': 'Método não permitido'}, status=405)
\ No newline at end of file
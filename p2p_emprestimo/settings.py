@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -81,9 +82,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Segundos que uma escrita espera pelo lock do banco. Os financiamentos abrem a transação já
+        # com o lock de escrita (core.financiamento.transacao_de_escrita); as demais são DEFERRED
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # Banco de testes em arquivo: os testes de concorrência usam várias threads, cada uma com sua conexão
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# O cache precisa ser compartilhado entre os processos (workers web, kyc_worker, comandos): a versão
+# que invalida as páginas do marketplace é gravada por quem financia e lida por todos. O padrão em
+# arquivos vale para todos os processos da mesma máquina; com mais de um servidor, use Redis/Memcached.
+# Ex.: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+# (o LocMemCache é por processo e serviria empréstimos já financiados até o TTL expirar)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
     }
 }
 
+# Os testes (manage.py test) usam um cache em memória do próprio processo: o cache em arquivos é
+# compartilhado com o servidor de desenvolvimento e as páginas gravadas por ele vazariam para os testes
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'testes',
+        }
+    }
+
+# Tempo máximo (segundos) de uma página da listagem do marketplace em cache
+MARKETPLACE_CACHE_TIMEOUT = 300
+
+
+# Logs da aplicação (módulos core.*) no console; CORE_LOG_LEVEL=DEBUG para mais detalhes
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.environ.get('CORE_LOG_LEVEL', 'INFO')},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,4 +184,57 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CORS_ALLOW_ALL_ORIGINS = True 
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True 
+
+# --- KYC ---
+# Executa as etapas independentes do KYC (OCR, reconhecimento facial, base restritiva)
+# em paralelo, encerrando na primeira reprovação.
+KYC_EXECUCAO_CONCORRENTE = True
+
+# Distância máxima entre encodings faciais para considerar o mesmo rosto em CPFs diferentes
+KYC_LIMIAR_DUPLICIDADE_FACIAL = 0.5
+# Segundos até o índice facial em memória ser reconstruído a partir do banco
+KYC_INDICE_FACIAL_TTL = 300
+
+# Fila de KYC (kyc_worker): quantas vezes um job é reservado antes de ser encerrado como ESGOTADO
+# (erro inesperado ou worker derrubado no meio do job)
+KYC_MAX_TENTATIVAS = 3
+
+# Triagem noturna (triar_sancoes): reprova o KYC de quem aparece em uma lista restritiva depois de aprovado
+TRIAGEM_SANCOES_BLOQUEAR = True
+
+# Pré-processamento do OCR: resolução alvo (DPI sobre a largura aproximada do documento na foto)
+KYC_OCR_DPI_ALVO = 300
+KYC_OCR_LARGURA_DOCUMENTO_MM = 130
+# Usa a detecção de orientação do Tesseract (OSD) para fotos giradas 90/180/270 graus
+KYC_OCR_DETECTAR_ORIENTACAO = False
+# Diretório para salvar as imagens intermediárias do OCR (None desativa)
+KYC_OCR_DIRETORIO_DEBUG = None
+
+# Motor de OCR: 'tesserocr' (em requirements.txt) mantém instâncias da API do Tesseract aquecidas, também para a
+# detecção de orientação; 'pytesseract' executa o binário do tesseract a cada imagem. Sem o tesserocr instalado,
+# o padrão cai para o pytesseract com um aviso no log (core.ocr_engine).
+KYC_OCR_MOTOR = os.environ.get('KYC_OCR_MOTOR', 'tesserocr')
+KYC_OCR_IDIOMA = 'por'
+KYC_OCR_TAMANHO_POOL = int(os.environ.get('KYC_OCR_TAMANHO_POOL', 2))
+# Caminho do executável do tesseract (motor 'pytesseract'), ex.: C:\Program Files\Tesseract-OCR\tesseract.exe
+KYC_TESSERACT_CMD = os.environ.get('TESSERACT_CMD', 'tesseract')
+# Diretório do tessdata (motor 'tesserocr'); None usa o padrão da instalação
+KYC_TESSDATA_DIR = os.environ.get('TESSDATA_PREFIX')
+
+# Detecção facial: 'multiresolucao' detecta numa cópia reduzida (lado maior = KYC_FACE_LADO_DETECCAO px)
+# e calcula o encoding no recorte em resolução original; 'completo' usa a imagem inteira.
+KYC_FACE_MODO_DETECCAO = 'multiresolucao'
+KYC_FACE_LADO_DETECCAO = 800
+KYC_FACE_UPSAMPLE = 1
+
+# Normalização das imagens do KYC no upload: lado maior máximo (px) e qualidade do JPEG gravado
+KYC_UPLOAD_LADO_MAXIMO = 2000
+KYC_UPLOAD_QUALIDADE_JPEG = 90
+
+# Imagens reaproveitadas entre contas: distância de Hamming máxima (de 64 bits) no pHash e no dHash
+# para considerar a mesma foto (limites maiores pegam recortes maiores, com mais alertas falsos entre
+# fotos de documentos do mesmo modelo), e segundos até o índice em memória ser reconstruído a partir do banco
+KYC_LIMIAR_PHASH = 10
+KYC_LIMIAR_DHASH = 8
+KYC_INDICE_PERCEPTUAL_TTL = 300